@@ -0,0 +1,48 @@
+"""对比每次启动 python -m pip 与常驻 pip 工作进程的耗时
+
+    python benchmarks/bench_executor.py --repeat 5
+"""
+import argparse
+import statistics
+import time
+
+from pipui.common import executor, pipworker
+
+COMMANDS = [("--version",), ("config", "list"), ("list", "--format", "json")]
+
+
+def measure(run, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    return {"median_ms": round(statistics.median(samples) * 1000, 1),
+            "max_ms": round(max(samples) * 1000, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--python", default="python")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    subprocess_executor = executor.Executor(f"{args.python} -m pip")
+    worker_executor = pipworker.PipWorkerExecutor(args.python)
+    start = time.perf_counter()
+    worker_executor.worker.request("--version")
+    print(f"worker startup: {(time.perf_counter() - start) * 1000:.1f} ms")
+    try:
+        for command in COMMANDS:
+            name = " ".join(command)
+            print(f"{name:<22} subprocess "
+                  f"{measure(lambda c=command: subprocess_executor.execute(*c), args.repeat)}")
+            print(f"{name:<22} worker     "
+                  f"{measure(lambda c=command: worker_executor.execute(*c), args.repeat)}")
+    finally:
+        worker_executor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""对比 JSON API 与 simple 索引两种最新版本查询方式 (使用本地模拟索引, 无需联网)
+
+    python benchmarks/bench_lookup.py --packages 200 --releases 200 --latency 0.02
+"""
+import argparse
+import tempfile
+import time
+
+from fake_index import FakeIndex, FakeIndexServer
+
+from pipui.core.cache import VersionCache
+from pipui.core.manager import pip, pypi
+
+
+def run(manager: pip.PipManager, names, index: FakeIndex) -> dict:
+    index.requests = index.not_modified = index.bytes_sent = 0
+    start = time.perf_counter()
+    results = list(manager.iter_last_versions(names))
+    elapsed = time.perf_counter() - start
+    errors = [name for name, version, error in results
+              if error or version != index.latest(name)]
+    return {"seconds": round(elapsed, 3), "requests": index.requests,
+            "not_modified": index.not_modified, "bytes": index.bytes_sent,
+            "wrong": len(errors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packages", type=int, default=200)
+    parser.add_argument("--releases", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, default=pip.DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    index = FakeIndex(args.packages, args.releases, args.latency)
+    names = list(index.projects)
+    with FakeIndexServer(index) as server, tempfile.TemporaryDirectory() as tmp:
+        clients = {
+            "json": lambda c: pypi.PypiClient(url=server.url, cache=c),
+            "simple": lambda c: pypi.SimpleIndexClient(url=server.simple_url, cache=c),
+        }
+        for name, create in clients.items():
+            cache = VersionCache(f"{tmp}/{name}.sqlite", ttl=0)
+            manager = pip.PipManager(workers=args.workers)
+            manager._pypi = create(cache)  # pylint: disable=protected-access
+            print(f"{name:<8} cold       {run(manager, names, index)}")
+            print(f"{name:<8} revalidate {run(manager, names, index)}")
+            cache.ttl = 3600
+            print(f"{name:<8} cached     {run(manager, names, index)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""镜像测速: 启动几个不同延迟/带宽的本地模拟索引, 检查测速结果和排序
+
+    python benchmarks/bench_mirrors.py --samples 3
+"""
+import argparse
+import contextlib
+import time
+
+from fake_index import FakeIndex, FakeIndexServer, fake_releases
+
+from pipui.core import mirrors
+
+# 名称 -> (延迟 秒, 带宽 字节/秒)
+STAND_INS = {
+    "fast": (0.005, 0),
+    "slow-first-byte": (0.2, 0),
+    "slow-transfer": (0.01, 200 * 1024),
+    "medium": (0.05, 0),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=mirrors.DEFAULT_SAMPLES)
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        repos = {}
+        for name, (latency, bandwidth) in STAND_INS.items():
+            index = FakeIndex(packages=0, latency=latency, bandwidth=bandwidth)
+            index.add_project(mirrors.PROBE_PROJECT, fake_releases(300))
+            repos[name] = stack.enter_context(FakeIndexServer(index)).simple_url
+        repos["unreachable"] = "http://127.0.0.1:9/simple"
+
+        start = time.perf_counter()
+        results = mirrors.probe_mirrors(repos, samples=args.samples, timeout=2)
+        elapsed = time.perf_counter() - start
+
+    for result in results:
+        print(f"{result.name:<16} ok={result.ok!s:<5} connect={result.connect * 1000:8.1f}ms "
+              f"ttfb={result.ttfb * 1000:8.1f}ms total={result.total * 1000:8.1f}ms "
+              f"throughput={result.throughput / 1024:10.0f}KB/s {result.error}")
+    print(f"probed {len(repos)} indexes x {args.samples} samples in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
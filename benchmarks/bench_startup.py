@@ -0,0 +1,81 @@
+"""启动耗时: 分别统计 pipui.main 的导入耗时, 界面模块的导入耗时和窗口首次绘制的耗时
+
+pipui.main 延迟导入界面, 界面模块 (dashboard -> pages -> widgets/tasks) 的导入单独统计.
+
+每次测量都在新的进程中进行, 使用 offscreen 平台, 不需要显示器.
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# 在子进程中执行: 输出一行 JSON {"import_ms": ..., "ui_import_ms": ..., "first_paint_ms": ...}
+PROBE = r"""
+import json, time
+start = time.perf_counter()
+from pipui import main
+imported = time.perf_counter()
+from pipui.ui import dashboard
+ui_imported = time.perf_counter()
+
+from PySide6.QtCore import QEvent, QObject, QTimer
+
+app = main.create_application()
+window = main.create_window()
+result = {"import_ms": (imported - start) * 1000,
+          "ui_import_ms": (ui_imported - imported) * 1000}
+
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint and "first_paint_ms" not in result:
+            if hasattr(obj, "window") and obj.window() is window:
+                result["first_paint_ms"] = (time.perf_counter() - start) * 1000
+                QTimer.singleShot(0, app.quit)
+        return False
+
+
+paint_filter = FirstPaint()
+app.installEventFilter(paint_filter)
+window.show()
+QTimer.singleShot(30000, app.quit)
+app.exec()
+print(json.dumps(result))
+"""
+
+
+def measure_once(python: str) -> dict:
+    env = dict(os.environ, QT_QPA_PLATFORM=os.getenv("QT_QPA_PLATFORM", "offscreen"))
+    output = subprocess.run([python, "-c", PROBE], env=env, check=True, text=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--python", default=sys.executable)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print machine readable result")
+    args = parser.parse_args()
+
+    samples = [measure_once(args.python) for _ in range(args.repeat)]
+    result = {
+        key: {"median": round(statistics.median(s[key] for s in samples), 1),
+              "min": round(min(s[key] for s in samples), 1),
+              "max": round(max(s[key] for s in samples), 1)}
+        for key in ("import_ms", "ui_import_ms", "first_paint_ms")
+    }
+    if args.json:
+        print(json.dumps(result))
+        return
+    for key, value in result.items():
+        print(f"{key:<16} median {value['median']:>8} min {value['min']:>8} max {value['max']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""本地模拟的 PyPI 索引服务, 用于离线测试和基准测试
+
+提供以下接口:
+- /simple/{name}/      PEP 691 JSON 或 PEP 503 HTML (根据 Accept 头)
+- /pypi/{name}/json    PyPI JSON API (包含完整的 releases 列表)
+- /files/{filename}    发行文件, 内容是文件名本身 (与索引中的 sha256 一致)
+
+所有响应都带 ETag, 支持 If-None-Match 条件请求; latency 用于模拟网络延迟.
+
+    python benchmarks/fake_index.py --packages 500 --releases 100 --latency 0.05
+"""
+import argparse
+import hashlib
+import html
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+SIMPLE_JSON = "application/vnd.pypi.simple.v1+json"
+
+
+def fake_releases(count: int) -> List[dict]:
+    """生成版本列表, 穿插预发布版本和 yanked 版本"""
+    releases = []
+    for i in range(count):
+        version = f"{i // 10}.{i % 10}.0"
+        releases.append({"version": version, "yanked": False})
+        if i % 7 == 3:
+            releases.append({"version": f"{version}rc1", "yanked": False})
+    if count > 1:
+        # 最新的正式版本被 yanked, 应当返回次新的版本
+        releases[-1]["yanked"] = True
+        releases.append({"version": f"{count // 10}.{count % 10}.0a1", "yanked": False})
+    return releases
+
+
+def project_files(name: str, releases: List[dict]) -> List[dict]:
+    files = []
+    normalized = re.sub(r"[-_.]+", "_", name).lower()
+    for release in releases:
+        for filename in [f"{normalized}-{release['version']}-py3-none-any.whl",
+                         f"{normalized}-{release['version']}.tar.gz"]:
+            files.append({
+                "filename": filename,
+                "url": f"../../files/{filename}",
+                "hashes": {"sha256": hashlib.sha256(filename.encode()).hexdigest()},
+                "requires-python": ">=3.8",
+                "yanked": release["yanked"],
+            })
+    return files
+
+
+class FakeIndex:
+    """包名 -> 版本列表; 也可以通过 add_project 精确指定"""
+
+    def __init__(self, packages: int = 100, releases: int = 30, latency: float = 0,
+                 prefix: str = "pkg", bandwidth: int = 0) -> None:
+        self.latency = latency
+        # 每个响应的发送速度上限, 单位: 字节/秒, 0 表示不限制
+        self.bandwidth = bandwidth
+        self.projects: Dict[str, List[dict]] = {}
+        for i in range(packages):
+            self.add_project(f"{prefix}-{i}", fake_releases(releases))
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def add_project(self, name: str, releases: List[dict]):
+        self.projects[re.sub(r"[-_.]+", "-", name).lower()] = releases
+
+    def latest(self, name: str) -> Optional[str]:
+        """非 yanked 的最新正式版本 (与客户端期望的结果一致)"""
+        releases = self.projects.get(re.sub(r"[-_.]+", "-", name).lower(), [])
+        versions = [r["version"] for r in releases
+                    if not r["yanked"] and not re.search(r"(a|b|rc|dev)\d*$", r["version"])]
+        return versions[-1] if versions else None
+
+    def record(self, size: int, not_modified=False):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += size
+            self.not_modified += 1 if not_modified else 0
+
+    def simple_json(self, name: str) -> bytes:
+        releases = self.projects[name]
+        return json.dumps({
+            "meta": {"api-version": "1.1"},
+            "name": name,
+            "files": project_files(name, releases),
+            "versions": [r["version"] for r in releases],
+        }).encode()
+
+    def simple_html(self, name: str) -> bytes:
+        links = []
+        for item in project_files(name, self.projects[name]):
+            yanked = " data-yanked=\"\"" if item["yanked"] else ""
+            links.append(f'<a href="{html.escape(item["url"])}#sha256={item["hashes"]["sha256"]}"'
+                         f'{yanked}>{html.escape(item["filename"])}</a><br/>')
+        return ("<!DOCTYPE html><html><head><title>Links for {0}</title></head><body>"
+                "<h1>Links for {0}</h1>{1}</body></html>").format(name, "\n".join(links)).encode()
+
+    def pypi_json(self, name: str) -> bytes:
+        releases = self.projects[name]
+        return json.dumps({
+            "info": {"name": name, "version": self.latest(name), "summary": "fake package",
+                     "description": "long description " * 500},
+            "releases": {r["version"]: project_files(name, [r]) for r in releases},
+            "urls": [],
+        }).encode()
+
+
+def make_handler(index: FakeIndex):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # keep-alive 时头部和内容分两次写入, Nagle 和延迟确认会让每个请求多等约 40ms
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            pass
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            if index.latency:
+                time.sleep(index.latency)
+            if matched := re.match(r"^/files/([^/]+)$", self.path):
+                self.reply(200, matched.group(1).encode(), "application/octet-stream")
+                return
+            matched = re.match(r"^/simple/([^/]+)/?$", self.path) \
+                or re.match(r"^/pypi/([^/]+)/json$", self.path)
+            name = re.sub(r"[-_.]+", "-", matched.group(1)).lower() if matched else ""
+            if name not in index.projects:
+                self.reply(404, b"not found", "text/plain")
+                return
+            if self.path.startswith("/pypi/"):
+                body, content_type = index.pypi_json(name), "application/json"
+            elif SIMPLE_JSON in self.headers.get("Accept", ""):
+                body, content_type = index.simple_json(name), SIMPLE_JSON
+            else:
+                body, content_type = index.simple_html(name), "text/html"
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.reply(304, b"", content_type, etag=etag)
+                return
+            self.reply(200, body, content_type, etag=etag)
+
+        def reply(self, status: int, body: bytes, content_type: str, etag: str = ""):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if etag:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            if not index.bandwidth:
+                self.wfile.write(body)
+            chunk_size = max(index.bandwidth // 20, 1)
+            for offset in range(0, len(body) if index.bandwidth else 0, chunk_size):
+                self.wfile.write(body[offset:offset + chunk_size])
+                time.sleep(chunk_size / index.bandwidth)
+            index.record(len(body), not_modified=status == 304)
+
+    return Handler
+
+
+class FakeIndexServer:
+    """在后台线程中运行的 FakeIndex 服务, 支持 with 语句"""
+
+    def __init__(self, index: FakeIndex, host="127.0.0.1", port=0) -> None:
+        self.index = index
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(index))
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def simple_url(self) -> str:
+        return f"{self.url}/simple"
+
+    def start(self) -> "FakeIndexServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--packages", type=int, default=100)
+    parser.add_argument("--releases", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0, help="seconds per request")
+    parser.add_argument("--bandwidth", type=int, default=0, help="bytes per second")
+    args = parser.parse_args()
+
+    server = FakeIndexServer(FakeIndex(args.packages, args.releases, args.latency,
+                                       bandwidth=args.bandwidth),
+                             host=args.host, port=args.port)
+    print(f"serving {args.packages} packages on {server.simple_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""pipui 基准测试套件
+
+在合成的 site-packages 和本地模拟索引上, 按不同的包数量分别测量:
+- list_packages: 包索引冷启动 / 热启动 (对比直接遍历 importlib.metadata)
+- update_check:  完整的检测更新 (无缓存 / 有缓存)
+- table_render:  PackageTable.set_packages 到第一次绘制完成 (offscreen)
+- search:        搜索索引的一次查询 (前缀 / 包含 / 模糊)
+- disk_usage:    按 RECORD 统计所有包的大小 (无缓存 / 有缓存)
+- advisories:    导入合成的 OSV 数据, 批量检查所有的包
+- versions:      检测更新后比较所有包的版本 (首次解析 / 使用缓存 / 不缓存)
+
+结果以 JSON 输出, 可以用 --compare 对比两次提交的结果:
+
+    python benchmarks/run.py --sizes 100 1000 5000 --output before.json
+    python benchmarks/run.py --sizes 100 1000 5000 --output after.json
+    python benchmarks/run.py --compare before.json after.json
+"""
+import argparse
+import dataclasses
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import metadata
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+# pylint: disable=wrong-import-position,import-outside-toplevel
+from fake_index import FakeIndex, FakeIndexServer
+from synthetic import make_site_packages
+
+
+def timed(func, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {"seconds": statistics.median(samples), "samples": samples}
+
+
+def bench_list_packages(site: str, cache_dir: str, repeat: int) -> dict:
+    from pipui.core.pkgindex import PackageIndex
+
+    def importlib_scan():
+        return [(d.metadata["Name"], d.version) for d in metadata.distributions(path=[site])]
+
+    def cold():
+        for name in os.listdir(cache_dir):
+            if name.startswith("packages-"):
+                os.remove(os.path.join(cache_dir, name))
+        index = PackageIndex([site])
+        index.refresh()
+        index.save()
+
+    def warm():
+        index = PackageIndex([site])
+        index.load()
+        index.refresh()
+
+    return {
+        "list_packages.importlib": timed(importlib_scan, repeat),
+        "list_packages.index_cold": timed(cold, repeat),
+        "list_packages.index_warm": timed(warm, repeat),
+    }
+
+
+def bench_update_check(names, server: FakeIndexServer, cache_dir: str, workers: int) -> dict:
+    from pipui.core.manager import pip
+
+    def check():
+        manager = pip.PipManager(workers=workers)
+        errors = [name for name, _, error in manager.iter_last_versions(names) if error]
+        if errors:
+            raise RuntimeError(f"{len(errors)} lookups failed, e.g. {errors[0]}")
+
+    os.environ["PIP_INDEX_URL"] = server.simple_url
+    cache_file = os.path.join(cache_dir, "versions.sqlite")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(cache_file + suffix):
+            os.remove(cache_file + suffix)
+    server.index.requests = 0
+    results = {"update_check.cold": timed(check, 1)}
+    results["update_check.cold"]["requests"] = server.index.requests
+    server.index.requests = 0
+    results["update_check.cached"] = timed(check, 1)
+    results["update_check.cached"]["requests"] = server.index.requests
+    return results
+
+
+def bench_table_render(packages, repeat: int) -> dict:
+    from PySide6 import QtWidgets
+
+    from pipui.ui import pages  # noqa: F401  pylint: disable=unused-import
+    from pipui.ui.widgets import PackageTable
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    table = PackageTable(["包名", "版本", "新版本", "大小"])
+    table.resize(1000, 800)
+    table.show()
+
+    def render():
+        table.set_packages(list(packages))
+        table.table.viewport().repaint()
+        app.processEvents()
+
+    result = {"table_render": timed(render, repeat)}
+    table.close()
+    return result
+
+
+def bench_search(packages, repeat: int) -> dict:
+    from pipui.core import search
+
+    index = search.PackageSearchIndex(packages)
+    # 逐字输入一个包名, 与搜索框中每次按键的查询相同
+    name = packages[len(packages) // 2].name if packages else "pkg"
+    queries = [name[:i] for i in range(1, len(name) + 1)]
+
+    def typing(mode):
+        return lambda: [index.search(query, mode) for query in queries]
+
+    results = {"search.build": timed(lambda: search.PackageSearchIndex(packages), repeat)}
+    for mode in search.MODES:
+        result = timed(typing(mode), repeat)
+        # 每次按键的平均耗时
+        result["seconds"] /= len(queries)
+        result["samples"] = [sample / len(queries) for sample in result["samples"]]
+        results[f"search.{mode}"] = result
+    return results
+
+
+def bench_disk_usage(packages, cache_dir: str, repeat: int) -> dict:
+    from pipui.core.disksize import DiskUsage
+
+    cache_file = os.path.join(cache_dir, "sizes-bench.json")
+
+    def cold():
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+        usage = DiskUsage(cache_file=cache_file)
+        list(usage.iter_sizes(packages))
+        usage.save()
+
+    def warm():
+        usage = DiskUsage(cache_file=cache_file)
+        usage.load()
+        list(usage.iter_sizes(packages))
+
+    return {
+        "disk_usage.cold": timed(cold, repeat),
+        "disk_usage.warm": timed(warm, repeat),
+    }
+
+
+def bench_advisories(packages, tmp: str, repeat: int) -> dict:
+    from pipui.core.advisories import AdvisoryDatabase
+
+    # 每三个包一条漏洞, 另外加上与已安装的包无关的漏洞, 接近真实数据库的规模
+    source = os.path.join(tmp, f"osv-{len(packages)}.json")
+    records = [{"id": f"BENCH-{i}", "summary": "synthetic",
+                "affected": [{"package": {"ecosystem": "PyPI", "name": package.name},
+                              "ranges": [{"type": "ECOSYSTEM",
+                                          "events": [{"introduced": "0"}, {"fixed": "1.0.5"}]}]}]}
+               for i, package in enumerate(packages[::3])]
+    records += [{"id": f"OTHER-{i}", "affected": [{"package": {"ecosystem": "PyPI",
+                                                               "name": f"other-{i}"},
+                                                   "versions": ["1.0"]}]}
+                for i in range(20000)]
+    with open(source, "w", encoding="utf-8") as f:
+        json.dump(records, f)
+    index_file = os.path.join(tmp, "advisories-bench.json")
+    database = AdvisoryDatabase(index_file)
+
+    def check():
+        fresh = AdvisoryDatabase(index_file)
+        fresh.load()
+        return fresh.check(packages)
+
+    return {
+        "advisories.import": timed(lambda: database.import_osv(source), 1),
+        "advisories.check": timed(lambda: database.check(packages), repeat),
+        "advisories.load_check": timed(check, repeat),
+    }
+
+
+def bench_versions(packages, repeat: int) -> dict:
+    from packaging.version import Version
+
+    from pipui.core import versions
+
+    checked = [dataclasses.replace(package, new_version=f"1.{i % 3}.{i % 10}")
+               for i, package in enumerate(packages)]
+
+    def cold():
+        versions.clear_cache()
+        versions.classify(checked)
+
+    def uncached():
+        return [Version(p.new_version) > Version(p.version) for p in checked]
+
+    return {
+        "versions.classify_cold": timed(cold, repeat),
+        "versions.classify_warm": timed(lambda: versions.classify(checked), repeat),
+        "versions.uncached": timed(uncached, repeat),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run(args) -> dict:
+    from pipui.common import logging
+    from pipui.core.pkgindex import PackageIndex
+
+    logging.setup_logger("WARNING")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["PIPUI_CACHE_DIR"] = os.path.join(tmp, "cache")
+        cache_dir = os.environ["PIPUI_CACHE_DIR"]
+        os.makedirs(cache_dir, exist_ok=True)
+        index = FakeIndex(packages=max(args.sizes), releases=args.releases, latency=args.latency)
+        with FakeIndexServer(index) as server:
+            for size in args.sizes:
+                site = make_site_packages(os.path.join(tmp, f"site-{size}"), size)
+                print(f"size={size}", file=sys.stderr)
+                measured = bench_list_packages(site, cache_dir, args.repeat)
+                site_index = PackageIndex([site])
+                site_index.refresh()
+                packages = site_index.packages()
+                if size <= args.max_check_size:
+                    measured.update(bench_update_check([p.name for p in packages], server,
+                                                       cache_dir, args.workers))
+                measured.update(bench_search(packages, args.repeat))
+                measured.update(bench_disk_usage(packages, cache_dir, args.repeat))
+                measured.update(bench_advisories(packages, tmp, args.repeat))
+                measured.update(bench_versions(packages, args.repeat))
+                if not args.no_gui:
+                    measured.update(bench_table_render(packages, args.repeat))
+                for name, value in measured.items():
+                    results.append(dict(value, benchmark=name, size=size))
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "workers": args.workers,
+            "latency": args.latency,
+        },
+        "results": results,
+    }
+
+
+def compare(before_file: str, after_file: str):
+    with open(before_file, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_file, encoding="utf-8") as f:
+        after = json.load(f)
+    old = {(r["benchmark"], r["size"]): r["seconds"] for r in before["results"]}
+    print(f"{'benchmark':<28}{'size':>8}{'before':>12}{'after':>12}{'ratio':>8}")
+    for result in after["results"]:
+        key = (result["benchmark"], result["size"])
+        if key not in old:
+            continue
+        ratio = result["seconds"] / old[key] if old[key] else float("inf")
+        print(f"{key[0]:<28}{key[1]:>8}{old[key] * 1000:>10.1f}ms"
+              f"{result['seconds'] * 1000:>10.1f}ms{ratio:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--releases", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="simulated seconds per index request")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-check-size", type=int, default=1000,
+                        help="skip the update check for larger sizes")
+    parser.add_argument("--no-gui", action="store_true", help="skip the table render benchmark")
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    data = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data)
+    else:
+        print(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""生成包含 N 个假 .dist-info 的 site-packages 目录"""
+import os
+import re
+
+METADATA = """Metadata-Version: 2.1
+Name: {name}
+Version: {version}
+Summary: Synthetic package {index} for pipui benchmarks
+Home-page: https://example.invalid/{name}
+Author: pipui
+License: MIT
+Requires-Python: >=3.8
+{requires}
+{description}
+"""
+
+
+def make_site_packages(path: str, count: int, prefix: str = "pkg",
+                       description_size: int = 2000) -> str:
+    """在 path 下生成 count 个包, 包名为 {prefix}-{i}, 版本为 1.0.{i % 10}
+
+    每个包依赖前一个包, 并带有 RECORD 和一个模块文件, 与真实安装的结构一致.
+    """
+    os.makedirs(path, exist_ok=True)
+    for i in range(count):
+        name = f"{prefix}-{i}"
+        module = re.sub(r"[-.]+", "_", name)
+        version = f"1.0.{i % 10}"
+        dist_info = os.path.join(path, f"{module}-{version}.dist-info")
+        os.makedirs(dist_info, exist_ok=True)
+        # 以换行结尾, 模板中下一行的空行把头部和描述分开
+        requires = f"Requires-Dist: {prefix}-{i - 1}\n" if i else ""
+        with open(os.path.join(dist_info, "METADATA"), "w", encoding="utf-8") as f:
+            f.write(METADATA.format(name=name, version=version, index=i, requires=requires,
+                                    description="x" * description_size))
+        with open(os.path.join(path, f"{module}.py"), "w", encoding="utf-8") as f:
+            f.write(f"VERSION = {version!r}\n")
+        with open(os.path.join(dist_info, "INSTALLER"), "w", encoding="utf-8") as f:
+            f.write("pip\n")
+        with open(os.path.join(dist_info, "RECORD"), "w", encoding="utf-8") as f:
+            f.write(f"{module}.py,,\n")
+            for filename in ("METADATA", "INSTALLER", "RECORD"):
+                f.write(f"{os.path.basename(dist_info)}/{filename},,\n")
+    return path
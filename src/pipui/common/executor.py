@@ -1,21 +1,124 @@
+import collections
+import os
+import queue
+import shlex
+import signal
 import subprocess
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
 
 from loguru import logger
 
+from pipui.common import logging
+from pipui.common.metrics import METRICS
+
+STDOUT = "stdout"
+STDERR = "stderr"
+
+
+class ExecutionCancelled(Exception):
+    pass
+
+
+def kill_process_tree(process: subprocess.Popen):
+    """结束进程及其所有子进程 (进程需要以新的会话/进程组启动)"""
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError as e:
+        logger.warning("kill process tree {} failed: {}", process.pid, e)
+        process.kill()
+    process.wait()
+
+
+def _subcommand(args) -> str:
+    return str(args[0]) if args else ""
+
 
 class Executor:
 
     def __init__(self, cmd) -> None:
         self.cmd = cmd
 
-    def execute(self, *args):
-        cmd = [self.cmd]
-        cmd.extend(args)
-        logger.debug("RUN: {}", " ".join(cmd))
-        status, output = subprocess.getstatusoutput(
-            " ".join(cmd),
-        )
-        logger.debug("Return: [{}], output:\n{}", status, output)
+    def command(self, *args) -> List[str]:
+        return shlex.split(self.cmd, posix=os.name != "nt") + [str(arg) for arg in args]
+
+    def execute(self, *args, timeout: Optional[float] = None):
+        cmd = self.command(*args)
+        logger.debug("RUN: {}", shlex.join(cmd))
+        with METRICS.timer("pip.command", detail=shlex.join(cmd), command=_subcommand(args),
+                           backend="subprocess"):
+            try:
+                result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        text=True, errors="replace", timeout=timeout, check=False)
+                status, output = result.returncode, result.stdout.rstrip("\n")
+            except FileNotFoundError as e:
+                status, output = 127, str(e)
+        METRICS.counter("pip.status", command=_subcommand(args), status=status)
+        # 输出可能很长, 只在启用 DEBUG 时截取最后几行
+        logger.opt(lazy=True).debug("Return: [{}], output:\n{}", lambda: status,
+                                    lambda: logging.tail(output))
         if status != 0:
             raise subprocess.CalledProcessError(status, output)
         return status, output
+
+    def stream(self, *args, timeout: Optional[float] = None,
+               cancel: Optional[threading.Event] = None) -> Iterator[Tuple[str, str]]:
+        """执行命令并逐行返回 (stdout/stderr, line)
+
+        超时或 cancel 被设置时结束整个进程树, 分别抛出 TimeoutExpired 和 ExecutionCancelled;
+        提前关闭迭代器同样会结束进程树.
+        """
+        cmd = self.command(*args)
+        logger.debug("RUN (stream): {}", shlex.join(cmd))
+        with METRICS.timer("pip.command", detail=shlex.join(cmd), command=_subcommand(args),
+                           backend="stream"):
+            yield from self._stream(cmd, _subcommand(args), timeout, cancel)
+
+    def _stream(self, cmd: List[str], command: str, timeout: Optional[float],
+                cancel: Optional[threading.Event]) -> Iterator[Tuple[str, str]]:
+        kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == "nt" \
+            else {"start_new_session": True}
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True, errors="replace", bufsize=1, **kwargs)
+        lines: queue.Queue = queue.Queue()
+
+        def read(pipe, name):
+            for line in pipe:
+                lines.put((name, line.rstrip("\r\n")))
+            lines.put((name, None))
+
+        for pipe, name in [(process.stdout, STDOUT), (process.stderr, STDERR)]:
+            threading.Thread(target=read, args=(pipe, name), daemon=True).start()
+
+        deadline = time.monotonic() + timeout if timeout else None
+        # 只保留最后的输出用于错误信息
+        output, opened = collections.deque(maxlen=50), 2
+        try:
+            while opened:
+                if cancel is not None and cancel.is_set():
+                    raise ExecutionCancelled(shlex.join(cmd))
+                if deadline and time.monotonic() > deadline:
+                    raise subprocess.TimeoutExpired(cmd, timeout, output="\n".join(output))
+                try:
+                    name, line = lines.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if line is None:
+                    opened -= 1
+                    continue
+                output.append(line)
+                yield name, line
+            status = process.wait()
+        finally:
+            kill_process_tree(process)
+        logger.debug("Return: [{}]", status)
+        METRICS.counter("pip.status", command=command, status=status)
+        if status != 0:
+            raise subprocess.CalledProcessError(status, "\n".join(output))
@@ -1,16 +1,183 @@
+import bz2
+import collections
+import gzip
+import lzma
+import os
+import queue
+import shutil
 import sys
+import threading
+from typing import Callable, Deque, List, Optional, Tuple
 
 from loguru import logger
 
 LOG_FORMAT_DEFAULT = "<level>{time:YYYY-MM-DD HH:mm:ss} {level: <7} {name} {message}</level>"
 LOG_FORMAT_NO_COLOR = "{time:YYYY-MM-DD HH:mm:ss} {level: <7} {message}"
 
+# 异步输出的队列长度, 超出时丢弃新的日志而不是阻塞调用方
+QUEUE_SIZE = 10000
+# 界面日志面板保留的行数
+BUFFER_SIZE = 5000
+# 记录命令输出时最多保留的行数
+OUTPUT_MAX_LINES = 200
+DEFAULT_BACKUPS = 5
 
-def setup_logger(level="INFO", file=None, log_format=None):
-    """Setup logging configuration."""
+COMPRESSIONS = {"gz": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+
+
+class AsyncSink:
+    """loguru 的 sink: 调用方只把格式化后的消息放入有界队列, 由后台线程写入目标
+
+    目标 (例如终端) 写入慢时不阻塞调用方; 队列满时丢弃消息, 之后输出丢弃的数量.
+    """
+
+    def __init__(self, write: Callable[[str], None], flush: Optional[Callable[[], None]] = None,
+                 maxsize: int = QUEUE_SIZE) -> None:
+        self._write = write
+        self._flush = flush
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._dropped = 0
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    def write(self, message: str):
+        try:
+            self._queue.put_nowait(str(message))
+        except queue.Full:
+            self._dropped += 1
+
+    def _run(self):
+        reported = 0
+        while (message := self._queue.get()) is not None:
+            if self._dropped != reported:
+                self._write(f"... {self._dropped - reported} log messages dropped\n")
+                reported = self._dropped
+            self._write(message)
+            if self._flush is not None and self._queue.empty():
+                self._flush()
+
+    def stop(self, timeout: float = 2):
+        """logger.remove() 时调用, 写完队列中剩余的消息"""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        if self._flush is not None:
+            self._flush()
+
+
+class RotatingFile:
+    """按大小轮转的日志文件: pipui.log -> pipui.log.1[.gz] -> ... -> pipui.log.<backups>
+
+    只在 AsyncSink 的后台线程中写入, 轮转和压缩不影响记录日志的线程.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 0, backups: int = DEFAULT_BACKUPS,
+                 compression: Optional[str] = None) -> None:
+        if compression and compression not in COMPRESSIONS:
+            raise ValueError(f"unsupported compression {compression!r}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compression = compression
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")  # pylint: disable=consider-using-with
+        self._size = self._file.tell()
+
+    def _backup(self, index: int) -> str:
+        return f"{self.path}.{index}" + (f".{self.compression}" if self.compression else "")
+
+    def _rotate(self):
+        self._file.close()
+        if self.backups > 0:
+            for index in range(self.backups - 1, 0, -1):
+                if os.path.exists(self._backup(index)):
+                    os.replace(self._backup(index), self._backup(index + 1))
+            if self.compression:
+                with open(self.path, "rb") as source, \
+                        COMPRESSIONS[self.compression](self._backup(1), "wb") as target:
+                    shutil.copyfileobj(source, target)
+            else:
+                os.replace(self.path, self._backup(1))
+        self._file = open(self.path, "w", encoding="utf-8")  # pylint: disable=consider-using-with
+        self._size = 0
+
+    def write(self, message: str):
+        # 日志大多是中文, 按 UTF-8 编码后的字节数计算大小
+        size = len(message.encode("utf-8"))
+        if self.max_bytes and self._size and self._size + size > self.max_bytes:
+            try:
+                self._rotate()
+            except OSError as e:
+                # 轮转失败时继续写入原文件
+                sys.stderr.write(f"rotate {self.path} failed: {e}\n")
+                if self._file.closed:
+                    self._file = open(self.path, "a", encoding="utf-8")  # pylint: disable=R1732
+        self._file.write(message)
+        self._size += size
+
+    def flush(self):
+        self._file.flush()
+
+
+class LogBuffer:
+    """最近的日志的环形缓冲区, 供界面的日志面板读取; 写入只是一次 deque.append"""
+
+    def __init__(self, maxlen: int = BUFFER_SIZE) -> None:
+        self._lines: Deque[str] = collections.deque(maxlen=maxlen)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def write(self, message: str):
+        with self._lock:
+            self._lines.append(str(message).rstrip("\n"))
+            self._count += 1
+
+    def since(self, count: int) -> Tuple[int, List[str]]:
+        """返回 (当前的总数, 第 count 条之后的日志); 超出缓冲区的部分已经丢弃"""
+        with self._lock:
+            new = min(self._count - count, len(self._lines))
+            lines = list(self._lines)[len(self._lines) - new:] if new > 0 else []
+            return self._count, lines
+
+    def clear(self):
+        with self._lock:
+            self._lines.clear()
+
+
+LOG_BUFFER = LogBuffer()
+
+
+def tail(output: str, max_lines: int = OUTPUT_MAX_LINES) -> str:
+    """命令输出只记录最后 max_lines 行"""
+    lines = output.splitlines()
+    if len(lines) <= max_lines:
+        return output
+    return f"... ({len(lines) - max_lines} lines omitted)\n" + "\n".join(lines[-max_lines:])
+
+
+def setup_logger(level="INFO", file=None, log_format=None, max_bytes: int = 0,
+                 backups: int = DEFAULT_BACKUPS, compression: Optional[str] = None):
+    """Setup logging configuration.
+
+    终端和文件都通过 AsyncSink 异步写入, 同时写入界面使用的 LOG_BUFFER.
+    指定 file 时另外写入文件, 超过 max_bytes 时轮转, 保留 backups 个旧文件.
+    """
     logger.remove()
     logger.add(
-        file if file else sys.stdout,
+        AsyncSink(sys.stdout.write, sys.stdout.flush),
         level=level,
         format=log_format or LOG_FORMAT_DEFAULT,
+        colorize=sys.stdout.isatty(),
     )
+    logger.add(LOG_BUFFER, level=level, format=LOG_FORMAT_NO_COLOR, colorize=False)
+    if file:
+        log_file = RotatingFile(file, max_bytes=max_bytes, backups=backups,
+                                compression=compression)
+        logger.add(AsyncSink(log_file.write, log_file.flush), level=level,
+                   format=LOG_FORMAT_NO_COLOR, colorize=False)
@@ -0,0 +1,183 @@
+"""轻量的计数器和耗时直方图
+
+默认关闭, 关闭时 counter/observe 直接返回, timer 返回共享的空上下文, 几乎没有开销.
+指标以 名称 + 标签 区分, 例如 pip.command{command=list,backend=worker}.
+"""
+import bisect
+import contextlib
+import heapq
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 直方图的桶上界, 单位: 秒
+BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 30, 60,
+           float("inf"))
+# 每个直方图保留的最慢记录数
+SLOWEST = 5
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def metric_key(name: str, labels: Dict[str, str]) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in sorted(labels.items())) + "}"
+
+
+class Histogram:
+
+    def __init__(self) -> None:
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        # (耗时, 说明) 的小顶堆, 只保留最慢的几条
+        self.slowest: List[Tuple[float, str]] = []
+
+    def observe(self, value: float, detail: str = ""):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if detail:
+            if len(self.slowest) < SLOWEST:
+                heapq.heappush(self.slowest, (value, detail))
+            elif value > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (value, detail))
+
+    def percentile(self, percent: float) -> float:
+        """按桶估算百分位数, 返回所在桶的上界 (不超过最大值)"""
+        if not self.count:
+            return 0
+        rank = self.count * percent / 100
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else 0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": {str(bound): count for bound, count in zip(BUCKETS, self.counts) if count},
+            "slowest": [{"seconds": value, "detail": detail}
+                        for value, detail in sorted(self.slowest, reverse=True)],
+        }
+
+
+class _Timer:
+
+    def __init__(self, metrics: "Metrics", name: str, detail: str, labels: dict) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.detail = detail
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.labels["error"] = exc_type.__name__
+        self.metrics.observe(self.name, time.perf_counter() - self.start, detail=self.detail,
+                             **self.labels)
+
+
+class Metrics:
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.started = time.time()
+        self._counters: Dict[str, float] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def counter(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = metric_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, detail: str = "", **labels):
+        if not self.enabled:
+            return
+        key = metric_key(name, labels)
+        with self._lock:
+            if (histogram := self._histograms.get(key)) is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds, detail)
+
+    def timer(self, name: str, detail: str = "", **labels):
+        """with metrics.timer("pip.command", command="list"): ...
+
+        代码块抛出异常时, 额外带上 error=异常类名 的标签
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, detail, labels)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        return self._histograms.get(metric_key(name, labels))
+
+    def total(self, prefix: str) -> Tuple[int, float]:
+        """名称以 prefix 开头的所有直方图的 (次数, 总耗时)"""
+        with self._lock:
+            histograms = [h for k, h in self._histograms.items() if k.startswith(prefix)]
+            return sum(h.count for h in histograms), sum(h.sum for h in histograms)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "started": self.started,
+                "uptime": time.time() - self.started,
+                "counters": dict(sorted(self._counters.items())),
+                "histograms": {k: h.to_dict() for k, h in sorted(self._histograms.items())},
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2, ensure_ascii=False)
+
+    def export(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json())
+
+    def summary(self) -> str:
+        """按总耗时排序的文本摘要"""
+        snapshot = self.snapshot()
+        lines = [f"{'metric':<60}{'count':>8}{'total':>10}{'p50':>10}{'p90':>10}{'max':>10}"]
+        histograms = sorted(snapshot["histograms"].items(), key=lambda item: -item[1]["sum"])
+        for key, h in histograms:
+            lines.append(f"{key:<60}{h['count']:>8}{h['sum']:>9.2f}s{h['p50'] * 1000:>8.0f}ms"
+                         f"{h['p90'] * 1000:>8.0f}ms{h['max'] * 1000:>8.0f}ms")
+            lines.extend(f"    {s['seconds'] * 1000:>8.0f}ms  {s['detail']}" for s in h["slowest"])
+        if snapshot["counters"]:
+            lines.append("")
+            lines.extend(f"{key:<60}{value:>8g}" for key, value in snapshot["counters"].items())
+        return "\n".join(lines)
+
+
+METRICS = Metrics()
@@ -0,0 +1,18 @@
+import os
+import pathlib
+import sys
+
+
+def cache_dir(*parts: str) -> pathlib.Path:
+    """pipui 的缓存目录, 不存在时自动创建"""
+    if root := os.getenv("PIPUI_CACHE_DIR"):
+        base = pathlib.Path(root)
+    elif sys.platform == "win32":
+        base = pathlib.Path(os.getenv("LOCALAPPDATA") or pathlib.Path.home()) / "pipui" / "Cache"
+    elif sys.platform == "darwin":
+        base = pathlib.Path.home() / "Library" / "Caches" / "pipui"
+    else:
+        base = pathlib.Path(os.getenv("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache") / "pipui"
+    path = base.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
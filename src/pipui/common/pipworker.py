@@ -0,0 +1,181 @@
+import itertools
+import json
+import os
+import queue
+import shlex
+import subprocess
+import threading
+from typing import Optional, Tuple
+
+from loguru import logger
+
+from pipui.common import executor, logging
+from pipui.common.metrics import METRICS
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pipworker_main.py")
+
+# 可以在常驻进程中执行的子命令, 其余命令 (install/uninstall 等) 仍使用独立进程
+WORKER_COMMANDS = {"--version", "config", "list", "show", "freeze", "inspect", "check",
+                   "help", "index", "debug", "cache"}
+# 这些命令会改变已安装的包 (包括 pip 自身), 执行后需要重启常驻进程
+MUTATING_COMMANDS = {"install", "uninstall"}
+
+
+class PipWorkerError(Exception):
+    pass
+
+
+class PipWorkerCrashed(PipWorkerError):
+    """工作进程已经退出 (输出结束或管道断开), 重启后可以重试"""
+
+
+class PipWorker:
+    """常驻 pip 进程的客户端, 请求串行执行"""
+
+    def __init__(self, python: str = "python", timeout: float = 120) -> None:
+        self.python = python
+        self.timeout = timeout
+        self.pip_version = ""
+        self._process: Optional[subprocess.Popen] = None
+        self._responses: queue.Queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    @staticmethod
+    def _read_responses(process: subprocess.Popen, responses: queue.Queue):
+        # 使用启动时的队列, 重启后旧进程的输出不会进入新进程的队列
+        for line in process.stdout:
+            responses.put(line)
+        responses.put(None)
+
+    def _next_response(self, timeout: Optional[float] = None) -> dict:
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            line = self._responses.get(timeout=timeout)
+        except queue.Empty as e:
+            self._kill()
+            raise PipWorkerError(f"pip worker timed out after {timeout}s") from e
+        if line is None:
+            self._kill()
+            raise PipWorkerCrashed("pip worker exited unexpectedly")
+        return json.loads(line)
+
+    def _start(self):
+        self._responses = queue.Queue()
+        # 以 -c 方式运行, 避免脚本所在目录 (含 logging.py) 被加入 sys.path
+        with open(SERVER_SCRIPT, encoding="utf-8") as f:
+            source = f.read()
+        try:
+            self._process = subprocess.Popen(
+                [self.python, "-u", "-c", source], stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, encoding="utf-8",
+                env=dict(os.environ, PYTHONIOENCODING="utf-8"),
+            )
+        except OSError as e:
+            raise PipWorkerError(f"start pip worker failed: {e}") from e
+        threading.Thread(target=self._read_responses, args=(self._process, self._responses),
+                         daemon=True, name="pip-worker-reader").start()
+        ready = self._next_response()
+        if not ready.get("ready"):
+            self._kill()
+            raise PipWorkerError(f"pip worker failed to start: {ready.get('error')}")
+        self.pip_version = ready.get("pip", "")
+        logger.debug("pip worker started, pid={} pip={}", self._process.pid, self.pip_version)
+
+    def _kill(self):
+        if self._process is None:
+            return
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._process = None
+
+    def _request(self, args, timeout: Optional[float] = None) -> Tuple[int, str]:
+        if not self.alive:
+            self._start()
+        request_id = next(self._ids)
+        try:
+            self._process.stdin.write(json.dumps({"id": request_id, "args": list(args)}) + "\n")
+            self._process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self._kill()
+            raise PipWorkerCrashed(f"pip worker is gone: {e}") from e
+        response = self._next_response(timeout)
+        if response.get("id") != request_id:
+            self._kill()
+            raise PipWorkerError(f"unexpected response {response}")
+        return response["status"], response["output"]
+
+    def request(self, *args, timeout: Optional[float] = None) -> Tuple[int, str]:
+        """执行一条 pip 命令; 工作进程崩溃时自动重启并重试一次
+
+        timeout: 等待结果的秒数, 默认为创建时指定的 timeout. 超时不重试, 命令可能会再次卡住,
+        直接抛出 PipWorkerError 由调用方回退到独立进程.
+        """
+        with self._lock:
+            try:
+                return self._request(args, timeout)
+            except PipWorkerCrashed as e:
+                logger.warning("{}, restarting", e)
+            return self._request(args, timeout)
+
+    def restart(self):
+        with self._lock:
+            self._kill()
+
+    def stop(self):
+        with self._lock:
+            if self.alive:
+                self._process.stdin.close()
+                try:
+                    self._process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    pass
+            self._kill()
+
+
+class PipWorkerExecutor(executor.Executor):
+    """优先通过常驻 pip 进程执行命令, 工作进程不可用时回退到 Executor 的行为"""
+
+    def __init__(self, python: str = "python", timeout: float = 120) -> None:
+        super().__init__(f"{shlex.quote(python) if os.name != 'nt' else python} -m pip")
+        self.worker = PipWorker(python, timeout=timeout)
+        self.worker_enabled = True
+
+    def execute(self, *args, timeout: Optional[float] = None):
+        if not self.worker_enabled or not args or args[0] not in WORKER_COMMANDS:
+            try:
+                return super().execute(*args, timeout=timeout)
+            finally:
+                if args and args[0] in MUTATING_COMMANDS:
+                    self.worker.restart()
+
+        logger.debug("RUN (worker): {}", " ".join(args))
+        try:
+            with METRICS.timer("pip.command", detail=" ".join(args), command=args[0],
+                               backend="worker"):
+                status, output = self.worker.request(*args, timeout=timeout)
+        except PipWorkerError as e:
+            logger.warning("pip worker unavailable, fallback to subprocess: {}", e)
+            self.worker_enabled = False
+            return super().execute(*args, timeout=timeout)
+        METRICS.counter("pip.status", command=args[0], status=status)
+        logger.opt(lazy=True).debug("Return: [{}], output:\n{}", lambda: status,
+                                    lambda: logging.tail(output))
+        if status != 0:
+            raise subprocess.CalledProcessError(status, output)
+        return status, output
+
+    def stream(self, *args, timeout=None, cancel=None):
+        try:
+            yield from super().stream(*args, timeout=timeout, cancel=cancel)
+        finally:
+            if args and args[0] in MUTATING_COMMANDS:
+                self.worker.restart()
+
+    def close(self):
+        self.worker.stop()
@@ -0,0 +1,59 @@
+"""常驻 pip 工作进程, 由 pipworker.PipWorker 启动, 在进程内执行 pip 命令
+
+本文件会被目标解释器直接运行, 只能依赖标准库和 pip 本身.
+
+协议: 每行一个 JSON 对象
+    启动: <- {"ready": true, "pip": "25.1.1"} 或 {"ready": false, "error": "..."}
+    请求: -> {"id": 1, "args": ["config", "list"]}
+    响应: <- {"id": 1, "status": 0, "output": "..."}
+"""
+import contextlib
+import importlib
+import io
+import json
+import os
+import sys
+
+
+def run_pip(pip_main, args):
+    importlib.invalidate_caches()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+        try:
+            status = pip_main(list(args))
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) or e.code is None else 1
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            output.write(f"ERROR: {type(e).__name__}: {e}")
+            status = 1
+    return status or 0, output.getvalue().rstrip("\n")
+
+
+def main():
+    # 协议独占原始 stdout, 其他任何写到 fd 1 的内容都转到 stderr
+    proto = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    os.dup2(2, 1)
+
+    def reply(data):
+        proto.write(json.dumps(data) + "\n")
+        proto.flush()
+
+    try:
+        import pip  # pylint: disable=import-outside-toplevel
+        from pip._internal.cli.main import \
+            main as pip_main  # pylint: disable=import-outside-toplevel
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        reply({"ready": False, "error": f"{type(e).__name__}: {e}"})
+        return
+    reply({"ready": True, "pip": pip.__version__})
+
+    for line in io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8"):
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        status, output = run_pip(pip_main, request.get("args", []))
+        reply({"id": request.get("id"), "status": status, "output": output})
+
+
+if __name__ == "__main__":
+    main()
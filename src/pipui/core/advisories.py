@@ -0,0 +1,227 @@
+"""离线的安全漏洞检查
+
+从本地的 OSV 格式数据 (单个 JSON, 目录或 osv.dev 提供的 PyPI/all.zip) 导入 PyPI 的漏洞,
+保存为以规范化的包名为键的索引, 每条漏洞预先整理为版本区间. 检查时每个包只需要一次字典查找,
+只有在索引中出现的包才解析版本和区间.
+"""
+import dataclasses
+import json
+import os
+import threading
+import zipfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+from packaging.utils import canonicalize_name
+
+from pipui.common import paths
+from pipui.common.metrics import METRICS
+from pipui.core import versions
+from pipui.core.modules import PyPackage
+
+# 索引格式变化时递增
+INDEX_VERSION = 1
+ECOSYSTEM = "PyPI"
+
+
+@dataclasses.dataclass
+class Advisory:
+    id: str
+    summary: str = ""
+    aliases: List[str] = dataclasses.field(default_factory=list)
+    # 修复了该漏洞的版本
+    fixed: List[str] = dataclasses.field(default_factory=list)
+
+    def __str__(self) -> str:
+        return self.id
+
+
+def _range_intervals(events: List[dict]) -> List[list]:
+    """OSV 的 ECOSYSTEM 区间转换为 [起始版本, 结束版本, 是否包含结束版本]
+
+    起始版本为 "0" 表示从最早的版本开始, 结束版本为空表示至今未修复.
+    """
+    parsed = []
+    for event in events:
+        kind, version = next(iter(event.items()), (None, None))
+        if kind not in ("introduced", "fixed", "last_affected") or version is None:
+            continue
+        if (key := versions.parse(version)) is None:
+            return []
+        parsed.append((key, kind != "introduced", kind, version))
+    intervals, start = [], None
+    # 同一个版本上先处理 introduced
+    for _, _, kind, version in sorted(parsed, key=lambda item: item[:2]):
+        if kind == "introduced":
+            start = start if start is not None else version
+        elif start is not None:
+            intervals.append([start, version, kind == "last_affected"])
+            start = None
+    if start is not None:
+        intervals.append([start, "", False])
+    return intervals
+
+
+def convert_osv(record: dict) -> Tuple[Optional[dict], Dict[str, list]]:
+    """把一条 OSV 记录转换为 (漏洞信息, {规范化的包名: [id, 区间, 受影响的版本]})"""
+    if record.get("withdrawn") or not record.get("id"):
+        return None, {}
+    packages: Dict[str, list] = {}
+    fixed = []
+    for affected in record.get("affected", []):
+        package = affected.get("package", {})
+        if package.get("ecosystem") != ECOSYSTEM or not package.get("name"):
+            continue
+        intervals = []
+        for affected_range in affected.get("ranges", []):
+            if affected_range.get("type") in ("ECOSYSTEM", "SEMVER"):
+                intervals.extend(_range_intervals(affected_range.get("events", [])))
+        fixed.extend(end for _, end, inclusive in intervals if end and not inclusive)
+        entry = packages.setdefault(canonicalize_name(package["name"]), [record["id"], [], []])
+        entry[1].extend(intervals)
+        entry[2].extend(affected.get("versions", []))
+    if not packages:
+        return None, {}
+    info = {"summary": record.get("summary") or record.get("details", "")[:200],
+            "aliases": record.get("aliases", []), "fixed": sorted(set(fixed))}
+    return info, packages
+
+
+def iter_osv_records(source: str) -> Iterator[dict]:
+    """读取 JSON 文件 (一条记录或记录的列表), 目录或 zip 中所有的 .json"""
+    def load(data: bytes, name: str) -> Iterator[dict]:
+        try:
+            record = json.loads(data)
+        except ValueError as e:
+            logger.warning("skip invalid advisory {}: {}", name, e)
+            return
+        yield from record if isinstance(record, list) else [record]
+
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for filename in sorted(files):
+                if filename.endswith(".json"):
+                    with open(os.path.join(root, filename), "rb") as f:
+                        yield from load(f.read(), filename)
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for name in archive.namelist():
+                if name.endswith(".json"):
+                    yield from load(archive.read(name), name)
+    else:
+        with open(source, "rb") as f:
+            yield from load(f.read(), source)
+
+
+class AdvisoryDatabase:
+    """导入的漏洞索引
+
+    文件内容: {"advisories": {id: 漏洞信息}, "packages": {规范化的包名: [[id, 区间, 版本]]}}
+    """
+
+    def __init__(self, index_file=None) -> None:
+        self.index_file = str(index_file or paths.cache_dir() / "advisories.json")
+        self._advisories: Dict[str, dict] = {}
+        self._packages: Dict[str, list] = {}
+        # 规范化的包名 -> [(Advisory, [(起始, 结束, 是否包含结束)], {受影响的版本})],
+        # 第一次检查该包时才解析
+        self._compiled: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._loaded_mtime: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._advisories)
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.index_file)
+
+    def load(self) -> bool:
+        """读取索引, 文件没有变化时不重新读取"""
+        try:
+            mtime = os.stat(self.index_file).st_mtime
+        except OSError:
+            return False
+        with self._lock:
+            if mtime == self._loaded_mtime:
+                return True
+            try:
+                with open(self.index_file, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("load advisories failed: {}", e)
+                return False
+            if data.get("version") != INDEX_VERSION:
+                return False
+            self._advisories = data.get("advisories", {})
+            self._packages = data.get("packages", {})
+            self._compiled = {}
+            self._loaded_mtime = mtime
+        logger.info("loaded {} advisories of {} packages",
+                    len(self._advisories), len(self._packages))
+        return True
+
+    def import_osv(self, source: str) -> int:
+        """从 OSV 数据导入, 替换原有的索引; 返回导入的漏洞数量"""
+        advisories: Dict[str, dict] = {}
+        packages: Dict[str, list] = {}
+        with METRICS.timer("advisory.import", detail=source):
+            for record in iter_osv_records(source):
+                info, affected = convert_osv(record)
+                if info is None:
+                    continue
+                advisories[record["id"]] = info
+                for key, entry in affected.items():
+                    packages.setdefault(key, []).append(entry)
+        data = json.dumps({"version": INDEX_VERSION, "source": os.path.abspath(source),
+                           "advisories": advisories, "packages": packages},
+                          separators=(",", ":"))
+        tmp_file = f"{self.index_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_file, self.index_file)
+        logger.info("imported {} advisories of {} packages from {}",
+                    len(advisories), len(packages), source)
+        self.load()
+        return len(advisories)
+
+    def _compile(self, key: str) -> list:
+        compiled = []
+        for advisory_id, intervals, affected_versions in self._packages.get(key, []):
+            info = self._advisories.get(advisory_id, {})
+            advisory = Advisory(advisory_id, info.get("summary", ""),
+                                info.get("aliases", []), info.get("fixed", []))
+            ranges = []
+            for start, end, inclusive in intervals:
+                start_version = versions.parse(start)
+                end_version = versions.parse(end) if end else None
+                if start_version is not None and (end_version is not None or not end):
+                    ranges.append((start_version, end_version, inclusive))
+            compiled.append((advisory, ranges, set(affected_versions)))
+        return compiled
+
+    def affected(self, name: str, version: str) -> List[Advisory]:
+        """指定版本受影响的漏洞"""
+        key = canonicalize_name(name)
+        if key not in self._packages:
+            return []
+        with self._lock:
+            if (compiled := self._compiled.get(key)) is None:
+                compiled = self._compiled[key] = self._compile(key)
+        parsed = versions.parse(version)
+        result = []
+        for advisory, ranges, affected_versions in compiled:
+            if version in affected_versions or parsed is not None and any(
+                    start <= parsed and (end is None or parsed < end or inclusive and parsed == end)
+                    for start, end, inclusive in ranges):
+                result.append(advisory)
+        return result
+
+    def check(self, packages: Iterable[PyPackage]) -> Dict[str, List[Advisory]]:
+        """批量检查, 返回 {包名: [漏洞]}, 只包含受影响的包"""
+        with METRICS.timer("advisory.check"):
+            results = {}
+            for package in packages:
+                if advisories := self.affected(package.name, package.version):
+                    results[package.name] = advisories
+        return results
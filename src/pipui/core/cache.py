@@ -0,0 +1,139 @@
+import dataclasses
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+from pipui.common import paths
+
+DEFAULT_TTL = 60 * 60
+DEFAULT_MAX_ENTRIES = 10000
+# 读取时的访问时间先记在内存中, 积累到这么多条或超过这么多秒时才单独提交
+ACCESS_FLUSH_SIZE = 500
+ACCESS_FLUSH_INTERVAL = 30
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    name: str
+    version: str
+    etag: str = ""
+    last_modified: str = ""
+    fetched_at: float = 0
+
+
+class VersionCache:
+    """包最新版本的持久化缓存
+
+    过期 (超过 ttl) 的条目依然保留 ETag/Last-Modified, 用于条件请求重新验证;
+    条目数超过 max_entries 时按最近访问时间淘汰. 读取不单独提交事务, 访问时间与下一次
+    put/touch 一起写入; 访问时间只用于淘汰, 退出时丢失最后几条的影响可以忽略.
+    """
+
+    def __init__(self, path=None, ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.path = str(path or paths.cache_dir() / "versions.sqlite")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS versions (
+                source TEXT NOT NULL,
+                name TEXT NOT NULL,
+                version TEXT NOT NULL,
+                etag TEXT NOT NULL DEFAULT '',
+                last_modified TEXT NOT NULL DEFAULT '',
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (source, name)
+            );
+            CREATE INDEX IF NOT EXISTS versions_accessed ON versions (accessed_at);
+            """
+        )
+        self._count = self._conn.execute("SELECT COUNT(*) FROM versions").fetchone()[0]
+        # (source, name) -> 尚未写入的访问时间
+        self._accessed: Dict[Tuple[str, str], float] = {}
+        self._accessed_written = time.monotonic()
+
+    def get(self, source: str, name: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, etag, last_modified, fetched_at FROM versions"
+                " WHERE source = ? AND name = ?", (source, name)
+            ).fetchone()
+            if not row:
+                return None
+            self._accessed[(source, name)] = time.time()
+            if len(self._accessed) >= ACCESS_FLUSH_SIZE \
+                    or time.monotonic() - self._accessed_written >= ACCESS_FLUSH_INTERVAL:
+                self._write_accessed()
+                self._conn.commit()
+        return CacheEntry(name, *row)
+
+    def _write_accessed(self):
+        """在当前事务中写入内存中的访问时间, 由调用方提交"""
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE versions SET accessed_at = ? WHERE source = ? AND name = ?",
+                [(accessed_at, source, name)
+                 for (source, name), accessed_at in self._accessed.items()])
+            self._accessed.clear()
+        self._accessed_written = time.monotonic()
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.fetched_at < self.ttl
+
+    def put(self, source: str, name: str, version: str, etag: str = "", last_modified: str = ""):
+        now = time.time()
+        with self._lock:
+            self._write_accessed()
+            existed = self._conn.execute("SELECT 1 FROM versions WHERE source = ? AND name = ?",
+                                         (source, name)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO versions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (source, name, version, etag or "", last_modified or "", now, now))
+            if not existed:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def touch(self, source: str, name: str):
+        """条件请求返回 304 时刷新获取时间"""
+        now = time.time()
+        with self._lock:
+            self._write_accessed()
+            self._conn.execute(
+                "UPDATE versions SET fetched_at = ?, accessed_at = ? WHERE source = ? AND name = ?",
+                (now, now, source, name)
+            )
+            self._conn.commit()
+
+    def _evict(self):
+        # 淘汰到上限的 90%, 避免每次写入都触发淘汰
+        keep = int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM versions WHERE rowid IN ("
+            " SELECT rowid FROM versions ORDER BY accessed_at ASC LIMIT ?)",
+            (self._count - keep,)
+        )
+        logger.debug("evict {} cached versions", self._count - keep)
+        self._count = keep
+
+    def clear(self):
+        with self._lock:
+            self._accessed.clear()
+            self._conn.execute("DELETE FROM versions")
+            self._conn.commit()
+            self._count = 0
+
+    def close(self):
+        with self._lock:
+            self._write_accessed()
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from loguru import logger
+from packaging.markers import InvalidMarker, UndefinedEnvironmentName
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+from pipui.common import paths
+from pipui.core.modules import PyPackage
+from pipui.core.pkgindex import IndexChanges, cache_key
+
+# 缓存文件格式变化时递增
+GRAPH_VERSION = 1
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _read_egg_requires(dist_path: str) -> List[str]:
+    """egg-info/requires.txt: 分节 [extra] / [:marker] / [extra:marker] 转换为 Requires-Dist 格式"""
+    requires, section_marker = [], ""
+    try:
+        with open(os.path.join(dist_path, "requires.txt"), encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("[") and line.endswith("]"):
+                    extra, _, marker = line[1:-1].partition(":")
+                    markers = [f"({marker})"] if marker else []
+                    if extra:
+                        markers.append(f'extra == "{extra}"')
+                    section_marker = " and ".join(markers)
+                    continue
+                requires.append(f"{line}; {section_marker}" if section_marker else line)
+    except OSError:
+        pass
+    return requires
+
+
+def read_requires(dist_path: str) -> List[str]:
+    """读取 Requires-Dist, 只解析元数据的头部"""
+    if dist_path.endswith(".egg-info") and os.path.isdir(dist_path):
+        return _read_egg_requires(dist_path)
+    metadata_file = os.path.join(dist_path, "METADATA") if os.path.isdir(dist_path) \
+        else dist_path
+    requires = []
+    try:
+        with open(metadata_file, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    break
+                key, _, value = line.partition(":")
+                if key == "Requires-Dist":
+                    requires.append(value.strip())
+    except OSError:
+        pass
+    return requires
+
+
+def evaluate_requires(requires: Iterable[str]) -> List[str]:
+    """对当前解释器求值环境标记, 返回必需依赖的规范化包名 (不包含 extra 引入的可选依赖)"""
+    names = []
+    for value in requires:
+        try:
+            requirement = Requirement(value)
+            if requirement.marker and not requirement.marker.evaluate({"extra": ""}):
+                continue
+        except (InvalidRequirement, InvalidMarker, UndefinedEnvironmentName) as e:
+            logger.debug("skip requirement {!r}: {}", value, e)
+            continue
+        if (name := canonicalize_name(requirement.name)) not in names:
+            names.append(name)
+    return names
+
+
+class DependencyGraph:
+    """已安装包的依赖图, 同时保存正向和反向的邻接表
+
+    节点以规范化的包名为键, 依赖和被依赖的查询都是 O(1); 包发生变化时只重新读取
+    变化的包的元数据并调整相关的边. 图保存在缓存目录中, 以元数据目录的 mtime 判断是否过期.
+    依赖包的 extra (例如 requests[socks]) 引入的可选依赖不计入.
+    """
+
+    def __init__(self, search_paths: Optional[List[str]] = None, cache_file=None) -> None:
+        self.cache_file = str(cache_file or
+                              paths.cache_dir() / f"deps-{cache_key(search_paths)}.json")
+        # 包名 -> {"name", "path", "mtime", "requires": [依赖的包名]}
+        self._nodes: Dict[str, dict] = {}
+        self._dependents: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+        self._dirty = False
+
+    def load(self) -> bool:
+        try:
+            with open(self.cache_file, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != GRAPH_VERSION:
+            return False
+        with self._lock:
+            self._nodes = data.get("nodes", {})
+            self._dependents = {}
+            for key, node in self._nodes.items():
+                for dependency in node["requires"]:
+                    self._dependents.setdefault(dependency, set()).add(key)
+        return True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps({"version": GRAPH_VERSION, "nodes": self._nodes})
+            self._dirty = False
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            logger.warning("save dependency graph failed: {}", e)
+
+    def _set_node(self, key: str, node: Optional[dict]):
+        if old := self._nodes.pop(key, None):
+            for dependency in old["requires"]:
+                if dependents := self._dependents.get(dependency):
+                    dependents.discard(key)
+                    if not dependents:
+                        del self._dependents[dependency]
+        if node is not None:
+            self._nodes[key] = node
+            for dependency in node["requires"]:
+                self._dependents.setdefault(dependency, set()).add(key)
+        self._dirty = True
+
+    def _read_node(self, package: PyPackage, mtime: Optional[float]) -> dict:
+        return {"name": package.name, "path": package.path, "mtime": mtime,
+                "requires": evaluate_requires(read_requires(package.path))}
+
+    def update(self, packages: List[PyPackage]) -> int:
+        """与已安装的包同步, 只读取路径或 mtime 变化的包, 返回重新读取的数量"""
+        with self._lock:
+            current = {canonicalize_name(p.name): p for p in packages}
+            for key in self._nodes.keys() - current.keys():
+                self._set_node(key, None)
+            read = 0
+            for key, package in current.items():
+                mtime = _mtime(package.path) if package.path else None
+                node = self._nodes.get(key)
+                if node and node["path"] == package.path and node["mtime"] == mtime:
+                    continue
+                self._set_node(key, self._read_node(package, mtime))
+                read += 1
+        if read:
+            logger.debug("dependency graph updated, {} packages read", read)
+        return read
+
+    def apply_changes(self, changes: IndexChanges):
+        """按包索引的增量变化更新"""
+        with self._lock:
+            for package in changes.removed:
+                self._set_node(canonicalize_name(package.name), None)
+            for package in changes.added + changes.changed:
+                mtime = _mtime(package.path) if package.path else None
+                self._set_node(canonicalize_name(package.name), self._read_node(package, mtime))
+
+    def __contains__(self, name: str) -> bool:
+        return canonicalize_name(name) in self._nodes
+
+    def name(self, key: str) -> str:
+        """规范化的包名对应的原始包名"""
+        node = self._nodes.get(key)
+        return node["name"] if node else key
+
+    def dependencies(self, name: str) -> Set[str]:
+        """已安装的直接依赖"""
+        with self._lock:
+            node = self._nodes.get(canonicalize_name(name))
+            return {d for d in node["requires"] if d in self._nodes} if node else set()
+
+    def dependents(self, name: str) -> Set[str]:
+        """依赖该包的已安装的包"""
+        with self._lock:
+            return set(self._dependents.get(canonicalize_name(name), ()))
+
+    def not_required(self) -> Set[str]:
+        """没有被任何已安装的包依赖的包 (与 pip list --not-required 一致)"""
+        with self._lock:
+            return {key for key in self._nodes if not self._dependents.get(key)}
+
+    def orphans_after(self, names: Iterable[str]) -> Set[str]:
+        """卸载 names 后不再被任何包依赖的包 (逐层传递), 不包括 names 本身"""
+        with self._lock:
+            removed = {canonicalize_name(name) for name in names}
+            pending = list(removed)
+            orphans = set()
+            while pending:
+                for dependency in self.dependencies(pending.pop()):
+                    if dependency in removed or dependency in orphans:
+                        continue
+                    if self._dependents.get(dependency, set()) <= removed | orphans:
+                        orphans.add(dependency)
+                        pending.append(dependency)
+            return orphans
@@ -0,0 +1,182 @@
+"""已安装包占用的磁盘空间
+
+按元数据中的文件列表 (RECORD, 或 egg-info 的 installed-files.txt) 在线程池中 stat 每个文件;
+结果按 .dist-info/.egg-info 目录的 mtime 缓存, 包没有重新安装时不再统计.
+没有文件列表的包 (例如 develop 安装的 egg-info) 大小未知.
+"""
+import csv
+import json
+import os
+import threading
+from concurrent import futures
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from pipui.common import paths
+from pipui.common.metrics import METRICS
+from pipui.core.modules import PyPackage
+from pipui.core.pkgindex import cache_key
+
+# 缓存文件格式变化时递增
+SIZES_VERSION = 2
+# stat 的大部分时间在等待文件系统, 线程数可以多于 CPU 核数
+DEFAULT_WORKERS = 8
+# 每个线程任务统计的包数, 小包很多时减少线程池的调度开销
+BATCH_SIZE = 32
+
+_UNITS = ("B", "KB", "MB", "GB", "TB")
+
+
+def format_size(size: float) -> str:
+    for unit in _UNITS:
+        if size < 1024 or unit == _UNITS[-1]:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return ""
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def dist_files(dist_path: str) -> Optional[List[str]]:
+    """元数据中记录的已安装文件的绝对路径, 没有文件列表时返回 None
+
+    RECORD 直接按 csv 解析, 比 Distribution.files 为每个文件创建 PackagePath 快几倍, 路径相对于
+    元数据目录的上一级. egg-info 读取 installed-files.txt, 路径相对于 egg-info 目录;
+    Python 3.9 的 Distribution.files 在这里会退回到 SOURCES.txt (源码树中的路径), 不能使用.
+    """
+    dist_path = os.path.abspath(dist_path)
+    if dist_path.endswith(".egg-info"):
+        filename, base = "installed-files.txt", dist_path
+    else:
+        filename, base = "RECORD", os.path.dirname(dist_path)
+    try:
+        with open(os.path.join(dist_path, filename), encoding="utf-8", newline="") as f:
+            if filename == "RECORD":
+                names = [row[0] for row in csv.reader(f) if row]
+            else:
+                names = [line.strip() for line in f if line.strip()]
+    except OSError:
+        return None
+    return list({os.path.normpath(os.path.join(base, name)) for name in names})
+
+
+def measure(dist_path: str) -> Optional[Tuple[int, int]]:
+    """返回 (总字节数, 文件数), 不存在的文件不计入; 符号链接按链接本身计算
+
+    没有文件列表时返回 None
+    """
+    if (files := dist_files(dist_path)) is None:
+        return None
+    size = count = 0
+    for path in files:
+        try:
+            size += os.lstat(path).st_size
+            count += 1
+        except OSError:
+            continue
+    return size, count
+
+
+class DiskUsage:
+    """每个包的磁盘占用, 缓存在缓存目录中, 以元数据目录的 mtime 判断是否过期"""
+
+    def __init__(self, search_paths: Optional[List[str]] = None, cache_file=None) -> None:
+        self.cache_file = str(cache_file or
+                              paths.cache_dir() / f"sizes-{cache_key(search_paths)}.json")
+        # 元数据目录 -> {"mtime", "size", "files"}
+        self._entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def load(self) -> bool:
+        try:
+            with open(self.cache_file, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != SIZES_VERSION:
+            return False
+        with self._lock:
+            self._entries = data.get("entries", {})
+        return True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps({"version": SIZES_VERSION, "entries": self._entries})
+            self._dirty = False
+        tmp_file = f"{self.cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            logger.warning("save disk usage failed: {}", e)
+
+    def cached(self, package: PyPackage, mtime: Optional[float] = None) -> Optional[int]:
+        mtime = _mtime(package.path) if mtime is None else mtime
+        with self._lock:
+            entry = self._entries.get(package.path)
+        return entry["size"] if entry and entry["mtime"] == mtime else None
+
+    def _measure(self, batch: List[Tuple[PyPackage, Optional[float]]]) -> List[Tuple[str, int]]:
+        results = []
+        with METRICS.timer("disk.measure", packages=len(batch)):
+            for package, mtime in batch:
+                try:
+                    measured = measure(package.path)
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    logger.warning("measure {} failed: {}", package.name, e)
+                    continue
+                if measured is None:
+                    logger.debug("no file list for {}, size is unknown", package.name)
+                    continue
+                size, count = measured
+                with self._lock:
+                    self._entries[package.path] = {"mtime": mtime, "size": size, "files": count}
+                    self._dirty = True
+                results.append((package.name, size))
+        return results
+
+    def iter_sizes(self, packages: List[PyPackage], workers: int = DEFAULT_WORKERS,
+                   cancel: Optional[threading.Event] = None) -> Iterator[Tuple[str, int]]:
+        """返回每个包的 (包名, 字节数): 先返回缓存中的, 再按完成顺序返回新统计的
+
+        packages 应当是环境中全部的包, 缓存中其他的条目会被删除
+        """
+        with self._lock:
+            current = {package.path for package in packages if package.path}
+            if stale := self._entries.keys() - current:
+                for path in stale:
+                    del self._entries[path]
+                self._dirty = True
+        missing = []
+        for package in packages:
+            if not package.path:
+                continue
+            mtime = _mtime(package.path)
+            if (size := self.cached(package, mtime)) is not None:
+                yield package.name, size
+            else:
+                missing.append((package, mtime))
+        if not missing:
+            return
+        logger.debug("measure disk usage of {} packages", len(missing))
+        pool = futures.ThreadPoolExecutor(max_workers=max(workers, 1),
+                                          thread_name_prefix="disk-usage")
+        try:
+            tasks = [pool.submit(self._measure, missing[i:i + BATCH_SIZE])
+                     for i in range(0, len(missing), BATCH_SIZE)]
+            for task in futures.as_completed(tasks):
+                if cancel is not None and cancel.is_set():
+                    break
+                yield from task.result()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
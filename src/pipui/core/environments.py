@@ -0,0 +1,218 @@
+"""发现本机的 Python 环境 (venv/virtualenv, conda), 不启动解释器读取已安装的包"""
+import dataclasses
+import glob
+import multiprocessing
+import os
+import sys
+from concurrent import futures
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+from packaging.utils import canonicalize_name
+
+from pipui.core.manager import pip
+from pipui.core.modules import PyPackage
+
+KIND_CURRENT = "current"
+KIND_VENV = "venv"
+KIND_CONDA = "conda"
+
+# 额外的环境搜索目录, 多个目录使用 os.pathsep 分隔
+ENV_PATHS_VAR = "PIPUI_ENV_PATHS"
+# 在搜索目录下查找 pyvenv.cfg 的最大深度
+SEARCH_DEPTH = 2
+
+
+@dataclasses.dataclass
+class Environment:
+    name: str
+    prefix: str
+    kind: str
+    python: str
+    site_packages: List[str] = dataclasses.field(default_factory=list)
+
+
+def read_pyvenv_cfg(prefix: str) -> Dict[str, str]:
+    config = {}
+    try:
+        with open(os.path.join(prefix, "pyvenv.cfg"), encoding="utf-8") as f:
+            for line in f:
+                key, sep, value = line.partition("=")
+                if sep:
+                    config[key.strip().lower()] = value.strip()
+    except OSError:
+        pass
+    return config
+
+
+def find_python(prefix: str) -> str:
+    candidates = ["Scripts/python.exe", "python.exe"] if os.name == "nt" \
+        else ["bin/python", "bin/python3"]
+    for candidate in candidates:
+        path = os.path.join(prefix, candidate)
+        if os.path.isfile(path):
+            return path
+    return ""
+
+
+def find_site_packages(prefix: str) -> List[str]:
+    """按目录结构查找 site-packages, 例如 lib/python3.x/site-packages 或 Lib/site-packages"""
+    patterns = [os.path.join(prefix, "Lib", "site-packages")] if os.name == "nt" else [
+        os.path.join(prefix, lib, "python*", "site-packages") for lib in ("lib", "lib64")
+    ]
+    found, seen = [], set()
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            if os.path.isdir(path) and (real := os.path.realpath(path)) not in seen:
+                seen.add(real)
+                found.append(path)
+    return found
+
+
+def venv_environment(prefix: str, name: str = "") -> Optional[Environment]:
+    config = read_pyvenv_cfg(prefix)
+    python = find_python(prefix)
+    if not config or not python:
+        return None
+    site_packages = find_site_packages(prefix)
+    if config.get("include-system-site-packages", "").lower() == "true" and config.get("home"):
+        # home 是基础解释器所在的 bin 目录
+        base = os.path.dirname(config["home"]) if os.name != "nt" else config["home"]
+        site_packages += find_site_packages(base)
+    return Environment(name or os.path.basename(prefix), prefix, KIND_VENV, python,
+                       site_packages)
+
+
+def conda_environment(prefix: str) -> Optional[Environment]:
+    python = find_python(prefix)
+    if not python or not os.path.isdir(os.path.join(prefix, "conda-meta")):
+        return None
+    return Environment(os.path.basename(prefix), prefix, KIND_CONDA, python,
+                       find_site_packages(prefix))
+
+
+def current_environment() -> Environment:
+    site_packages = [path for path in sys.path
+                     if path.endswith("site-packages") and os.path.isdir(path)]
+    return Environment("当前环境", sys.prefix, KIND_CURRENT, sys.executable, site_packages)
+
+
+def conda_prefixes() -> List[str]:
+    """~/.conda/environments.txt 中登记的环境以及 CONDA_PREFIX"""
+    prefixes = []
+    try:
+        with open(os.path.expanduser(os.path.join("~", ".conda", "environments.txt")),
+                  encoding="utf-8") as f:
+            prefixes.extend(line.strip() for line in f if line.strip())
+    except OSError:
+        pass
+    if conda_prefix := os.getenv("CONDA_PREFIX"):
+        prefixes.append(conda_prefix)
+    return prefixes
+
+
+def search_roots() -> List[str]:
+    roots = [os.getenv("WORKON_HOME", "")]
+    roots += [os.path.expanduser(os.path.join("~", *parts)) for parts in [
+        (".virtualenvs",), (".venvs",), ("venvs",), (".local", "share", "virtualenvs"),
+        (".pyenv", "versions"), (".cache", "pypoetry", "virtualenvs"),
+    ]]
+    roots += os.getenv(ENV_PATHS_VAR, "").split(os.pathsep)
+    return [root for root in roots if root and os.path.isdir(root)]
+
+
+def _find_venvs(root: str, depth: int = SEARCH_DEPTH) -> Iterator[str]:
+    if os.path.isfile(os.path.join(root, "pyvenv.cfg")):
+        yield root
+        return
+    if depth <= 0:
+        return
+    try:
+        entries = sorted(os.scandir(root), key=lambda entry: entry.name)
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir() and not entry.name.startswith("."):
+            yield from _find_venvs(entry.path, depth - 1)
+
+
+def discover_environments(roots: Optional[Iterable[str]] = None) -> List[Environment]:
+    """当前环境 + conda 环境 + 搜索目录下的 venv, 按实际路径去重"""
+    environments = [current_environment()]
+    for prefix in conda_prefixes():
+        if env := conda_environment(prefix):
+            environments.append(env)
+    for root in search_roots() if roots is None else roots:
+        for prefix in _find_venvs(root):
+            if env := venv_environment(prefix):
+                environments.append(env)
+
+    unique, seen = [], set()
+    for env in environments:
+        if (real := os.path.realpath(env.prefix)) not in seen:
+            seen.add(real)
+            unique.append(env)
+    logger.debug("discovered {} environments", len(unique))
+    return unique
+
+
+def manager_for(env: Environment, **kwargs) -> pip.PipManager:
+    """管理指定环境的 PipManager, 包列表直接读取该环境的 site-packages"""
+    return pip.PipManager(python=env.python, search_paths=env.site_packages, **kwargs)
+
+
+def scan_environment(env: Environment) -> List[PyPackage]:
+    """通过该环境的 PipManager 读取 site-packages 中的元数据, 使用与当前环境相同的增量索引缓存
+
+    只需要包列表, 不读取依赖, 也不写入依赖图的缓存
+    """
+    if not env.site_packages:
+        return []
+    index = manager_for(env).package_index
+    index.refresh()
+    index.save()
+    return index.packages()
+
+
+def scan_environments(environments: List[Environment],
+                      workers: Optional[int] = None) -> Dict[str, List[PyPackage]]:
+    """在进程池中同时扫描所有环境, 返回 prefix -> 包列表; 进程池不可用时使用线程池
+
+    调用方的进程中已经有 Qt 和调度器的线程, fork 可能死锁, 子进程使用 spawn 启动.
+    """
+    results: Dict[str, List[PyPackage]] = {}
+    try:
+        pool = futures.ProcessPoolExecutor(max_workers=workers,
+                                           mp_context=multiprocessing.get_context("spawn"))
+    except (OSError, NotImplementedError) as e:
+        logger.warning("process pool is unavailable, scan with threads: {}", e)
+        pool = futures.ThreadPoolExecutor(max_workers=workers)
+    with pool:
+        tasks = {pool.submit(scan_environment, env): env for env in environments}
+        for task in futures.as_completed(tasks):
+            env = tasks[task]
+            try:
+                results[env.prefix] = task.result()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error("scan environment {} failed: {}", env.prefix, e)
+                results[env.prefix] = []
+    return results
+
+
+def iter_shared_last_versions(
+    env_packages: Dict[str, List[PyPackage]],
+    lookup: Callable[[Iterable[str]], Iterator[Tuple[str, Optional[str], Optional[Exception]]]],
+) -> Iterator[Tuple[str, Optional[str], Optional[Exception]]]:
+    """所有环境中的包按规范化的包名去重后只查询一次, 查询结果写回每个环境的包
+
+    lookup 通常是 PipManager.iter_last_versions
+    """
+    by_name: Dict[str, List[PyPackage]] = {}
+    for packages in env_packages.values():
+        for package in packages:
+            by_name.setdefault(canonicalize_name(package.name), []).append(package)
+    for name, version, error in lookup(list(by_name)):
+        if version:
+            for package in by_name[name]:
+                package.new_version = version
+        yield name, version, error
@@ -0,0 +1,75 @@
+import dataclasses
+import threading
+from typing import List, Optional, Set
+
+from packaging.utils import canonicalize_name
+
+ACTION_UPGRADE = "upgrade"
+ACTION_UNINSTALL = "uninstall"
+
+
+@dataclasses.dataclass
+class PipJob:
+    action: str
+    names: List[str]
+
+    @property
+    def keys(self) -> Set[str]:
+        return {canonicalize_name(name) for name in self.names}
+
+
+@dataclasses.dataclass
+class JobResult:
+    action: str
+    name: str
+    success: bool
+    # 更新后的版本及版本是否变化
+    version: str = ""
+    changed: bool = False
+    cancelled: bool = False
+
+
+class JobQueue:
+    """pip 任务队列
+
+    取任务时把排队中相同类型的任务合并成一批, 以便一次 pip 调用完成;
+    如果某个任务与排在它前面、未被合并的任务涉及同一个包, 则保持原有顺序, 留到下一批.
+    """
+
+    def __init__(self) -> None:
+        self._pending: List[PipJob] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def submit(self, action: str, *names: str):
+        with self._lock:
+            self._pending.append(PipJob(action, list(names)))
+
+    def clear(self) -> List[PipJob]:
+        with self._lock:
+            pending, self._pending = self._pending, []
+        return pending
+
+    def take_batch(self) -> Optional[PipJob]:
+        with self._lock:
+            if not self._pending:
+                return None
+            first = self._pending[0]
+            batch = PipJob(first.action, [])
+            batch_keys: Set[str] = set()
+            blocked: Set[str] = set()
+            remaining = []
+            for job in self._pending:
+                if job.action != first.action or job.keys & blocked:
+                    remaining.append(job)
+                    blocked |= job.keys
+                    continue
+                for name in job.names:
+                    if (key := canonicalize_name(name)) not in batch_keys:
+                        batch.names.append(name)
+                        batch_keys.add(key)
+            self._pending = remaining
+        return batch
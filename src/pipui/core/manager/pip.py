@@ -1,16 +1,166 @@
-from importlib.metadata import distributions
-from typing import List
+import importlib
+import os
+import subprocess
+import sys
+import threading
+from concurrent import futures
+from importlib import metadata
+from typing import (TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional,
+                    Tuple)
 
-import requests
+from loguru import logger
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion, Version
 
-from pipui.common import executor
+from pipui.common import executor, pipworker
+from pipui.core import cache, versions
+from pipui.core.advisories import Advisory, AdvisoryDatabase
+from pipui.core.depgraph import DependencyGraph
+from pipui.core.disksize import DiskUsage
+from pipui.core.manager.pipconfig import PipConfiguration
+from pipui.core.manager.progress import InstallProgress, PipProgressParser
 from pipui.core.modules import PyPackage
+from pipui.core.pkgindex import IndexChanges, PackageIndex
+from pipui.core.snapshots import Snapshot
+from pipui.core.wheelhouse import (DEFAULT_MAX_BYTES, PrefetchResult,
+                                   Wheelhouse, WheelPrefetcher)
+
+if TYPE_CHECKING:
+    from pipui.core.manager import pypi
+
+DEFAULT_WORKERS = 8
+
+LOOKUP_SIMPLE = "simple"
+LOOKUP_JSON = "json"
 
 
 class PipManager:
 
-    def __init__(self) -> None:
-        self.pip_cmd = executor.Executor("python -m pip")
+    def __init__(self, workers: int = DEFAULT_WORKERS, lookup: str = LOOKUP_SIMPLE,
+                 python: str = "python", search_paths: Optional[List[str]] = None) -> None:
+        """python: 执行 pip 的解释器; search_paths: 读取已安装包的目录, 默认为当前环境"""
+        self.python = python
+        self.search_paths = search_paths
+        self.pip_cmd = pipworker.PipWorkerExecutor(python)
+        self.workers = workers
+        self.lookup = lookup
+        self._version_cache = None
+        self._cache_ttl = cache.DEFAULT_TTL
+        self.config = PipConfiguration(site_prefix=self._site_prefix(python))
+        self._pypi = None
+        self._pypi_lock = threading.Lock()
+        self._package_index = None
+        self._dependency_graph = None
+        self._disk_usage = None
+        self._advisories = None
+        self.prefetch = False
+        self._prefetch_bandwidth = 0
+        self._wheelhouse = None
+        self._wheelhouse_size = DEFAULT_MAX_BYTES
+
+    @property
+    def version_cache(self) -> Optional[cache.VersionCache]:
+        if self._version_cache is None:
+            try:
+                self._version_cache = cache.VersionCache(ttl=self._cache_ttl)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.warning("version cache is unavailable: {}", e)
+        return self._version_cache
+
+    @property
+    def pypi(self) -> "pypi.PypiClient":
+        # requests 导入较慢, 第一次查询时才导入
+        # pylint: disable-next=import-outside-toplevel,redefined-outer-name
+        from pipui.core.manager import pypi
+
+        with self._pypi_lock:
+            if self._pypi is None:
+                pool_size = max(self.workers, 1)
+                if self.lookup == LOOKUP_JSON:
+                    self._pypi = pypi.PypiClient(pool_size=pool_size, cache=self.version_cache)
+                else:
+                    self._pypi = pypi.SimpleIndexClient(pool_size=pool_size, url=self.index_url(),
+                                                        cache=self.version_cache)
+                logger.debug("lookup versions from {}", self._pypi.url)
+            return self._pypi
+
+    def _reset_pypi(self):
+        with self._pypi_lock:
+            if self._pypi is not None:
+                self._pypi.close()
+            self._pypi = None
+
+    def set_workers(self, workers: int):
+        """设置检测更新的并发数, 连接池大小与之保持一致"""
+        self.workers = max(workers, 1)
+        self._reset_pypi()
+
+    def set_lookup(self, lookup: str):
+        self.lookup = lookup
+        self._reset_pypi()
+
+    def set_cache_ttl(self, ttl: float):
+        """设置版本缓存的有效期, 单位: 秒; 0 表示每次都重新验证"""
+        self._cache_ttl = ttl
+        if self._version_cache:
+            self._version_cache.ttl = ttl
+
+    def set_prefetch(self, enabled: bool, bandwidth: int = 0,
+                     max_bytes: int = DEFAULT_MAX_BYTES):
+        """预先下载待更新的包; bandwidth: 下载速度上限, 单位: 字节/秒, 0 表示不限制"""
+        self.prefetch = enabled
+        self._prefetch_bandwidth = bandwidth
+        self._wheelhouse_size = max_bytes
+        if self._wheelhouse is not None:
+            self._wheelhouse.max_bytes = max_bytes
+
+    @property
+    def wheelhouse(self) -> Wheelhouse:
+        if self._wheelhouse is None:
+            self._wheelhouse = Wheelhouse(max_bytes=self._wheelhouse_size)
+        return self._wheelhouse
+
+    def prefetch_wheels(self, items: Iterable[Tuple[str, str]],
+                        cancel: Optional[threading.Event] = None
+                        ) -> List[PrefetchResult]:
+        """下载 [(包名, 新版本)] 的 wheel 到 wheelhouse"""
+        import requests  # pylint: disable=import-outside-toplevel
+
+        with requests.Session() as session:
+            prefetcher = WheelPrefetcher(self.wheelhouse, session, self.index_url(),
+                                         bandwidth=self._prefetch_bandwidth)
+            return prefetcher.prefetch(items, cancel=cancel)
+
+    def _local_wheels(self, names: Iterable[str]) -> Optional[List[str]]:
+        """所有包在 wheelhouse 中都有比已安装版本新的 wheel 时, 返回 [包名==版本]"""
+        requirements, files = [], []
+        for name in names:
+            version, path = self.wheelhouse.latest(name)
+            installed = self.installed_version(name)
+            if version is None or installed and not versions.is_newer(installed, str(version)):
+                return None
+            requirements.append(f"{name}=={version}")
+            files.append(path)
+        self.wheelhouse.touch(*files)
+        return requirements
+
+    @staticmethod
+    def _site_prefix(python: str) -> str:
+        """解释器所在环境的前缀, 例如 <prefix>/bin/python 或 <prefix>/Scripts/python.exe"""
+        if python == "python":
+            return sys.prefix
+        bin_dir = os.path.dirname(os.path.abspath(python))
+        if os.path.basename(bin_dir).lower() in ("bin", "scripts"):
+            return os.path.dirname(bin_dir)
+        return bin_dir
+
+    def index_url(self) -> str:
+        """当前生效的索引地址: PIP_INDEX_URL > pip 配置中的 index-url > PyPI"""
+        # 与 pypi 属性一样延迟导入, 避免导入 requests
+        # pylint: disable-next=import-outside-toplevel,redefined-outer-name
+        from pipui.core.manager import pypi
+
+        return self.config.option("index-url") or pypi.PYPI_SIMPLE_URL
 
     def version(self) -> str:
         _, output = self.pip_cmd.execute("--version")
@@ -18,10 +168,26 @@ class PipManager:
         return values[1] if len(values) > 2 else ""
 
     def last_version(self, name):
-        resp = requests.get(f"https://pypi.org/pypi/{name}/json", timeout=60 * 5)
-        resp.raise_for_status()
-        data = resp.json()
-        return data.get("info", {}).get("version")
+        return self.pypi.last_version(name)
+
+    def iter_last_versions(
+        self, names: Iterable[str], workers: Optional[int] = None
+    ) -> Iterator[Tuple[str, Optional[str], Optional[Exception]]]:
+        """并发查询最新版本, 按完成顺序返回 (name, version, error)
+
+        提前关闭迭代器会取消尚未开始的查询
+        """
+        pool = futures.ThreadPoolExecutor(max_workers=max(workers or self.workers, 1),
+                                          thread_name_prefix="last-version")
+        try:
+            tasks = {pool.submit(self.last_version, name): name for name in names}
+            for task in futures.as_completed(tasks):
+                try:
+                    yield tasks[task], task.result(), None
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    yield tasks[task], None, e
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
 
     def install(self, name, upgrade=False):
         args = ["install"]
@@ -30,16 +196,133 @@ class PipManager:
         args.extend([name, '--progress-bar', 'off'])
         self.pip_cmd.execute(*args)
 
-    def uninstall(self, name):
-        self.pip_cmd.execute("uninstall", "-y", name)
+    def install_stream(self, *names: str, upgrade=False, timeout: Optional[float] = None,
+                       cancel: Optional[threading.Event] = None) -> Iterator[InstallProgress]:
+        """安装并实时返回进度; cancel 被设置后结束 pip 及其子进程
+
+        开启预下载时, 如果所有包都已经下载到 wheelhouse, 先不访问索引直接从本地安装;
+        本地安装失败 (例如新版本增加了依赖) 时再访问索引, 同时仍然使用本地的 wheel.
+        """
+        # raw 格式的进度条从 pip 24.1 开始支持
+        progress_bar = "raw" if self._pip_at_least(24, 1) else "off"
+        options = ["--progress-bar", progress_bar]
+        if upgrade and self.prefetch:
+            options.extend(["--find-links", self.wheelhouse.path])
+            if requirements := self._local_wheels(names):
+                logger.info("install {} from wheelhouse", " ".join(requirements))
+                try:
+                    yield from self._install_stream(["install", "--no-index", *requirements,
+                                                     *options], timeout, cancel)
+                    return
+                except subprocess.CalledProcessError as e:
+                    logger.warning("install from wheelhouse failed, use the index: {}", e)
+        args = ["install", "--upgrade"] if upgrade else ["install"]
+        yield from self._install_stream([*args, *names, *options], timeout, cancel)
+
+    def _install_stream(self, args: List[str], timeout: Optional[float],
+                        cancel: Optional[threading.Event]) -> Iterator[InstallProgress]:
+        parser = PipProgressParser()
+        for source, line in self.pip_cmd.stream(*args, timeout=timeout, cancel=cancel):
+            if source == executor.STDERR:
+                logger.debug("pip: {}", line)
+            if event := parser.feed(line):
+                yield event
+
+    def _pip_at_least(self, *version: int) -> bool:
+        try:
+            current = Version(self.version())
+        except (subprocess.CalledProcessError, InvalidVersion):
+            return False
+        return current.release[:len(version)] >= version
+
+    def installed_version(self, name: str) -> str:
+        if self.search_paths is not None:
+            self.package_index.refresh()
+            key = canonicalize_name(name)
+            return next((p.version for p in self.package_index.packages()
+                         if canonicalize_name(p.name) == key), "")
+        importlib.invalidate_caches()
+        try:
+            return metadata.version(name)
+        except metadata.PackageNotFoundError:
+            return ""
+
+    def uninstall(self, *names):
+        self.pip_cmd.execute("uninstall", "-y", *names)
 
     def config_list(self) -> str:
-        _, stdout = self.pip_cmd.execute("config", "list")
-        return stdout
+        return self.config.list()
 
     def config_set(self, key, value):
-        self.pip_cmd.execute("config", "set", key, value)
+        self.config.set(key, value)
+        if key.endswith(".index-url"):
+            self._reset_pypi()
+
+    @property
+    def package_index(self) -> PackageIndex:
+        if self._package_index is None:
+            self._package_index = PackageIndex(search_paths=self.search_paths)
+            self._package_index.load()
+        return self._package_index
+
+    @property
+    def dependency_graph(self) -> DependencyGraph:
+        if self._dependency_graph is None:
+            self._dependency_graph = DependencyGraph(search_paths=self.search_paths)
+            self._dependency_graph.load()
+        return self._dependency_graph
+
+    @property
+    def disk_usage(self) -> DiskUsage:
+        if self._disk_usage is None:
+            self._disk_usage = DiskUsage(search_paths=self.search_paths)
+            self._disk_usage.load()
+        return self._disk_usage
+
+    def iter_package_sizes(self, packages: List[PyPackage],
+                           cancel: Optional[threading.Event] = None) -> Iterator[Tuple[str, int]]:
+        """返回 (包名, 占用的字节数), 缓存中的先返回; packages 应当是完整的包列表"""
+        try:
+            yield from self.disk_usage.iter_sizes(packages, cancel=cancel)
+        finally:
+            self.disk_usage.save()
+
+    @property
+    def advisories(self) -> AdvisoryDatabase:
+        if self._advisories is None:
+            self._advisories = AdvisoryDatabase()
+        return self._advisories
+
+    def import_advisories(self, source: str) -> int:
+        return self.advisories.import_osv(source)
+
+    def audit_packages(self, packages: List[PyPackage]) -> Dict[str, List[Advisory]]:
+        """按导入的漏洞库检查, 没有导入时返回空"""
+        if not self.advisories.load():
+            return {}
+        return self.advisories.check(packages)
 
     def list_packages(self) -> List[PyPackage]:
-        return [PyPackage(item.metadata.get('Name', ''), item.metadata.get('Version', ''))
-                for item in distributions()]
+        self.package_index.refresh()
+        self.package_index.save()
+        packages = self.package_index.packages()
+        self.dependency_graph.update(packages)
+        self.dependency_graph.save()
+        return packages
+
+    def refresh_packages(self) -> IndexChanges:
+        """增量刷新包列表, 只返回发生变化的包"""
+        changes = self.package_index.refresh()
+        self.package_index.save()
+        if changes:
+            self.dependency_graph.apply_changes(changes)
+            self.dependency_graph.save()
+        return changes
+
+    def snapshot(self) -> Snapshot:
+        """当前环境的快照, 包含 direct_url.json 中的安装来源"""
+        return Snapshot.from_packages(self.list_packages())
+
+    def cached_packages(self) -> List[PyPackage]:
+        """上一次保存的包列表, 不访问文件系统"""
+        return self.package_index.packages()
@@ -0,0 +1,197 @@
+"""直接读写 pip 的配置文件, 不启动 pip 进程
+
+配置文件的位置和优先级与 pip 一致 (从低到高):
+global (系统) < user (用户) < site (环境) < PIP_CONFIG_FILE < PIP_ 开头的环境变量
+PIP_CONFIG_FILE 指向存在的文件时不读取 user 配置; 为 os.devnull 时不读取任何配置文件.
+"""
+import configparser
+import os
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+VARIANT_GLOBAL = "global"
+VARIANT_USER = "user"
+VARIANT_SITE = "site"
+VARIANT_ENV = "env"
+VARIANT_ENV_VAR = "env-var"
+
+CONFIG_BASENAME = "pip.ini" if sys.platform == "win32" else "pip.conf"
+# 环境变量中的配置在 pip config list 中显示为 :env:.<name>
+ENV_SECTION = ":env:"
+ENV_NAMES_IGNORED = ("version", "help")
+
+
+def normalize_name(name: str) -> str:
+    """与 pip 相同: 小写, 下划线换成连字符, 去掉开头的 --"""
+    name = name.lower().replace("_", "-")
+    return name[2:] if name.startswith("--") else name
+
+
+def _site_config_dirs() -> List[str]:
+    if sys.platform == "win32":
+        return [os.path.join(os.getenv("ALLUSERSPROFILE") or "C:\\ProgramData", "pip")]
+    if sys.platform == "darwin":
+        return ["/Library/Application Support/pip"]
+    dirs = os.getenv("XDG_CONFIG_DIRS") or "/etc/xdg"
+    return [os.path.join(os.path.expanduser(path.rstrip(os.sep)), "pip")
+            for path in dirs.split(os.pathsep)] + ["/etc"]
+
+
+def _user_config_dir() -> str:
+    if sys.platform == "win32":
+        return os.path.join(os.getenv("APPDATA") or os.path.expanduser("~"), "pip")
+    if sys.platform == "darwin":
+        path = os.path.expanduser("~/Library/Application Support/pip")
+        if os.path.isdir(path):
+            return path
+        return os.path.expanduser("~/.config/pip")
+    return os.path.join(os.getenv("XDG_CONFIG_HOME") or os.path.expanduser("~/.config"), "pip")
+
+
+def config_files(site_prefix: str = sys.prefix) -> Dict[str, List[str]]:
+    """各级配置文件的路径, 同一级中后面的文件优先"""
+    legacy = os.path.join(os.path.expanduser("~"), "pip" if sys.platform == "win32" else ".pip",
+                          CONFIG_BASENAME)
+    return {
+        VARIANT_GLOBAL: [os.path.join(path, CONFIG_BASENAME) for path in _site_config_dirs()],
+        VARIANT_USER: [legacy, os.path.join(_user_config_dir(), CONFIG_BASENAME)],
+        VARIANT_SITE: [os.path.join(site_prefix, CONFIG_BASENAME)],
+    }
+
+
+def environ_values() -> Dict[str, str]:
+    return {f"{ENV_SECTION}.{normalize_name(key[4:])}": value
+            for key, value in os.environ.items()
+            if key.startswith("PIP_") and key[4:].lower() not in ENV_NAMES_IGNORED}
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class PipConfiguration:
+    """合并后的 pip 配置, 以 section.name 为键 (例如 global.index-url)
+
+    解析结果按配置文件的 mtime 和 PIP_ 环境变量缓存, 文件没有变化时不重新读取.
+    """
+
+    def __init__(self, site_prefix: str = sys.prefix) -> None:
+        """site_prefix: 目标环境的 sys.prefix, site 配置文件所在的目录"""
+        self.site_prefix = site_prefix
+        self._lock = threading.Lock()
+        self._signature = None
+        self._values: Dict[str, str] = {}
+        self._sources: Dict[str, str] = {}
+
+    def files(self) -> List[Tuple[str, str]]:
+        """按优先级从低到高排列的 [(级别, 路径)], 包括不存在的文件"""
+        env_file = os.getenv("PIP_CONFIG_FILE")
+        if env_file == os.devnull:
+            return []
+        files = config_files(self.site_prefix)
+        variants = [VARIANT_GLOBAL, VARIANT_SITE] if env_file and os.path.exists(env_file) \
+            else [VARIANT_GLOBAL, VARIANT_USER, VARIANT_SITE]
+        ordered = [(variant, path) for variant in variants for path in files[variant]]
+        if env_file:
+            ordered.append((VARIANT_ENV, env_file))
+        return ordered
+
+    def _load(self):
+        env = environ_values()
+        files = self.files()
+        signature = (tuple((path, _mtime(path)) for _, path in files), tuple(sorted(env.items())))
+        with self._lock:
+            if signature == self._signature:
+                return
+            values, sources = {}, {}
+            for _, path in files:
+                if _mtime(path) is None:
+                    continue
+                for key, value in self._read(path).items():
+                    values[key] = value
+                    sources[key] = path
+            for key, value in env.items():
+                values[key] = value
+                sources[key] = VARIANT_ENV_VAR
+            self._values, self._sources, self._signature = values, sources, signature
+
+    @staticmethod
+    def _parser(path: str) -> configparser.RawConfigParser:
+        parser = configparser.RawConfigParser()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                parser.read_file(f)
+        return parser
+
+    def _read(self, path: str) -> Dict[str, str]:
+        try:
+            parser = self._parser(path)
+        except (OSError, configparser.Error) as e:
+            logger.warning("read pip config {} failed: {}", path, e)
+            return {}
+        return {f"{section}.{normalize_name(name)}": value
+                for section in parser.sections() for name, value in parser.items(section)}
+
+    def items(self) -> List[Tuple[str, str]]:
+        self._load()
+        return sorted(self._values.items())
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        self._load()
+        return self._values.get(key, default)
+
+    def source(self, key: str) -> str:
+        """生效的配置所在的文件, 来自环境变量时为 env-var"""
+        self._load()
+        return self._sources.get(key, "")
+
+    def option(self, name: str, command: str = "install") -> Optional[str]:
+        """命令行选项的默认值, 与 pip 一致: 环境变量 > [command] > [global]"""
+        self._load()
+        name = normalize_name(name)
+        for section in (ENV_SECTION, command, "global"):
+            if (value := self._values.get(f"{section}.{name}")) is not None:
+                return value
+        return None
+
+    def list(self) -> str:
+        """与 pip config list 的输出格式相同"""
+        return "".join(f"{key}={value!r}\n" for key, value in self.items())
+
+    def write_file(self) -> str:
+        """与 pip config set 相同: 环境中存在 pip 配置时写入环境的配置, 否则写入用户配置"""
+        files = config_files(self.site_prefix)
+        site_file = files[VARIANT_SITE][-1]
+        return site_file if os.path.exists(site_file) else files[VARIANT_USER][-1]
+
+    def set(self, key: str, value: str, path: Optional[str] = None):
+        section, _, name = key.partition(".")
+        if not section or not name:
+            raise ValueError(f"key {key!r} should be in the form of section.name")
+        path = path or self.write_file()
+        with self._lock:
+            parser = self._parser(path)
+            if not parser.has_section(section):
+                parser.add_section(section)
+            # 同一个配置的其他写法 (例如 index_url) 会覆盖或被覆盖, 一并删除
+            for option in parser.options(section):
+                if option != name and normalize_name(option) == normalize_name(name):
+                    parser.remove_option(section, option)
+            parser.set(section, name, value)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_file = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_file, "w", encoding="utf-8") as f:
+                    parser.write(f)
+                os.replace(tmp_file, path)
+            finally:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+            self._signature = None
+        logger.info("set pip config {}={!r} in {}", key, value, path)
@@ -0,0 +1,62 @@
+import dataclasses
+import re
+from typing import Optional
+
+PHASE_COLLECTING = "collecting"
+PHASE_DOWNLOADING = "downloading"
+PHASE_INSTALLING = "installing"
+PHASE_DONE = "done"
+
+_COLLECTING = re.compile(r"^\s*Collecting (?P<package>[^\s(]+)")
+_DOWNLOADING = re.compile(r"^\s*Downloading (?P<file>\S+)(?: \((?P<size>[^)]+)\))?")
+_PROGRESS = re.compile(r"^\s*Progress (?P<current>\d+) of (?P<total>\d+)")
+_INSTALLING = re.compile(r"^\s*Installing collected packages: (?P<packages>.+)")
+_UNINSTALLING = re.compile(r"^\s*(?:Attempting uninstall|Uninstalling) (?P<package>[^\s:]+)")
+_SUCCESS = re.compile(r"^\s*Successfully installed (?P<packages>.+)")
+
+
+@dataclasses.dataclass
+class InstallProgress:
+    phase: str
+    package: str = ""
+    # 下载阶段为字节数, 其余阶段为包的数量
+    current: int = 0
+    total: int = 0
+    message: str = ""
+
+    @property
+    def percent(self) -> int:
+        return int(self.current * 100 / self.total) if self.total else 0
+
+
+class PipProgressParser:
+    """把 pip install 的输出 (使用 --progress-bar raw) 解析为进度事件"""
+
+    def __init__(self) -> None:
+        self.package = ""
+        self.collected = 0
+
+    def feed(self, line: str) -> Optional[InstallProgress]:
+        if matched := _PROGRESS.match(line):
+            return InstallProgress(PHASE_DOWNLOADING, self.package,
+                                   int(matched.group("current")), int(matched.group("total")))
+        if matched := _COLLECTING.match(line):
+            self.package = matched.group("package")
+            self.collected += 1
+            return InstallProgress(PHASE_COLLECTING, self.package, self.collected,
+                                   message=line.strip())
+        if matched := _DOWNLOADING.match(line):
+            self.package = matched.group("file").rsplit("/", 1)[-1]
+            return InstallProgress(PHASE_DOWNLOADING, self.package, message=line.strip())
+        if matched := _INSTALLING.match(line):
+            packages = [p.strip() for p in matched.group("packages").split(",")]
+            return InstallProgress(PHASE_INSTALLING, ", ".join(packages), 0, len(packages),
+                                   message=line.strip())
+        if matched := _UNINSTALLING.match(line):
+            return InstallProgress(PHASE_INSTALLING, matched.group("package"),
+                                   message=line.strip())
+        if matched := _SUCCESS.match(line):
+            packages = matched.group("packages").split()
+            return InstallProgress(PHASE_DONE, " ".join(packages), len(packages), len(packages),
+                                   message=line.strip())
+        return None
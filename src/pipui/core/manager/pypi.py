@@ -0,0 +1,105 @@
+import time
+from typing import Optional
+from urllib import parse
+
+import requests
+from packaging.utils import canonicalize_name
+from requests.adapters import HTTPAdapter
+
+from pipui.common.metrics import METRICS
+from pipui.core.cache import VersionCache
+from pipui.core.manager import simple
+
+PYPI_URL = "https://pypi.org"
+PYPI_SIMPLE_URL = f"{PYPI_URL}/simple"
+
+# (connect, read) 超时, 单位: 秒
+DEFAULT_TIMEOUT = (5, 30)
+
+
+class PypiClient:
+    """PyPI 查询客户端, 使用 /pypi/{name}/json 接口
+
+    所有请求复用同一个 Session 及其连接池. 设置 cache 后, 未过期的结果直接从缓存返回,
+    过期的结果使用 If-None-Match/If-Modified-Since 条件请求重新验证.
+    """
+
+    accept = "application/json"
+    stream = False
+
+    def __init__(self, pool_size: int = 16, timeout=DEFAULT_TIMEOUT, url: str = PYPI_URL,
+                 cache: Optional[VersionCache] = None):
+        self.url = url.rstrip("/")
+        self.host = parse.urlsplit(self.url).hostname or ""
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=1)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def project_url(self, name: str) -> str:
+        return f"{self.url}/pypi/{name}/json"
+
+    def parse_version(self, resp: requests.Response) -> Optional[str]:
+        return resp.json().get("info", {}).get("version")
+
+    def last_version(self, name: str) -> str:
+        entry = self.cache.get(self.url, name) if self.cache else None
+        if entry and self.cache.is_fresh(entry):
+            METRICS.counter("http.cache_hit", host=self.host)
+            return entry.version
+
+        headers = {"Accept": self.accept}
+        if entry and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        start, resp = time.perf_counter(), None
+        try:
+            with self.session.get(self.project_url(name), headers=headers,
+                                  timeout=self.timeout, stream=self.stream) as resp:
+                if resp.status_code == 304 and entry:
+                    self.cache.touch(self.url, name)
+                    return entry.version
+                resp.raise_for_status()
+                version = self.parse_version(resp)
+        finally:
+            if METRICS.enabled:
+                self._record(name, resp, time.perf_counter() - start)
+        if self.cache and version:
+            self.cache.put(self.url, name, version, etag=resp.headers.get("ETag", ""),
+                           last_modified=resp.headers.get("Last-Modified", ""))
+        return version
+
+    def _record(self, name: str, resp: Optional[requests.Response], seconds: float):
+        status = resp.status_code if resp is not None else "error"
+        METRICS.observe("http.lookup", seconds, detail=name, host=self.host, status=status)
+        if resp is not None:
+            # 已从连接读取的字节数 (压缩前)
+            METRICS.counter("http.bytes", resp.raw.tell() if resp.raw else 0, host=self.host)
+
+    def close(self):
+        self.session.close()
+
+
+class SimpleIndexClient(PypiClient):
+    """使用 simple 索引 (PEP 691 JSON, 不支持时回退到 PEP 503 HTML) 查询最新版本
+
+    适用于任意镜像源, 响应按块解析, 返回最新的非 yanked 正式版本.
+    """
+
+    accept = simple.ACCEPT
+    stream = True
+
+    def __init__(self, pool_size: int = 16, timeout=DEFAULT_TIMEOUT, url: str = PYPI_SIMPLE_URL,
+                 cache: Optional[VersionCache] = None):
+        super().__init__(pool_size=pool_size, timeout=timeout, url=url, cache=cache)
+
+    def project_url(self, name: str) -> str:
+        return f"{self.url}/{canonicalize_name(name)}/"
+
+    def parse_version(self, resp: requests.Response) -> Optional[str]:
+        parser = simple.SimpleVersionParser.for_content_type(resp.headers.get("Content-Type", ""))
+        return parser.parse(resp.iter_content(chunk_size=64 * 1024),
+                            encoding=resp.encoding or "utf-8")
@@ -0,0 +1,164 @@
+"""Simple repository API (PEP 503 HTML / PEP 691 JSON) 解析
+
+解析器按块接收响应内容, 只保留当前找到的最新版本, 不会把整个文档读入内存.
+"""
+import abc
+import codecs
+import dataclasses
+import json
+import re
+from html.parser import HTMLParser
+from typing import Iterable, List, Optional
+
+from packaging.utils import (InvalidSdistFilename, InvalidWheelFilename,
+                             parse_sdist_filename, parse_wheel_filename)
+from packaging.version import InvalidVersion, Version
+
+JSON_CONTENT_TYPE = "application/vnd.pypi.simple.v1+json"
+ACCEPT = (f"{JSON_CONTENT_TYPE}, application/vnd.pypi.simple.v1+html;q=0.2, "
+          "text/html;q=0.1")
+
+_FILES_START = re.compile(r'"files"\s*:\s*\[')
+
+
+@dataclasses.dataclass
+class DistFile:
+    filename: str
+    # 可能是相对于项目页面的地址
+    url: str
+    sha256: str = ""
+    yanked: bool = False
+
+
+def file_version(filename: str) -> Optional[Version]:
+    """从发行文件名中解析版本号, 无法识别的文件返回 None"""
+    try:
+        if filename.endswith(".whl"):
+            return parse_wheel_filename(filename)[1]
+        return parse_sdist_filename(filename)[1]
+    except (InvalidWheelFilename, InvalidSdistFilename, InvalidVersion):
+        return None
+
+
+class SimpleVersionParser(abc.ABC):
+    """从 simple 索引页中找出最新的非 yanked 正式版本
+
+    collect_files 为 True 时同时保留所有发行文件 (files), 用于查找下载地址
+    """
+
+    def __init__(self, collect_files=False) -> None:
+        self.latest: Optional[Version] = None
+        self.collect_files = collect_files
+        self.files: List[DistFile] = []
+
+    def add_file(self, filename: str, yanked=False, url="", sha256=""):
+        if self.collect_files:
+            self.files.append(DistFile(filename, url, sha256, bool(yanked)))
+        if yanked:
+            return
+        version = file_version(filename)
+        if version is None or version.is_prerelease:
+            return
+        if self.latest is None or version > self.latest:
+            self.latest = version
+
+    @abc.abstractmethod
+    def feed(self, chunk: str):
+        """接收一段已解码的响应内容"""
+
+    def close(self) -> Optional[str]:
+        return str(self.latest) if self.latest else None
+
+    @staticmethod
+    def for_content_type(content_type: str, collect_files=False) -> "SimpleVersionParser":
+        if content_type.split(";")[0].strip() == JSON_CONTENT_TYPE:
+            return JsonVersionParser(collect_files)
+        return HtmlVersionParser(collect_files)
+
+    def parse(self, chunks: Iterable[bytes], encoding="utf-8") -> Optional[str]:
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        for chunk in chunks:
+            self.feed(decoder.decode(chunk))
+        self.feed(decoder.decode(b"", final=True))
+        return self.close()
+
+
+class JsonVersionParser(SimpleVersionParser):
+    """PEP 691: 逐个解码 files 数组中的元素"""
+
+    def __init__(self, collect_files=False) -> None:
+        super().__init__(collect_files)
+        self._buffer = ""
+        self._in_files = False
+        self._done = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, chunk: str):
+        if self._done:
+            return
+        self._buffer += chunk
+        if not self._in_files:
+            matched = _FILES_START.search(self._buffer)
+            if not matched:
+                # 保留末尾, 防止 "files" 被截断在两个分块之间
+                self._buffer = self._buffer[-32:]
+                return
+            self._in_files = True
+            self._buffer = self._buffer[matched.end():]
+
+        buffer, pos = self._buffer, 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == "]":
+                self._done = True
+                break
+            try:
+                item, pos = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # 元素不完整, 等待后续数据
+                break
+            if isinstance(item, dict):
+                self.add_file(item.get("filename", ""), yanked=item.get("yanked", False),
+                              url=item.get("url", ""),
+                              sha256=(item.get("hashes") or {}).get("sha256", ""))
+        self._buffer = "" if self._done else buffer[pos:]
+
+
+class HtmlVersionParser(SimpleVersionParser, HTMLParser):
+    """PEP 503: 解析 <a> 标签, data-yanked 属性表示已 yanked"""
+
+    def __init__(self, collect_files=False) -> None:
+        SimpleVersionParser.__init__(self, collect_files)
+        HTMLParser.__init__(self)
+        self._yanked = False
+        self._href = ""
+        self._text = None
+
+    def feed(self, chunk: str):
+        HTMLParser.feed(self, chunk)
+
+    def close(self) -> Optional[str]:
+        HTMLParser.close(self)
+        return SimpleVersionParser.close(self)
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "a":
+            return
+        self._yanked = any(key == "data-yanked" for key, _ in attrs)
+        self._href = next((value or "" for key, value in attrs if key == "href"), "")
+        self._text = []
+
+    def handle_data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag != "a" or self._text is None:
+            return
+        url, _, fragment = self._href.partition("#")
+        sha256 = fragment[len("sha256="):] if fragment.startswith("sha256=") else ""
+        self.add_file("".join(self._text).strip(), yanked=self._yanked, url=url, sha256=sha256)
+        self._text = None
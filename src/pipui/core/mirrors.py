@@ -0,0 +1,140 @@
+import dataclasses
+import http.client
+import statistics
+import time
+from concurrent import futures
+from typing import Dict, List, Optional
+from urllib import parse
+
+from loguru import logger
+
+MIRRORS = {
+    "官方": "https://pypi.org/simple",
+    "清华大学": "https://pypi.tuna.tsinghua.edu.cn/simple",
+    "中国科技大学": "https://pypi.mirrors.ustc.edu.cn/simple",
+    "阿里云": "https://mirrors.aliyun.com/pypi/simple",
+    "腾讯": "http://mirrors.cloud.tencent.com/pypi/simple",
+}
+
+# 用于测速的项目页面, pip 的页面大小适中且所有镜像都有
+PROBE_PROJECT = "pip"
+DEFAULT_SAMPLES = 3
+DEFAULT_TIMEOUT = 5
+
+
+@dataclasses.dataclass
+class ProbeSample:
+    # 单位: 秒; connect 包含 TLS 握手
+    connect: float = 0
+    ttfb: float = 0
+    total: float = 0
+    size: int = 0
+    error: str = ""
+
+    @property
+    def throughput(self) -> float:
+        """响应体的下载速度, 单位: 字节/秒"""
+        transfer = self.total - self.ttfb
+        return self.size / transfer if transfer > 0 else 0
+
+
+@dataclasses.dataclass
+class ProbeResult:
+    name: str
+    url: str
+    samples: List[ProbeSample] = dataclasses.field(default_factory=list)
+
+    @property
+    def ok_samples(self) -> List[ProbeSample]:
+        return [s for s in self.samples if not s.error]
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.ok_samples)
+
+    @property
+    def error(self) -> str:
+        return next((s.error for s in self.samples if s.error), "")
+
+    def _median(self, attr: str) -> float:
+        values = [getattr(s, attr) for s in self.ok_samples]
+        return statistics.median(values) if values else float("inf")
+
+    @property
+    def connect(self) -> float:
+        return self._median("connect")
+
+    @property
+    def ttfb(self) -> float:
+        return self._median("ttfb")
+
+    @property
+    def total(self) -> float:
+        return self._median("total")
+
+    @property
+    def throughput(self) -> float:
+        values = [s.throughput for s in self.ok_samples]
+        return statistics.median(values) if values else 0
+
+
+def probe_once(url: str, timeout: float = DEFAULT_TIMEOUT, max_redirects: int = 2) -> ProbeSample:
+    """请求一次 {index}/pip/, 分别记录建立连接、收到响应头和读完响应体的时间"""
+    sample = ProbeSample()
+    target = f"{url.rstrip('/')}/{PROBE_PROJECT}/"
+    start = time.perf_counter()
+    try:
+        for _ in range(max_redirects + 1):
+            parsed = parse.urlsplit(target)
+            connection_class = http.client.HTTPSConnection if parsed.scheme == "https" \
+                else http.client.HTTPConnection
+            conn = connection_class(parsed.hostname, parsed.port, timeout=timeout)
+            try:
+                conn.connect()
+                sample.connect = sample.connect or time.perf_counter() - start
+                conn.request("GET", parsed.path or "/",
+                             headers={"Accept": "text/html", "User-Agent": "pipui"})
+                resp = conn.getresponse()
+                if resp.status in (301, 302, 303, 307, 308) and resp.getheader("Location"):
+                    resp.read()
+                    target = parse.urljoin(target, resp.getheader("Location"))
+                    continue
+                sample.ttfb = time.perf_counter() - start
+                if resp.status >= 400:
+                    sample.error = f"HTTP {resp.status}"
+                    return sample
+                while chunk := resp.read(64 * 1024):
+                    sample.size += len(chunk)
+                sample.total = time.perf_counter() - start
+                return sample
+            finally:
+                conn.close()
+        sample.error = "too many redirects"
+    except (OSError, http.client.HTTPException) as e:
+        sample.error = str(e) or type(e).__name__
+    return sample
+
+
+def rank(results: List[ProbeResult]) -> List[ProbeResult]:
+    """可用的排在前面, 按首字节时间和总耗时的中位数排序"""
+    return sorted(results, key=lambda r: (not r.ok, r.ttfb + r.total, r.name))
+
+
+def probe_mirrors(mirrors: Dict[str, str], samples: int = DEFAULT_SAMPLES,
+                  timeout: float = DEFAULT_TIMEOUT,
+                  workers: Optional[int] = None) -> List[ProbeResult]:
+    """同时探测所有索引, 每个索引串行采样 samples 次, 返回排序后的结果"""
+    results = {name: ProbeResult(name, url) for name, url in mirrors.items()}
+
+    def run(result: ProbeResult):
+        for _ in range(samples):
+            result.samples.append(probe_once(result.url, timeout=timeout))
+
+    with futures.ThreadPoolExecutor(max_workers=workers or max(len(results), 1),
+                                    thread_name_prefix="mirror-probe") as pool:
+        list(pool.map(run, results.values()))
+    ranked = rank(list(results.values()))
+    for result in ranked:
+        logger.debug("mirror {} connect={:.3f} ttfb={:.3f} total={:.3f} error={}",
+                     result.name, result.connect, result.ttfb, result.total, result.error)
+    return ranked
@@ -1,4 +1,10 @@
 import dataclasses
+import functools
+from email.message import Message
+from importlib import metadata as importlib_metadata
+from typing import Optional
+
+from pipui.core import versions
 
 
 @dataclasses.dataclass
@@ -6,7 +12,24 @@ class PyPackage:
     name: str
     version: str
     new_version: str = ""
+    # .dist-info/.egg-info 的路径, 用于按需读取完整的元数据
+    path: str = dataclasses.field(default="", compare=False)
+    # 元数据头部的 Summary, 由包索引读取
+    summary: str = dataclasses.field(default="", compare=False, repr=False)
+    # 占用的磁盘空间 (字节), 统计完成前为 None
+    size: Optional[int] = dataclasses.field(default=None, compare=False, repr=False)
 
     def __str__(self) -> str:
         return f"<{self.name}:{self.version}>"
 
+    @property
+    def status(self) -> str:
+        """与检测到的最新版本比较的结果, 见 versions.STATUS_*"""
+        return versions.compare(self.version, self.new_version)
+
+    @functools.cached_property
+    def metadata(self) -> Message:
+        """完整的元数据, 第一次访问时才读取"""
+        if not self.path:
+            return importlib_metadata.metadata(self.name)
+        return importlib_metadata.Distribution.at(self.path).metadata
@@ -0,0 +1,196 @@
+import dataclasses
+import hashlib
+import json
+import os
+import sys
+import threading
+from typing import Dict, List, Optional
+
+from loguru import logger
+from packaging.utils import canonicalize_name
+
+from pipui.common import paths
+from pipui.core.modules import PyPackage
+
+# 缓存文件格式变化时递增
+INDEX_VERSION = 2
+
+DIST_SUFFIXES = (".dist-info", ".egg-info")
+
+
+@dataclasses.dataclass
+class IndexChanges:
+    added: List[PyPackage] = dataclasses.field(default_factory=list)
+    removed: List[PyPackage] = dataclasses.field(default_factory=list)
+    changed: List[PyPackage] = dataclasses.field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def cache_key(search_paths: Optional[List[str]]) -> str:
+    """解释器和搜索路径的摘要, 用于区分不同环境的缓存文件
+
+    None 表示当前环境; 空列表是没有 site-packages 的环境, 使用不同的缓存文件.
+    """
+    if search_paths is None:
+        value = sys.executable
+    else:
+        value = "\0".join([sys.executable, *search_paths, ""])
+    return hashlib.sha1(value.encode()).hexdigest()[:12]
+
+
+def read_name_version(dist_path: str) -> Optional[Dict[str, str]]:
+    """只读取元数据的头部, 获取 Name, Version 和 Summary"""
+    if os.path.isdir(dist_path):
+        filename = "METADATA" if dist_path.endswith(".dist-info") else "PKG-INFO"
+        dist_path = os.path.join(dist_path, filename)
+    name = version = summary = ""
+    try:
+        with open(dist_path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    break
+                key, _, value = line.partition(":")
+                if key == "Name":
+                    name = value.strip()
+                elif key == "Version":
+                    version = value.strip()
+                elif key == "Summary":
+                    summary = value.strip()
+                if name and version and summary:
+                    break
+    except OSError:
+        return None
+    return {"name": name, "version": version, "summary": summary} if name else None
+
+
+class PackageIndex:
+    """已安装包的增量索引
+
+    记录每个搜索路径和其中每个 .dist-info/.egg-info 的 mtime, 刷新时只重新读取
+    发生变化的部分; 索引保存在缓存目录中, 启动时可以不读取任何 METADATA.
+    """
+
+    def __init__(self, search_paths: Optional[List[str]] = None, cache_file=None) -> None:
+        self._search_paths = search_paths
+        self.cache_file = str(cache_file or
+                              paths.cache_dir() / f"packages-{cache_key(search_paths)}.json")
+        # 搜索路径 -> {"mtime": 目录 mtime, "dists": {目录项: {"mtime", "name", "version"}}}
+        self._dirs: Dict[str, dict] = {}
+        self._packages: List[PyPackage] = []
+        self._lock = threading.RLock()
+        self._dirty = False
+
+    @property
+    def search_paths(self) -> List[str]:
+        search_paths = sys.path if self._search_paths is None else self._search_paths
+        return [path or os.getcwd() for path in search_paths]
+
+    def load(self) -> bool:
+        """从缓存文件加载索引, 不检查文件系统"""
+        try:
+            with open(self.cache_file, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != INDEX_VERSION:
+            return False
+        with self._lock:
+            self._dirs = data.get("dirs", {})
+            self._packages = self._build_packages()
+        return True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps({"version": INDEX_VERSION, "dirs": self._dirs})
+            self._dirty = False
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            logger.warning("save package index failed: {}", e)
+
+    def packages(self) -> List[PyPackage]:
+        with self._lock:
+            return list(self._packages)
+
+    def watch_paths(self) -> List[str]:
+        """包含已安装包的目录, 用于监视文件系统变化"""
+        with self._lock:
+            return [path for path, info in self._dirs.items() if info.get("dists")]
+
+    def _scan_dir(self, path: str, mtime: float) -> dict:
+        old_dists = self._dirs.get(path, {}).get("dists", {})
+        dists = {}
+        try:
+            entries = os.listdir(path)
+        except OSError:
+            entries = []
+        for entry in entries:
+            if not entry.endswith(DIST_SUFFIXES):
+                continue
+            dist_path = os.path.join(path, entry)
+            dist_mtime = _mtime(dist_path)
+            old = old_dists.get(entry)
+            if old and old["mtime"] == dist_mtime:
+                dists[entry] = old
+                continue
+            if info := read_name_version(dist_path):
+                dists[entry] = dict(info, mtime=dist_mtime)
+        return {"mtime": mtime, "dists": dists}
+
+    def _build_packages(self) -> List[PyPackage]:
+        # 与 importlib/pip 一致: 同名的包以搜索路径中第一个出现的为准
+        packages, seen = [], set()
+        for path in self.search_paths:
+            for entry, info in sorted(self._dirs.get(path, {}).get("dists", {}).items()):
+                key = canonicalize_name(info["name"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                packages.append(PyPackage(info["name"], info["version"],
+                                          path=os.path.join(path, entry),
+                                          summary=info.get("summary", "")))
+        return packages
+
+    def refresh(self) -> IndexChanges:
+        """检查文件系统并更新索引, 返回与上一次相比的变化"""
+        with self._lock:
+            dirs, scanned = {}, 0
+            for path in self.search_paths:
+                mtime = _mtime(path)
+                if mtime is None or not os.path.isdir(path):
+                    continue
+                cached = self._dirs.get(path)
+                if cached and cached["mtime"] == mtime:
+                    dirs[path] = cached
+                    continue
+                dirs[path] = self._scan_dir(path, mtime)
+                scanned += 1
+            if scanned or dirs.keys() != self._dirs.keys():
+                self._dirty = True
+            self._dirs = dirs
+            old_packages = {canonicalize_name(p.name): p for p in self._packages}
+            self._packages = self._build_packages()
+            changes = IndexChanges()
+            for package in self._packages:
+                old = old_packages.pop(canonicalize_name(package.name), None)
+                if old is None:
+                    changes.added.append(package)
+                elif (old.version, old.path) != (package.version, package.path):
+                    changes.changed.append(package)
+            changes.removed = list(old_packages.values())
+        logger.debug("package index refreshed, {} dirs rescanned", scanned)
+        return changes
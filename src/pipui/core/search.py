@@ -0,0 +1,80 @@
+"""包列表的内存搜索索引
+
+建立索引时预先计算规范化的包名 (PEP 503) 和小写的简介. 输入时查询通常是在上一次查询
+后面追加字符, 这时结果只会变少, 只需要在上一次的结果中继续筛选.
+"""
+import re
+from typing import Iterable, List, Optional, Set, Tuple
+
+from packaging.utils import canonicalize_name
+
+from pipui.core.modules import PyPackage
+
+MODE_PREFIX = "prefix"
+MODE_SUBSTRING = "substring"
+MODE_FUZZY = "fuzzy"
+
+MODES = (MODE_PREFIX, MODE_SUBSTRING, MODE_FUZZY)
+
+
+def _normalize_query(query: str) -> str:
+    # 与包名相同的规范化, 使 typing_ext 能匹配 typing-extensions
+    return re.sub(r"[-_.]+", "-", query.strip().lower())
+
+
+class PackageSearchIndex:
+    """按包名, 规范化的包名和简介查找包
+
+    - prefix: 规范化的包名以查询开头
+    - substring: 规范化的包名或简介包含查询
+    - fuzzy: 查询中的字符按顺序出现在规范化的包名中 (例如 tpext -> typing-extensions),
+      或者简介包含查询
+    """
+
+    def __init__(self, packages: Iterable[PyPackage] = ()) -> None:
+        self._names: List[str] = []
+        self._keys: List[str] = []
+        self._summaries: List[str] = []
+        # (模式, 规范化的查询, 小写的查询, 匹配的位置), 用于在追加输入时缩小范围
+        self._last: Optional[Tuple[str, str, str, List[int]]] = None
+        self.update(packages)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def update(self, packages: Iterable[PyPackage]):
+        """重建索引, 包列表变化后调用"""
+        packages = list(packages)
+        self._names = [package.name for package in packages]
+        self._keys = [canonicalize_name(package.name) for package in packages]
+        self._summaries = [(package.summary or "").lower() for package in packages]
+        self._last = None
+
+    def _candidates(self, mode: str, normalized: str, lowered: str) -> Iterable[int]:
+        if self._last is not None:
+            last_mode, last_normalized, last_lowered, positions = self._last
+            if last_mode == mode and normalized.startswith(last_normalized) \
+                    and lowered.startswith(last_lowered):
+                return positions
+        return range(len(self._names))
+
+    def search(self, query: str, mode: str = MODE_SUBSTRING) -> Set[str]:
+        """返回匹配的包名; 查询为空时返回所有的包"""
+        normalized = _normalize_query(query)
+        if not normalized:
+            self._last = None
+            return set(self._names)
+        lowered = query.strip().lower()
+        candidates = self._candidates(mode, normalized, lowered)
+        keys, summaries = self._keys, self._summaries
+        if mode == MODE_PREFIX:
+            positions = [i for i in candidates if keys[i].startswith(normalized)]
+        elif mode == MODE_FUZZY and len(normalized) > 1:
+            pattern = re.compile(".*?".join(re.escape(char) for char in normalized))
+            positions = [i for i in candidates
+                         if pattern.search(keys[i]) or lowered in summaries[i]]
+        else:
+            positions = [i for i in candidates
+                         if normalized in keys[i] or lowered in summaries[i]]
+        self._last = (mode, normalized, lowered, positions)
+        return {self._names[i] for i in positions}
@@ -1,3 +1,9 @@
 from pipui.core.manager import pip
 
-PIP = pip.PipManager()
+
+def __getattr__(name):
+    # 第一次访问 services.PIP 时才创建
+    if name == "PIP":
+        globals()["PIP"] = pip.PipManager()
+        return globals()["PIP"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,232 @@
+"""环境快照: 保存已安装的包, 比较两个快照 (或快照与当前环境), 以及恢复到快照
+
+快照中的包按规范化的包名排序保存, 比较时只需要对两个有序列表做一次归并, O(n).
+安装来源和哈希来自 PEP 610 的 direct_url.json, 从索引安装的包没有这两项.
+"""
+import dataclasses
+import functools
+import json
+import os
+import sys
+import time
+from importlib import metadata
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from packaging.utils import canonicalize_name
+
+from pipui.common import paths
+from pipui.core.depgraph import evaluate_requires
+from pipui.core.modules import PyPackage
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".snapshot.json"
+
+CHANGE_ADDED = "added"
+CHANGE_REMOVED = "removed"
+CHANGE_CHANGED = "changed"
+
+# pipui 和它运行时直接依赖的包 (与 pyproject.toml 一致), 从源码运行时没有 pipui 的元数据
+RUNTIME_PACKAGES = ("pipui", "loguru", "packaging", "pip", "pyside6", "qt-material",
+                    "requests", "setuptools")
+
+
+@dataclasses.dataclass
+class SnapshotEntry:
+    key: str
+    name: str
+    version: str
+    # 不是从索引安装时的来源 (vcs/文件/目录的 URL)
+    source: str = ""
+    # archive 来源的哈希, 例如 sha256=...
+    hash: str = ""
+    editable: bool = False
+
+    def to_row(self) -> list:
+        return [self.key, self.name, self.version, self.source, self.hash, int(self.editable)]
+
+    @classmethod
+    def from_row(cls, row: list) -> "SnapshotEntry":
+        key, name, version, source, hash_, editable = row
+        return cls(key, name, version, source, hash_, bool(editable))
+
+    def requirement(self) -> List[str]:
+        """恢复时传给 pip install 的参数"""
+        if self.editable and self.source:
+            return ["-e", self.source]
+        if self.source:
+            return [f"{self.name} @ {self.source}"]
+        return [f"{self.name}=={self.version}"]
+
+
+def read_direct_url(dist_path: str) -> Tuple[str, str, bool]:
+    """返回 (来源, 哈希, 是否 editable), 没有 direct_url.json 时都为空"""
+    try:
+        text = metadata.Distribution.at(dist_path).read_text("direct_url.json")
+        data = json.loads(text) if text else None
+    except (OSError, ValueError):
+        return "", "", False
+    if not isinstance(data, dict) or not data.get("url"):
+        return "", "", False
+    url = data["url"]
+    if vcs_info := data.get("vcs_info"):
+        commit = vcs_info.get("commit_id", "")
+        return f"{vcs_info.get('vcs', 'git')}+{url}" + (f"@{commit}" if commit else ""), "", False
+    if (archive_info := data.get("archive_info")) is not None:
+        hashes = archive_info.get("hashes") or {}
+        digest = archive_info.get("hash", "")
+        if not digest and hashes:
+            algorithm = "sha256" if "sha256" in hashes else sorted(hashes)[0]
+            digest = f"{algorithm}={hashes[algorithm]}"
+        return url, digest, False
+    return url, "", bool((data.get("dir_info") or {}).get("editable"))
+
+
+@dataclasses.dataclass
+class Snapshot:
+    # 按 key 排序, key 不重复
+    entries: List[SnapshotEntry]
+    created: float = 0.0
+    python: str = ""
+    path: str = ""
+
+    @property
+    def title(self) -> str:
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created))
+
+    @classmethod
+    def from_packages(cls, packages: Iterable[PyPackage], python: str = "") -> "Snapshot":
+        entries = {}
+        for package in packages:
+            key = canonicalize_name(package.name)
+            # 同名的包出现在多个目录时, 与导入时一样以第一个为准
+            if key in entries:
+                continue
+            source, digest, editable = read_direct_url(package.path) if package.path \
+                else ("", "", False)
+            entries[key] = SnapshotEntry(key, package.name, package.version, source, digest,
+                                         editable)
+        return cls([entries[key] for key in sorted(entries)], created=time.time(),
+                   python=python or sys.version.split()[0])
+
+    def save(self, path: str):
+        data = json.dumps({"version": SNAPSHOT_VERSION, "created": self.created,
+                           "python": self.python,
+                           "packages": [entry.to_row() for entry in self.entries]},
+                          separators=(",", ":"))
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_file, path)
+        self.path = path
+        logger.info("saved snapshot of {} packages to {}", len(self.entries), path)
+
+    @classmethod
+    def load(cls, path: str) -> "Snapshot":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported snapshot version {data.get('version')}")
+        entries = [SnapshotEntry.from_row(row) for row in data.get("packages", [])]
+        # 手工修改过的文件可能无序
+        if any(entries[i].key > entries[i + 1].key for i in range(len(entries) - 1)):
+            entries.sort(key=lambda entry: entry.key)
+        return cls(entries, created=data.get("created", 0.0), python=data.get("python", ""),
+                   path=path)
+
+
+@dataclasses.dataclass
+class SnapshotChange:
+    kind: str
+    key: str
+    old: Optional[SnapshotEntry] = None
+    new: Optional[SnapshotEntry] = None
+
+    @property
+    def name(self) -> str:
+        return (self.new or self.old).name
+
+
+def _same(old: SnapshotEntry, new: SnapshotEntry) -> bool:
+    return (old.version, old.source, old.hash, old.editable) == \
+        (new.version, new.source, new.hash, new.editable)
+
+
+def diff(old: Snapshot, new: Snapshot) -> List[SnapshotChange]:
+    """从 old 到 new 的变化, 按包名排序; 两个快照都是有序的, 一次归并完成"""
+    changes = []
+    old_entries, new_entries = old.entries, new.entries
+    i = j = 0
+    while i < len(old_entries) and j < len(new_entries):
+        old_entry, new_entry = old_entries[i], new_entries[j]
+        if old_entry.key == new_entry.key:
+            if not _same(old_entry, new_entry):
+                changes.append(SnapshotChange(CHANGE_CHANGED, old_entry.key, old_entry, new_entry))
+            i += 1
+            j += 1
+        elif old_entry.key < new_entry.key:
+            changes.append(SnapshotChange(CHANGE_REMOVED, old_entry.key, old=old_entry))
+            i += 1
+        else:
+            changes.append(SnapshotChange(CHANGE_ADDED, new_entry.key, new=new_entry))
+            j += 1
+    changes.extend(SnapshotChange(CHANGE_REMOVED, entry.key, old=entry)
+                   for entry in old_entries[i:])
+    changes.extend(SnapshotChange(CHANGE_ADDED, entry.key, new=entry)
+                   for entry in new_entries[j:])
+    return changes
+
+
+@functools.lru_cache(maxsize=None)
+def protected_packages() -> FrozenSet[str]:
+    """恢复时不卸载的包: RUNTIME_PACKAGES 以及它们传递依赖的包
+
+    目标环境默认就是 pipui 所在的环境, 卸载这些包后界面或 pip 无法继续运行.
+    """
+    protected, pending = set(), [canonicalize_name(name) for name in RUNTIME_PACKAGES]
+    while pending:
+        if (key := pending.pop()) in protected:
+            continue
+        protected.add(key)
+        try:
+            requires = metadata.requires(key) or []
+        except metadata.PackageNotFoundError:
+            continue
+        pending.extend(evaluate_requires(requires))
+    return frozenset(protected)
+
+
+def restore_plan(changes: Iterable[SnapshotChange]) -> Tuple[List[str], List[str]]:
+    """当前环境到目标快照的变化 (diff(当前, 目标)) 转换为 (pip install 的参数, 要卸载的包)
+
+    protected_packages() 中的包不会被卸载
+    """
+    install, uninstall = [], []
+    protected = protected_packages()
+    for change in changes:
+        if change.kind == CHANGE_REMOVED:
+            if change.key not in protected:
+                uninstall.append(change.old.name)
+        else:
+            install.extend(change.new.requirement())
+    return install, uninstall
+
+
+def snapshot_dir() -> str:
+    return str(paths.cache_dir("snapshots"))
+
+
+def list_snapshots(directory: Optional[str] = None) -> List[str]:
+    """保存的快照文件, 最新的在前"""
+    directory = directory or snapshot_dir()
+    try:
+        files = [os.path.join(directory, name) for name in os.listdir(directory)
+                 if name.endswith(SNAPSHOT_SUFFIX)]
+    except OSError:
+        return []
+    return sorted(files, reverse=True)
+
+
+def new_snapshot_path(directory: Optional[str] = None) -> str:
+    name = time.strftime("%Y%m%d-%H%M%S") + SNAPSHOT_SUFFIX
+    return os.path.join(directory or snapshot_dir(), name)
@@ -0,0 +1,68 @@
+"""PEP 440 版本的解析和比较
+
+同一个版本字符串只解析一次, 同一对 (已安装, 最新) 版本只比较一次; 表格刷新, 排序和筛选时
+重复比较的代价只是一次缓存查找.
+"""
+import functools
+from typing import Dict, Iterable, List, Optional
+
+from packaging.version import InvalidVersion, Version
+
+# 未检测更新, 或者检测失败
+STATUS_UNKNOWN = "unknown"
+STATUS_UPGRADABLE = "upgradable"
+STATUS_UP_TO_DATE = "up-to-date"
+# 已安装的版本比索引中的最新版本更新, 例如本地构建的开发版本
+STATUS_LOCAL_NEWER = "local-newer"
+
+STATUSES = (STATUS_UNKNOWN, STATUS_UPGRADABLE, STATUS_UP_TO_DATE, STATUS_LOCAL_NEWER)
+
+CACHE_SIZE = 16384
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse(version: str) -> Optional[Version]:
+    """解析版本, 不符合 PEP 440 时返回 None"""
+    try:
+        return Version(version)
+    except InvalidVersion:
+        return None
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def compare(current: str, latest: str) -> str:
+    """已安装的版本 current 相对于最新版本 latest 的状态"""
+    if not latest:
+        return STATUS_UNKNOWN
+    installed, newest = parse(current), parse(latest)
+    if installed is None or newest is None:
+        # 无法解析时只能按字符串判断是否相同
+        return STATUS_UP_TO_DATE if current == latest else STATUS_UPGRADABLE
+    if newest > installed:
+        return STATUS_UPGRADABLE
+    return STATUS_UP_TO_DATE if newest == installed else STATUS_LOCAL_NEWER
+
+
+def is_newer(current: str, latest: str) -> bool:
+    return compare(current, latest) == STATUS_UPGRADABLE
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def sort_key(version: str) -> tuple:
+    """排序用的键: 合法的版本按 PEP 440 排序, 之后是无法解析的版本, 按字符串排序"""
+    parsed = parse(version)
+    return (0, parsed, "") if parsed is not None else (1, None, version)
+
+
+def classify(packages: Iterable) -> Dict[str, List]:
+    """一次遍历把包 (有 version 和 new_version 属性) 按状态分组"""
+    groups: Dict[str, List] = {status: [] for status in STATUSES}
+    for package in packages:
+        groups[compare(package.version, package.new_version)].append(package)
+    return groups
+
+
+def clear_cache():
+    parse.cache_clear()
+    compare.cache_clear()
+    sort_key.cache_clear()
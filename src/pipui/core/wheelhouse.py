@@ -0,0 +1,268 @@
+"""预先下载待更新的包的 wheel, 更新时从本地目录安装
+
+下载的文件保存在缓存目录的 wheels 中, 文件的 mtime 表示最近一次使用的时间,
+总大小超过上限时删除最久未使用的文件.
+"""
+import dataclasses
+import hashlib
+import os
+import threading
+import time
+from concurrent import futures
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib import parse
+
+from loguru import logger
+from packaging import tags
+from packaging.utils import (InvalidWheelFilename, canonicalize_name,
+                             parse_wheel_filename)
+from packaging.version import Version
+
+from pipui.common import paths
+from pipui.common.metrics import METRICS
+from pipui.core import versions
+from pipui.core.manager import simple
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_WORKERS = 2
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclasses.dataclass
+class PrefetchResult:
+    name: str
+    version: str
+    # 已经在本地或下载成功的文件, 没有兼容的 wheel 时为空
+    path: str = ""
+    downloaded: int = 0
+    error: str = ""
+
+
+class RateLimiter:
+    """令牌桶, 多个下载线程共享同一个速度上限, 单位: 字节/秒; 0 表示不限制"""
+
+    def __init__(self, rate: int = 0) -> None:
+        self.rate = rate
+        self._allowance = float(rate)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, size: int):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self._allowance + (now - self._last) * self.rate, self.rate)
+            self._last = now
+            self._allowance -= size
+            wait = -self._allowance / self.rate if self._allowance < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+def _supported_tags() -> Dict[tags.Tag, int]:
+    # 顺序即优先级, 与 pip 选择 wheel 的方式一致
+    return {tag: i for i, tag in enumerate(tags.sys_tags())}
+
+
+def wheel_priority(filename: str, supported: Dict[tags.Tag, int]) -> Optional[int]:
+    """wheel 与当前解释器兼容时返回优先级 (越小越好), 否则返回 None"""
+    try:
+        _, _, _, wheel_tags = parse_wheel_filename(filename)
+    except InvalidWheelFilename:
+        return None
+    priorities = [supported[tag] for tag in wheel_tags if tag in supported]
+    return min(priorities) if priorities else None
+
+
+def select_wheel(files: Iterable[simple.DistFile], version: str,
+                 supported: Optional[Dict[tags.Tag, int]] = None) -> Optional[simple.DistFile]:
+    """从项目的发行文件中选出指定版本最适合当前解释器的 wheel"""
+    supported = _supported_tags() if supported is None else supported
+    if (expected := versions.parse(version)) is None:
+        return None
+    best, best_priority = None, None
+    for dist_file in files:
+        if dist_file.yanked or not dist_file.filename.endswith(".whl"):
+            continue
+        if simple.file_version(dist_file.filename) != expected:
+            continue
+        priority = wheel_priority(dist_file.filename, supported)
+        if priority is not None and (best_priority is None or priority < best_priority):
+            best, best_priority = dist_file, priority
+    return best
+
+
+class Wheelhouse:
+
+    def __init__(self, path=None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.path = str(path or paths.cache_dir("wheels"))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # 当前解释器支持的 wheel 标签 -> 优先级, 越小越优先
+        self.supported_tags = _supported_tags()
+
+    def _wheels(self) -> List[Tuple[str, Version, str]]:
+        """(规范化的包名, 版本, 路径), 只包含与当前解释器兼容的 wheel"""
+        wheels = []
+        try:
+            entries = os.listdir(self.path)
+        except OSError:
+            return wheels
+        for entry in entries:
+            if not entry.endswith(".whl") or wheel_priority(entry, self.supported_tags) is None:
+                continue
+            name, version, _, _ = parse_wheel_filename(entry)
+            wheels.append((canonicalize_name(name), version, os.path.join(self.path, entry)))
+        return wheels
+
+    def find(self, name: str, version: str) -> str:
+        key = canonicalize_name(name)
+        if (expected := versions.parse(version)) is None:
+            return ""
+        return next((path for wheel_name, wheel_version, path in self._wheels()
+                     if wheel_name == key and wheel_version == expected), "")
+
+    def latest(self, name: str) -> Tuple[Optional[Version], str]:
+        """本地最新的 wheel 的 (版本, 路径)"""
+        key = canonicalize_name(name)
+        candidates = [(version, path) for wheel_name, version, path in self._wheels()
+                      if wheel_name == key]
+        return max(candidates) if candidates else (None, "")
+
+    def touch(self, *files: str):
+        """标记为最近使用"""
+        for path in files:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    def add(self, filename: str, chunks: Iterable[bytes], sha256: str = "") -> str:
+        """写入临时文件并校验哈希, 完整后才出现在目录中"""
+        target = os.path.join(self.path, os.path.basename(filename))
+        tmp_file = f"{target}.{os.getpid()}.{threading.get_ident()}.part"
+        digest = hashlib.sha256()
+        try:
+            with open(tmp_file, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    digest.update(chunk)
+            if sha256 and digest.hexdigest() != sha256:
+                raise ValueError(f"sha256 mismatch for {filename}")
+            os.replace(tmp_file, target)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        self.evict()
+        return target
+
+    def size(self) -> int:
+        return sum(os.path.getsize(path) for _, _, path in self._all_files())
+
+    def _all_files(self) -> List[Tuple[float, int, str]]:
+        files = []
+        try:
+            entries = list(os.scandir(self.path))
+        except OSError:
+            return files
+        for entry in entries:
+            if entry.name.endswith(".whl") and entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def evict(self):
+        """总大小超过上限时, 按最近使用时间从旧到新删除"""
+        with self._lock:
+            files = sorted(self._all_files())
+            total = sum(size for _, size, _ in files)
+            for _, size, path in files:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    logger.debug("evict {} from wheelhouse", os.path.basename(path))
+                except OSError as e:
+                    logger.warning("evict {} failed: {}", path, e)
+
+    def clear(self):
+        for _, _, path in self._all_files():
+            os.remove(path)
+
+
+class WheelPrefetcher:
+    """通过 simple 索引查找并下载指定版本的 wheel, 限制并发数和总下载速度
+
+    只下载 wheel (不构建 sdist), 也不下载新版本新增的依赖.
+    """
+
+    def __init__(self, wheelhouse: Wheelhouse, session, index_url: str,
+                 workers: int = DEFAULT_WORKERS, bandwidth: int = 0, timeout=(5, 60)) -> None:
+        self.wheelhouse = wheelhouse
+        self.session = session
+        self.index_url = index_url.rstrip("/")
+        self.workers = max(workers, 1)
+        self.limiter = RateLimiter(bandwidth)
+        self.timeout = timeout
+
+    def _find_file(self, name: str, version: str) -> Tuple[Optional[simple.DistFile], str]:
+        page_url = f"{self.index_url}/{canonicalize_name(name)}/"
+        with self.session.get(page_url, headers={"Accept": simple.ACCEPT},
+                              timeout=self.timeout, stream=True) as resp:
+            resp.raise_for_status()
+            parser = simple.SimpleVersionParser.for_content_type(
+                resp.headers.get("Content-Type", ""), collect_files=True)
+            parser.parse(resp.iter_content(chunk_size=CHUNK_SIZE),
+                         encoding=resp.encoding or "utf-8")
+            return select_wheel(parser.files, version, self.wheelhouse.supported_tags), resp.url
+
+    def fetch(self, name: str, version: str,
+              cancel: Optional[threading.Event] = None) -> PrefetchResult:
+        result = PrefetchResult(name, version)
+        if path := self.wheelhouse.find(name, version):
+            result.path = path
+            return result
+        try:
+            dist_file, page_url = self._find_file(name, version)
+            if dist_file is None:
+                logger.debug("no compatible wheel for {}=={}", name, version)
+                return result
+            downloaded = [0]
+
+            def chunks(resp):
+                for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                    if cancel is not None and cancel.is_set():
+                        raise InterruptedError(f"prefetch {name} cancelled")
+                    self.limiter.consume(len(chunk))
+                    downloaded[0] += len(chunk)
+                    yield chunk
+
+            url = parse.urljoin(page_url, dist_file.url)
+            with METRICS.timer("wheel.prefetch", detail=dist_file.filename), \
+                    self.session.get(url, timeout=self.timeout, stream=True) as resp:
+                resp.raise_for_status()
+                result.path = self.wheelhouse.add(dist_file.filename, chunks(resp),
+                                                  sha256=dist_file.sha256)
+            result.downloaded = downloaded[0]
+            METRICS.counter("wheel.prefetch_bytes", result.downloaded)
+            logger.info("prefetched {} ({} bytes)", dist_file.filename, result.downloaded)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("prefetch {}=={} failed: {}", name, version, e)
+            result.error = str(e)
+        return result
+
+    def prefetch(self, items: Iterable[Tuple[str, str]],
+                 cancel: Optional[threading.Event] = None) -> List[PrefetchResult]:
+        """并发下载 [(包名, 版本)], 返回每个包的结果"""
+        results = []
+        with futures.ThreadPoolExecutor(max_workers=self.workers,
+                                        thread_name_prefix="wheel-prefetch") as pool:
+            tasks = [pool.submit(self.fetch, name, version, cancel) for name, version in items]
+            for task in futures.as_completed(tasks):
+                results.append(task.result())
+                if cancel is not None and cancel.is_set():
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    break
+        return results
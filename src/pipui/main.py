@@ -1,17 +1,32 @@
 import sys
 
-from PySide6 import QtWidgets
-from qt_material import apply_stylesheet
-
 from pipui.common import logging
-from pipui.ui import dashboard
+from pipui.common.metrics import METRICS
+from pipui.core import cache, services, wheelhouse
+from pipui.core.manager import pip
 
+# PySide6, qt_material 和界面模块导入较慢, 在需要时才导入
+# pylint: disable=import-outside-toplevel
+
+
+def create_application():
+    from PySide6 import QtWidgets
+    from qt_material import apply_stylesheet
 
-def show_dashboard():
     app = QtWidgets.QApplication(sys.argv)
     apply_stylesheet(app, theme="light_blue.xml", invert_secondary=True)
+    return app
+
 
-    window = dashboard.Dashboard(title="PipManager")
+def create_window():
+    from pipui.ui import dashboard
+
+    return dashboard.Dashboard(title="PipManager")
+
+
+def show_dashboard():
+    app = create_application()
+    window = create_window()
     window.show()
     app.exec()
 
@@ -21,10 +36,53 @@ def main():
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument('-d', "--debug", action="store_true", help="Enable debug mode")
+    parser.add_argument('-w', "--workers", type=int, default=pip.DEFAULT_WORKERS,
+                        help="Concurrency of the package update check")
+    parser.add_argument("--cache-ttl", type=float, default=cache.DEFAULT_TTL,
+                        help="Seconds before a cached package version is revalidated")
+    parser.add_argument("--lookup", choices=[pip.LOOKUP_SIMPLE, pip.LOOKUP_JSON],
+                        default=pip.LOOKUP_SIMPLE,
+                        help="Look up new versions through the simple index (honours the "
+                             "configured mirror) or the PyPI JSON API")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Collect timings of pip commands, index lookups and background "
+                             "jobs, shown in the status bar")
+    parser.add_argument("--metrics-file",
+                        help="Write the collected metrics as JSON to this file on exit "
+                             "(implies --metrics)")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="Download the wheels of outdated packages in the background, "
+                             "so that upgrades install from the local wheelhouse")
+    parser.add_argument("--prefetch-bandwidth", type=int, default=0,
+                        help="Download speed limit of the prefetch in KB/s, 0 for no limit")
+    parser.add_argument("--wheelhouse-size", type=int,
+                        default=wheelhouse.DEFAULT_MAX_BYTES // 1024 // 1024,
+                        help="Size limit of the wheelhouse in MB, least recently used wheels "
+                             "are removed first")
+    parser.add_argument("--log-file", help="Also write the log to this file")
+    parser.add_argument("--log-max-size", type=int, default=0,
+                        help="Rotate the log file when it grows beyond this size in MB, "
+                             "0 for no rotation")
+    parser.add_argument("--log-backups", type=int, default=logging.DEFAULT_BACKUPS,
+                        help="Number of rotated log files to keep")
+    parser.add_argument("--log-compression", choices=sorted(logging.COMPRESSIONS),
+                        help="Compress rotated log files")
     args = parser.parse_args()
-    logging.setup_logger(level="DEBUG" if args.debug else "INFO")
+    logging.setup_logger(level="DEBUG" if args.debug else "INFO", file=args.log_file,
+                         max_bytes=args.log_max_size * 1024 * 1024, backups=args.log_backups,
+                         compression=args.log_compression)
+    METRICS.enable(args.metrics or bool(args.metrics_file))
+    services.PIP.set_workers(args.workers)
+    services.PIP.set_cache_ttl(args.cache_ttl)
+    services.PIP.set_lookup(args.lookup)
+    services.PIP.set_prefetch(args.prefetch, bandwidth=args.prefetch_bandwidth * 1024,
+                              max_bytes=args.wheelhouse_size * 1024 * 1024)
 
-    show_dashboard()
+    try:
+        show_dashboard()
+    finally:
+        if args.metrics_file:
+            METRICS.export(args.metrics_file)
 
 
 if __name__ == "__main__":
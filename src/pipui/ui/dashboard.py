@@ -1,12 +1,19 @@
 import sys
 
 from loguru import logger
+from PySide6.QtCore import QTimer
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import (QHBoxLayout, QLabel, QListWidget,  # fmt: skip
                                QListWidgetItem, QMainWindow, QMessageBox,
-                               QStackedWidget, QVBoxLayout, QWidget)
+                               QPushButton, QStackedWidget, QVBoxLayout,
+                               QWidget)
 
-from . import pages
+from pipui.common.metrics import METRICS
+
+from . import pages, scheduler, widgets
+
+# 状态栏指标的刷新间隔, 单位: 毫秒
+METRICS_INTERVAL = 1000
 
 
 def excepthook(exc_type, exc_value, exc_traceback):
@@ -89,7 +96,10 @@ class Dashboard(QMainWindow):
         # 添加导航项
         nav_items = [
             {"text": "包管理", "icon": "users"},
+            {"text": "环境", "icon": "chart"},
+            {"text": "快照", "icon": "chart"},
             {"text": "配置", "icon": "chart"},
+            {"text": "日志", "icon": "chart"},
             {"text": "关于", "icon": "home"},
         ]
 
@@ -103,20 +113,62 @@ class Dashboard(QMainWindow):
 
     def create_right_content(self):
         """创建右侧内容区域"""
-        # 创建各页面
-        self.stacked_pages.addWidget(pages.PipPackages())
-        self.stacked_pages.addWidget(pages.PipConfig())
-        self.stacked_pages.addWidget(pages.PipVersion())
+        # 先放入占位页面, 各页面在第一次切换到时才创建
+        self._page_factories = [pages.PipPackages, pages.PipEnvironments, pages.PipSnapshots,
+                                pages.PipConfig, pages.PipLogs, pages.PipVersion]
+        self._created_pages = set()
+        for _ in self._page_factories:
+            self.stacked_pages.addWidget(QWidget())
+
+    def _ensure_page(self, index):
+        if index in self._created_pages or not 0 <= index < len(self._page_factories):
+            return
+        placeholder = self.stacked_pages.widget(index)
+        self.stacked_pages.insertWidget(index, self._page_factories[index]())
+        self.stacked_pages.removeWidget(placeholder)
+        placeholder.deleteLater()
+        self._created_pages.add(index)
+
+    def create_metrics_status(self):
+        """启用指标时, 在状态栏显示 pip/HTTP/后台任务的次数和耗时"""
+        self.metrics_label = QLabel()
+        self.metrics_dialog = None
+        button = QPushButton("指标...")
+        button.clicked.connect(self._show_metrics)
+        self.statusBar().addPermanentWidget(self.metrics_label, 1)
+        self.statusBar().addPermanentWidget(button)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(METRICS_INTERVAL)
+        self.metrics_timer.timeout.connect(self._refresh_metrics_status)
+        self.metrics_timer.start()
+        self._refresh_metrics_status()
+
+    def _refresh_metrics_status(self):
+        parts = []
+        for title, prefix in [("pip", "pip.command"), ("HTTP", "http.lookup"),
+                              ("任务", "worker.job")]:
+            count, seconds = METRICS.total(prefix)
+            parts.append(f"{title}: {count} 次 / {seconds:.1f}s")
+        self.metrics_label.setText("    ".join(parts))
+
+    def _show_metrics(self):
+        if self.metrics_dialog is None:
+            self.metrics_dialog = widgets.MetricsDialog(self)
+        self.metrics_dialog.refresh()
+        self.metrics_dialog.show()
 
     def show(self):
         # 左侧导航栏
         self.create_left_navigation()
         # 右侧内容区域
         self.create_right_content()
+        if METRICS.enabled:
+            self.create_metrics_status()
 
         # 连接信号槽
         def change_page(index):
             """切换页面"""
+            self._ensure_page(index)
             self.stacked_pages.setCurrentIndex(index)
 
         self.nav_list.currentRowChanged.connect(change_page)
@@ -125,3 +177,8 @@ class Dashboard(QMainWindow):
         self.nav_list.setCurrentRow(0)
 
         super().show()
+
+    def closeEvent(self, event):  # pylint: disable=invalid-name
+        # 取消排队中的任务, 并等待执行中的任务 (例如正在运行的 pip) 结束
+        scheduler.SCHEDULER.shutdown()
+        super().closeEvent(event)
@@ -1,18 +1,30 @@
 
-from loguru import logger
-from PySide6.QtWidgets import QLabel, QPlainTextEdit, QVBoxLayout, QWidget
+import os
 
-from pipui.core import services
-from pipui.ui import threads
+from loguru import logger
+from packaging.utils import canonicalize_name
+from PySide6.QtCore import QFileSystemWatcher, QTimer
+from PySide6.QtGui import QFontDatabase
+from PySide6.QtWidgets import (QCheckBox, QFileDialog, QLabel,  # fmt: skip
+                               QLineEdit, QMessageBox, QPlainTextEdit,
+                               QTreeWidget, QTreeWidgetItem, QVBoxLayout,
+                               QWidget)
+
+from pipui.common import logging
+from pipui.core import (environments, mirrors, search, services, snapshots,
+                        versions)
+from pipui.ui import scheduler, tasks
 from pipui.ui.widgets import *
 
-PIP_REPOS = {
-    "官方": "https://pypi.org/simple",
-    "清华大学": "https://pypi.tuna.tsinghua.edu.cn/simple",
-    "中国科技大学": "https://pypi.mirrors.ustc.edu.cn/simple",
-    "阿里云": "https://mirrors.aliyun.com/pypi/simple",
-    "腾讯": "http://mirrors.cloud.tencent.com/pypi/simple",
-}
+# 文件系统事件的合并时间, 单位: 毫秒
+WATCH_DEBOUNCE = 500
+# 日志页面读取新日志的间隔, 单位: 毫秒
+LOG_REFRESH_INTERVAL = 200
+
+PIP_REPOS = mirrors.MIRRORS
+
+SEARCH_MODES = {"包含": search.MODE_SUBSTRING, "前缀": search.MODE_PREFIX,
+                "模糊": search.MODE_FUZZY}
 
 
 class PipVersion(QWidget):
@@ -26,17 +38,11 @@ class PipVersion(QWidget):
         layout = QVBoxLayout()
         self.setLayout(layout)
 
-        self._thead_get_pip_version = threads.GetPipVersionThread()
-        self._thead_get_pip_version.signal.connect(self._refresh_pip_version)
-
-        self._thead_get_pip_last_version = threads.GetPipLastVersionThread()
-        self._thead_get_pip_last_version.signal.connect(self._refresh_pip_last_version)
-
-        self._thead_update_pip = threads.UpdaePipThread()
-        self._thead_update_pip.signal.connect(self._refresh_pip_version)
+        self._update_task: Optional[scheduler.Task] = None
+        self.update_progress = InstallProgressBar(on_cancel=self._cancel_update_pip)
 
         self.btn_upgrade = v_button("更新", color="success", disabled=True,
-                                    onclick=self._thead_update_pip.start)
+                                    onclick=self._update_pip)
         for child in [
             self.label_version,
             self.label_new_version,
@@ -47,6 +53,7 @@ class PipVersion(QWidget):
                     self.btn_upgrade,
                 ]
             ),
+            self.update_progress,
         ]:
             layout.addWidget(child)
         layout.addStretch()
@@ -54,25 +61,50 @@ class PipVersion(QWidget):
         self._get_pip_version()
 
     def _get_pip_version(self):
-        self._thead_get_pip_version.start()
+        scheduler.SCHEDULER.submit(tasks.get_pip_version, key="pip-version",
+                                   on_result=self._refresh_pip_version,
+                                   on_error=lambda _: self._refresh_pip_version(""))
+
+    def _update_pip(self):
+        self.btn_upgrade.setDisabled(True)
+        self.update_progress.start("更新 pip")
+        self._update_task = scheduler.SCHEDULER.submit(
+            tasks.update_pip, resource=scheduler.RESOURCE_PIP, priority=scheduler.PRIORITY_HIGH,
+            on_progress=self._refresh_update_progress, on_finished=self._on_update_pip_finished)
+
+    def _cancel_update_pip(self):
+        if self._update_task is not None:
+            self._update_task.cancel()
+
+    def _refresh_update_progress(self, event):
+        self.update_progress.set_progress(event)
+
+    def _on_update_pip_finished(self, task: scheduler.Task):
+        self._update_task = None
+        if task.state == scheduler.STATE_DONE:
+            self.update_progress.finish("更新完成")
+        elif task.state == scheduler.STATE_CANCELLED:
+            self.update_progress.finish("更新已取消")
+        else:
+            self.update_progress.finish("❗更新失败")
+        self._get_pip_version()
 
-    def _refresh_pip_version(self, msg: str):
-        signal_msg = SignalMessage.from_json(msg)
-        if signal_msg.success:
-            self.pip_version = signal_msg.data.get('version', '')
+    def _refresh_pip_version(self, version: str):
+        if version:
+            self.pip_version = version
             self.label_version.setText(f"pip版本: {self.pip_version}")
         else:
             self.label_version.setText("未安装")
         self.btn_upgrade.setDisabled(True)
 
     def _get_pip_last_version(self):
-        self._thead_get_pip_last_version.start()
+        scheduler.SCHEDULER.submit(tasks.get_pip_last_version, key="pip-last-version",
+                                   on_result=self._refresh_pip_last_version,
+                                   on_error=lambda _: self._refresh_pip_last_version(None))
 
-    def _refresh_pip_last_version(self, msg: str):
-        signal_msg = SignalMessage.from_json(msg)
-        if signal_msg.success:
-            new_version = signal_msg.data.get('version', '')
-            if new_version != self.pip_version:
+    def _refresh_pip_last_version(self, new_version: Optional[str]):
+        if new_version is not None:
+            if versions.is_newer(self.pip_version, new_version):
                 label = f"🎉新版本: {new_version}"
                 self.btn_upgrade.setDisabled(False)
             else:
@@ -82,7 +114,6 @@ class PipVersion(QWidget):
             label = "❗检查失败"
             self.btn_upgrade.setDisabled(False)
         self.label_new_version.setText(label)
-        
 
     def _uninstall_pip(self, *args):
         raise ImportError("uninstall pip")
@@ -104,6 +135,14 @@ class PipConfig(QWidget):
         self.box_pip_repos = v_dropdown_selector(list(PIP_REPOS.keys()), min_width=150)
         self.box_pip_repos.currentText()
 
+        self.btn_probe = v_button("测速", color="info", onclick=self._probe_pip_repos)
+        self.check_auto_repo = QCheckBox("自动使用最快的源")
+        self.text_probe = QPlainTextEdit()
+        self.text_probe.setReadOnly(True)
+        self.text_probe.setMaximumBlockCount(len(PIP_REPOS) + 1)
+        self.text_probe.setFont(font)
+        self.text_probe.setHidden(True)
+
         layout = QVBoxLayout()
         self.setLayout(layout)
         for child in [
@@ -113,23 +152,21 @@ class PipConfig(QWidget):
                 v_h5("选择源:"),
                 self.box_pip_repos,
                 v_button("设置", color="info", onclick=self._set_pip_repo),
+                self.btn_probe,
+                self.check_auto_repo,
             ]),
+            self.text_probe,
         ]:
             layout.addWidget(child)
         layout.addStretch()
 
-        self._thead_get_pip_config = threads.GetPipConfigThread()
-        self._thead_get_pip_config.signal.connect(self._refresh_pip_config)
-        self._thead_set_pip_repo = threads.SetPipRepoThread()
-        self._thead_set_pip_repo.signal.connect(self._refresh_pip_config)
-
         self._init_data()
 
     def _init_data(self):
-        self._thead_get_pip_config.start()
+        scheduler.SCHEDULER.submit(tasks.get_pip_config, key="pip-config",
+                                   on_result=self._refresh_pip_config)
 
-    def _refresh_pip_config(self, msg: str):
-        config = SignalMessage.from_json(msg).data.get('config', '')
+    def _refresh_pip_config(self, config: str):
         self.text_config.setPlainText(config)
 
     def _set_pip_repo(self):
@@ -138,15 +175,40 @@ class PipConfig(QWidget):
         if not repo:
             return
         logger.debug("set pip repo -> {}({})", repo_name, repo)
-        self._thead_set_pip_repo.set_repo(repo)
-        self._thead_set_pip_repo.start()
+        scheduler.SCHEDULER.submit(tasks.set_pip_repo, repo, resource=scheduler.RESOURCE_PIP,
+                                   on_result=self._refresh_pip_config)
+
+    def _probe_pip_repos(self):
+        self.btn_probe.setDisabled(True)
+        self.text_probe.setHidden(False)
+        self.text_probe.setPlainText("测速中 ...")
+        scheduler.SCHEDULER.submit(tasks.probe_mirrors, PIP_REPOS, key="probe-mirrors",
+                                   on_result=self._refresh_probe_result,
+                                   on_finished=lambda _: self.btn_probe.setDisabled(False))
+
+    def _refresh_probe_result(self, results: List[mirrors.ProbeResult]):
+        lines = []
+        for result in results:
+            if not result.ok:
+                lines.append(f"{result.name:<8} ❗{result.error}")
+                continue
+            lines.append(f"{result.name:<8} 连接 {result.connect * 1000:>6.0f}ms"
+                         f"  首字节 {result.ttfb * 1000:>6.0f}ms"
+                         f"  速度 {result.throughput / 1024:>8.0f}KB/s")
+        self.text_probe.setPlainText("\n".join(lines))
+        if not results or not results[0].ok:
+            return
+        # 选中最快的源, 勾选自动设置时直接应用
+        self.box_pip_repos.setCurrentText(results[0].name)
+        if self.check_auto_repo.isChecked():
+            self._set_pip_repo()
 
 
 class PipPackages(QWidget):
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
-        self.table = PackageTable(["包名", "版本", "新版本"])
+        self.table = PackageTable(["包名", "版本", "新版本", "漏洞", "大小"])
         layout = QVBoxLayout()
         self.setLayout(layout)
 
@@ -156,30 +218,92 @@ class PipPackages(QWidget):
             "检测更新...", color="info", onclick=self._refresh_all_version
         )
 
+        self.btn_update_selected = v_button(
+            "更新所选", color="warning",
+            onclick=lambda: self.table.update_packages(self.table.selected_packages())
+        )
+        self.btn_select_not_required = v_button(
+            "选中未被依赖的包", onclick=self._select_not_required
+        )
+        self.btn_import_advisories = v_button(
+            "导入漏洞库...", onclick=self._import_advisories
+        )
+        self.btn_import_advisories.setToolTip("导入 OSV 格式的漏洞数据 (.json 或 .zip)")
+
         self.update_progress = v_progress_bar(hide=True)
+        self.label_check = QLabel("")
+
+        self.text_search = QLineEdit()
+        self.text_search.setPlaceholderText("搜索包名或简介")
+        self.text_search.setClearButtonEnabled(True)
+        self.text_search.setMinimumWidth(240)
+        self.text_search.textChanged.connect(self._search)
+        self.box_search_mode = v_dropdown_selector(list(SEARCH_MODES))
+        self.box_search_mode.currentTextChanged.connect(self._search)
+        self.check_outdated = QCheckBox("只显示可更新")
+        self.check_outdated.toggled.connect(self.table.proxy.set_outdated_only)
+        self.check_top_level = QCheckBox("只显示顶层包")
+        self.check_top_level.setToolTip("没有被其他包依赖的包")
+        self.check_top_level.setDisabled(True)
+        self.check_top_level.toggled.connect(self._filter_top_level)
+        self.label_total = QLabel("")
 
         for child in [
             v_row([
-                v_button_group([self.btn_check_version]),
+                v_button_group([self.btn_check_version, self.btn_update_selected,
+                                self.btn_select_not_required, self.btn_import_advisories]),
                 self.update_progress,
+                self.label_check,
             ]),
+            v_row([self.text_search, self.box_search_mode, self.check_outdated,
+                   self.check_top_level, self.label_total]),
             self.table,
         ]:
             layout.addWidget(child)
 
+        # 监视 site-packages, 变化后合并一段时间内的事件再增量刷新
+        self._watch_timer = QTimer(self)
+        self._watch_timer.setSingleShot(True)
+        self._watch_timer.setInterval(WATCH_DEBOUNCE)
+        self._watch_timer.timeout.connect(self._refresh_changed_packages)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(lambda _: self._watch_timer.start())
+
+        # 先显示上一次缓存的包列表, 然后在后台刷新
+        self._set_packages(services.PIP.cached_packages())
         self._refresh_pip_packages()
-        self._thread = threads.CheckPkgVersionThread()
-        self._thread.signal.connect(self._receive_update_signal)
 
     def _refresh_all_version(self):
-        logger.debug("start update thread", self._thread)
+        if scheduler.SCHEDULER.find("check-versions"):
+            return
+        logger.debug("start checking new versions")
         self._show_and_reset_progress()
-        self._thread.set_packages(self.packages)
-        self._thread.start()
-
-    def _receive_update_signal(self, msg: str):
-        self.table.update_item(msg)
-        self.update_progress.setValue(self.update_progress.value() + 1)
+        self.label_check.setText("")
+        # 检测期间表格可能增删行, 使用副本
+        scheduler.SCHEDULER.submit(tasks.check_versions, list(self.packages),
+                                   key="check-versions", batch_progress=True,
+                                   on_progress=self._receive_versions,
+                                   on_result=lambda _: self._classify_versions())
+
+    def _classify_versions(self):
+        # 检测结束后一次比较所有的包, 之后的按钮状态和筛选只查询缓存的比较结果
+        groups = versions.classify(self.packages)
+        upgradable = groups[versions.STATUS_UPGRADABLE]
+        text = f"可更新 {len(upgradable)} 个"
+        if local_newer := groups[versions.STATUS_LOCAL_NEWER]:
+            text += f", 本地版本较新 {len(local_newer)} 个"
+        self.label_check.setText(text)
+        self._prefetch_wheels(upgradable)
+
+    def _prefetch_wheels(self, packages: List[PyPackage]):
+        # 优先级最低, 在空闲时下载, 不影响其他任务
+        if services.PIP.prefetch and packages:
+            scheduler.SCHEDULER.submit(tasks.prefetch_wheels, packages,
+                                       key="prefetch-wheels", priority=scheduler.PRIORITY_LOW)
+
+    def _receive_versions(self, results: List[Tuple[str, Optional[str]]]):
+        self.table.update_items(results)
+        self.update_progress.setValue(self.update_progress.value() + len(results))
         logger.debug("completed: {}", self.update_progress.value())
 
     def _show_and_reset_progress(self):
@@ -187,6 +311,376 @@ class PipPackages(QWidget):
         self.update_progress.setValue(0)
         self.update_progress.setRange(0, len(self.packages))
 
-    def _refresh_pip_packages(self):
-        self.packages = services.PIP.list_packages()
+    def _set_packages(self, packages: List[PyPackage]):
+        self.packages = packages
         self.table.set_packages(self.packages)
+        self._show_total()
+
+    def _refresh_sizes(self):
+        # 包列表变化后正在统计的列表已经过时, 取消后重新提交; 缓存中的大小会立即返回
+        if (task := scheduler.SCHEDULER.find("package-sizes")) is not None:
+            task.cancel()
+        scheduler.SCHEDULER.submit(tasks.package_sizes, list(self.packages),
+                                   key="package-sizes", priority=scheduler.PRIORITY_LOW,
+                                   batch_progress=True, on_progress=self._receive_sizes)
+
+    def _import_advisories(self):
+        path, _ = QFileDialog.getOpenFileName(self, "导入漏洞库", "",
+                                              "OSV (*.zip *.json);;所有文件 (*)")
+        if not path:
+            return
+        self.btn_import_advisories.setDisabled(True)
+        scheduler.SCHEDULER.submit(tasks.import_advisories, path, key="import-advisories",
+                                   on_result=self._receive_advisory_import,
+                                   on_error=self._receive_advisory_import_error)
+
+    def _receive_advisory_import(self, count: int):
+        self.btn_import_advisories.setDisabled(False)
+        QMessageBox.information(self, "导入漏洞库", f"已导入 {count} 条漏洞")
+        self._audit_packages()
+
+    def _receive_advisory_import_error(self, error):
+        self.btn_import_advisories.setDisabled(False)
+        QMessageBox.warning(self, "导入漏洞库", f"导入失败: {error}")
+
+    def _audit_packages(self):
+        if not services.PIP.advisories.exists:
+            return
+        if (task := scheduler.SCHEDULER.find("audit-packages")) is not None:
+            task.cancel()
+        scheduler.SCHEDULER.submit(tasks.audit_packages, list(self.packages),
+                                   key="audit-packages",
+                                   on_result=self.table.model.set_advisories)
+
+    def _receive_sizes(self, sizes: List[Tuple[str, int]]):
+        self.table.update_sizes(sizes)
+        self._show_total()
+
+    def _show_total(self):
+        total, pending = self.table.total_size()
+        text = f"共 {len(self.packages)} 个包, 总大小 {format_size(total)}"
+        self.label_total.setText(f"{text} (统计中...)" if pending else text)
+
+    def _refresh_pip_packages(self):
+        scheduler.SCHEDULER.submit(tasks.list_packages, key="list-packages",
+                                   resource=scheduler.RESOURCE_PACKAGES,
+                                   on_result=self._receive_packages)
+
+    def _receive_packages(self, packages: List[PyPackage]):
+        # 保留已经检测到的新版本和统计过的大小
+        new_versions = {p.name: p.new_version for p in self.packages if p.new_version}
+        sizes = {p.path: p.size for p in self.packages if p.size is not None}
+        for package in packages:
+            package.new_version = new_versions.get(package.name, package.new_version)
+            package.size = sizes.get(package.path)
+        self._set_packages(packages)
+        self._refresh_sizes()
+        self._audit_packages()
+        # 包列表和依赖图在同一个任务中刷新, 之后才显示依赖信息
+        self.table.model.dependency_graph = services.PIP.dependency_graph
+        self.check_top_level.setDisabled(False)
+        self._filter_top_level()
+        self._watch_site_packages()
+
+    def _search(self):
+        mode = SEARCH_MODES.get(self.box_search_mode.currentText(), search.MODE_SUBSTRING)
+        self.table.proxy.set_query(self.text_search.text(), mode)
+
+    def _filter_top_level(self):
+        graph = self.table.model.dependency_graph
+        if not self.check_top_level.isChecked() or graph is None:
+            self.table.proxy.set_top_level(None)
+            return
+        self.table.proxy.set_top_level(graph.name(key) for key in graph.not_required())
+
+    def _select_not_required(self):
+        if (graph := self.table.model.dependency_graph) is not None:
+            self.table.select_packages(graph.not_required())
+
+    def _watch_site_packages(self):
+        paths = set(services.PIP.package_index.watch_paths())
+        watched = set(self._watcher.directories())
+        if paths - watched:
+            self._watcher.addPaths(sorted(paths - watched))
+        if watched - paths:
+            self._watcher.removePaths(sorted(watched - paths))
+
+    def _refresh_changed_packages(self):
+        # 正在执行的刷新可能已经错过了这次变化, 等它结束后再刷新
+        task = scheduler.SCHEDULER.find("refresh-packages")
+        if task is not None and task.state == scheduler.STATE_RUNNING:
+            self._watch_timer.start()
+            return
+        scheduler.SCHEDULER.submit(tasks.refresh_packages, key="refresh-packages",
+                                   resource=scheduler.RESOURCE_PACKAGES,
+                                   on_result=self._receive_package_changes)
+
+    def _receive_package_changes(self, changes: IndexChanges):
+        if changes:
+            self.table.apply_changes(changes)
+            self._filter_top_level()
+            self._refresh_sizes()
+            self._audit_packages()
+        self._watch_site_packages()
+
+
+class PipEnvironments(QWidget):
+    """本机所有 Python 环境的包数量和可更新的包"""
+
+    KINDS = {
+        environments.KIND_CURRENT: "当前",
+        environments.KIND_VENV: "venv",
+        environments.KIND_CONDA: "conda",
+    }
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.environments: List[environments.Environment] = []
+        self.env_packages: Dict[str, List[PyPackage]] = {}
+        self._items: Dict[str, QTreeWidgetItem] = {}
+
+        self.btn_scan = v_button("扫描环境", color="info", onclick=self._scan)
+        self.btn_check = v_button("检测更新...", color="warning", disabled=True,
+                                  onclick=self._check)
+        self.update_progress = v_progress_bar(hide=True)
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["环境 / 包", "类型", "版本 / 包数量", "新版本 / 可更新", "路径"])
+        self.tree.setColumnWidth(0, 240)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        layout.addWidget(v_row([v_button_group([self.btn_scan, self.btn_check]),
+                                self.update_progress]))
+        layout.addWidget(self.tree)
+
+        self._scan()
+
+    def _scan(self):
+        self.btn_scan.setDisabled(True)
+        scheduler.SCHEDULER.submit(tasks.scan_environments, key="scan-environments",
+                                   priority=scheduler.PRIORITY_LOW,
+                                   on_result=self._receive_environments,
+                                   on_finished=lambda _: self.btn_scan.setDisabled(False))
+
+    def _receive_environments(self, result: dict):
+        self.environments = result['environments']
+        self.env_packages = result['packages']
+        self.tree.clear()
+        self._items = {}
+        for env in self.environments:
+            packages = self.env_packages.get(env.prefix, [])
+            item = QTreeWidgetItem([env.name, self.KINDS.get(env.kind, env.kind),
+                                    str(len(packages)), "", env.prefix])
+            item.setToolTip(4, "\n".join([env.python] + env.site_packages))
+            self.tree.addTopLevelItem(item)
+            self._items[env.prefix] = item
+        self.btn_check.setDisabled(not self.environments)
+
+    def _check(self):
+        names = {canonicalize_name(p.name) for packages in self.env_packages.values()
+                 for p in packages}
+        self.update_progress.setRange(0, len(names))
+        self.update_progress.setValue(0)
+        self.update_progress.setHidden(False)
+        self.btn_check.setDisabled(True)
+        scheduler.SCHEDULER.submit(tasks.check_environments, self.env_packages,
+                                   key="check-environments", priority=scheduler.PRIORITY_LOW,
+                                   batch_progress=True, on_progress=self._receive_versions,
+                                   on_finished=self._refresh_outdated)
+
+    def _receive_versions(self, results: List[Tuple[str, Optional[str]]]):
+        self.update_progress.setValue(self.update_progress.value() + len(results))
+
+    def _refresh_outdated(self, _task: scheduler.Task):
+        self.btn_check.setDisabled(False)
+        for env in self.environments:
+            item = self._items[env.prefix]
+            item.takeChildren()
+            groups = versions.classify(self.env_packages.get(env.prefix, []))
+            outdated = groups[versions.STATUS_UPGRADABLE]
+            item.setText(3, str(len(outdated)))
+            for package in outdated:
+                item.addChild(QTreeWidgetItem([package.name, "", package.version,
+                                               package.new_version, package.path]))
+
+
+class PipSnapshots(QWidget):
+    """保存环境快照, 比较快照, 恢复到快照"""
+
+    CURRENT = "当前环境"
+    CHANGES = {
+        snapshots.CHANGE_ADDED: "新增",
+        snapshots.CHANGE_REMOVED: "删除",
+        snapshots.CHANGE_CHANGED: "变化",
+    }
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.btn_save = v_button("保存快照", color="info", onclick=self._save)
+        self.btn_open = v_button("打开快照...", onclick=self._open)
+        self.box_base = v_dropdown_selector([], min_width=200)
+        self.box_target = v_dropdown_selector([], min_width=200)
+        self.btn_diff = v_button("比较", color="info", onclick=self._diff)
+        self.btn_restore = v_button("恢复到快照", color="warning", onclick=self._restore)
+        self.check_remove_extra = QCheckBox("卸载快照中没有的包")
+        self.restore_progress = InstallProgressBar(on_cancel=self._cancel_restore)
+        self.label_summary = QLabel("")
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["包名", "变化", "快照", "对比", "来源"])
+        self.tree.setColumnWidth(0, 240)
+        self.tree.setRootIsDecorated(False)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        for child in [
+            v_row([v_button_group([self.btn_save, self.btn_open])]),
+            v_row([v_h5("快照:"), self.box_base, v_h5("对比:"), self.box_target,
+                   self.btn_diff]),
+            v_row([self.btn_restore, self.check_remove_extra]),
+            self.restore_progress,
+            self.label_summary,
+            self.tree,
+        ]:
+            layout.addWidget(child)
+
+        self._restore_task: Optional[scheduler.Task] = None
+        self._reload_snapshots()
+
+    def _reload_snapshots(self, selected: str = ""):
+        opened = [self.box_base.itemData(i) for i in range(self.box_base.count())]
+        files = snapshots.list_snapshots()
+        files += [path for path in opened if path and path not in files]
+        for box, extra in [(self.box_base, []), (self.box_target, [self.CURRENT])]:
+            current = box.currentData()
+            box.clear()
+            for text in extra:
+                box.addItem(text, "")
+            for path in files:
+                box.addItem(os.path.basename(path), path)
+            index = box.findData(selected or current) if box is self.box_base else \
+                box.findData(current)
+            box.setCurrentIndex(max(index, 0))
+        has_snapshot = bool(files)
+        self.btn_diff.setDisabled(not has_snapshot)
+        self.btn_restore.setDisabled(not has_snapshot)
+
+    def _save(self):
+        self.btn_save.setDisabled(True)
+        scheduler.SCHEDULER.submit(tasks.take_snapshot, key="take-snapshot",
+                                   resource=scheduler.RESOURCE_PACKAGES,
+                                   on_result=self._receive_snapshot,
+                                   on_finished=lambda _: self.btn_save.setDisabled(False))
+
+    def _receive_snapshot(self, snapshot: snapshots.Snapshot):
+        self._reload_snapshots(selected=snapshot.path)
+        self.label_summary.setText(f"已保存 {len(snapshot.entries)} 个包: {snapshot.path}")
+
+    def _open(self):
+        path, _ = QFileDialog.getOpenFileName(self, "打开快照", snapshots.snapshot_dir(),
+                                              f"快照 (*{snapshots.SNAPSHOT_SUFFIX});;"
+                                              "所有文件 (*)")
+        if not path:
+            return
+        if self.box_base.findData(path) < 0:
+            self.box_base.addItem(os.path.basename(path), path)
+        self._reload_snapshots(selected=path)
+
+    def _diff(self):
+        if not (base := self.box_base.currentData()):
+            return
+        self.btn_diff.setDisabled(True)
+        scheduler.SCHEDULER.submit(tasks.diff_snapshots, base, self.box_target.currentData(),
+                                   key="diff-snapshots", resource=scheduler.RESOURCE_PACKAGES,
+                                   on_result=self._receive_diff,
+                                   on_error=lambda e: self.label_summary.setText(f"比较失败: {e}"),
+                                   on_finished=lambda _: self.btn_diff.setDisabled(False))
+
+    def _receive_diff(self, result: dict):
+        changes: List[snapshots.SnapshotChange] = result["changes"]
+        counts = {kind: 0 for kind in self.CHANGES}
+        items = []
+        for change in changes:
+            counts[change.kind] += 1
+            old, new = change.old, change.new
+            source = (new or old).source
+            item = QTreeWidgetItem([change.name, self.CHANGES[change.kind],
+                                    old.version if old else "", new.version if new else "",
+                                    source])
+            if old and new and old.source != new.source:
+                item.setToolTip(4, f"{old.source or '索引'} -> {new.source or '索引'}")
+            items.append(item)
+        self.tree.clear()
+        self.tree.addTopLevelItems(items)
+        summary = ", ".join(f"{self.CHANGES[kind]} {count}" for kind, count in counts.items())
+        self.label_summary.setText(f"{len(result['old'].entries)} / {len(result['new'].entries)}"
+                                   f" 个包, {summary}" if changes else "没有变化")
+
+    def _restore(self):
+        if not (path := self.box_base.currentData()):
+            return
+        answer = QMessageBox.question(
+            self, "恢复到快照",
+            f"把当前环境恢复到快照 {os.path.basename(path)}?\n"
+            "新增和版本不同的包将通过一次 pip install 安装"
+            + (", 快照中没有的包将被卸载 (pipui 和它依赖的包除外)"
+               if self.check_remove_extra.isChecked() else ""))
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        self.btn_restore.setDisabled(True)
+        self.restore_progress.start("恢复中...")
+        self._restore_task = scheduler.SCHEDULER.submit(
+            tasks.restore_snapshot, path, remove_extra=self.check_remove_extra.isChecked(),
+            key="restore-snapshot", resource=scheduler.RESOURCE_PIP,
+            on_progress=self.restore_progress.set_progress,
+            on_result=self._receive_restore, on_error=self._receive_restore_error,
+            on_finished=lambda _: self.btn_restore.setDisabled(False))
+
+    def _cancel_restore(self):
+        if self._restore_task is not None:
+            self._restore_task.cancel()
+
+    def _receive_restore(self, changes: List[snapshots.SnapshotChange]):
+        self.restore_progress.finish(f"恢复完成, {len(changes)} 个包有变化" if changes
+                                     else "当前环境与快照相同")
+
+    def _receive_restore_error(self, error):
+        self.restore_progress.finish(f"恢复失败: {error}")
+
+
+class PipLogs(QWidget):
+    """最近的日志; 定时从 LOG_BUFFER 读取新的行, 文本框只保留固定的行数"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.text_log = QPlainTextEdit()
+        self.text_log.setReadOnly(True)
+        self.text_log.setMaximumBlockCount(logging.BUFFER_SIZE)
+        self.text_log.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.text_log.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        self.check_follow = QCheckBox("自动滚动")
+        self.check_follow.setChecked(True)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        layout.addWidget(v_row([v_button("清空", onclick=self.text_log.clear),
+                                self.check_follow]))
+        layout.addWidget(self.text_log)
+
+        self._count = 0
+        self._timer = QTimer(self)
+        self._timer.setInterval(LOG_REFRESH_INTERVAL)
+        self._timer.timeout.connect(self._refresh)
+        self._timer.start()
+        self._refresh()
+
+    def _refresh(self):
+        # 页面不可见时不读取, 再次显示时一次追加 (缓冲区之外的已经丢弃)
+        if not self.isVisible() and self._count:
+            return
+        self._count, lines = logging.LOG_BUFFER.since(self._count)
+        if not lines:
+            return
+        self.text_log.appendPlainText("\n".join(lines))
+        if self.check_follow.isChecked():
+            scrollbar = self.text_log.verticalScrollBar()
+            scrollbar.setValue(scrollbar.maximum())
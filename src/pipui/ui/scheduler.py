@@ -0,0 +1,271 @@
+"""后台任务调度器
+
+所有后台任务都在同一个线程池中执行:
+- 优先级: 线程池和资源等待队列都按优先级取任务
+- 去重: 相同 key 的任务排队或执行期间再次提交时, 只追加回调, 不重复执行
+- 取消: 未开始的任务直接移除; 执行中的任务通过 task.cancelled / task.cancel_event 协作取消
+- 资源串行: 使用同一个 resource 的任务依次执行, 例如同一时间只有一个修改环境的 pip 命令
+- 回调: on_result/on_error/on_progress/on_finished 都在 GUI 线程中调用
+"""
+import heapq
+import itertools
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+
+from pipui.common.executor import ExecutionCancelled
+from pipui.common.metrics import METRICS
+
+PRIORITY_LOW = -10
+PRIORITY_NORMAL = 0
+PRIORITY_HIGH = 10
+
+# 会修改已安装的包或 pip 配置的任务使用这个资源, 同一时间只执行一个
+RESOURCE_PIP = "pip"
+# 读写已安装包索引的任务
+RESOURCE_PACKAGES = "packages"
+
+# 批量发送进度的时间窗口, 单位: 毫秒
+BATCH_INTERVAL = 50
+MIN_THREADS = 4
+
+STATE_PENDING = "pending"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATE_CANCELLED = "cancelled"
+
+_RESULT, _ERROR, _CANCELLED, _PROGRESS = "result", "error", "cancelled", "progress"
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class Task:
+    """一次提交的后台任务, 任务函数的第一个参数"""
+
+    def __init__(self, scheduler: "Scheduler", func: Callable, args: tuple, kwargs: dict,
+                 key: Optional[str], priority: int, resource: Optional[str],
+                 batch_progress: bool) -> None:
+        self.scheduler = scheduler
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.name = getattr(func, "__name__", str(func))
+        self.priority = priority
+        self.resource = resource
+        self.batch_progress = batch_progress
+        self.state = STATE_PENDING
+        self.cancel_event = threading.Event()
+        self._callbacks: Dict[str, List[Callable]] = {
+            "result": [], "error": [], "progress": [], "finished": []}
+        self._progress: list = []
+        self._progress_lock = threading.Lock()
+        # 提交到线程池的 QRunnable, 由 Scheduler 设置; 尚未开始时可以从线程池中取回
+        self.runnable: Optional[QRunnable] = None
+
+    def __repr__(self) -> str:
+        return f"<Task {self.key or self.name} {self.state}>"
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (STATE_DONE, STATE_FAILED, STATE_CANCELLED)
+
+    def check_cancelled(self):
+        """在任务函数中调用, 已取消时抛出 TaskCancelled"""
+        if self.cancelled:
+            raise TaskCancelled(self.name)
+
+    def report(self, item):
+        """在任务函数中调用, 把进度发送到 GUI 线程; batch_progress 的任务按时间窗口合并为列表"""
+        if not self.batch_progress:
+            self.scheduler.delivered.emit(self, _PROGRESS, item)
+            return
+        with self._progress_lock:
+            self._progress.append(item)
+
+    def take_progress(self) -> list:
+        with self._progress_lock:
+            items, self._progress = self._progress, []
+        return items
+
+    def connect(self, on_result: Optional[Callable] = None, on_error: Optional[Callable] = None,
+                on_progress: Optional[Callable] = None,
+                on_finished: Optional[Callable] = None) -> "Task":
+        for name, callback in [("result", on_result), ("error", on_error),
+                               ("progress", on_progress), ("finished", on_finished)]:
+            if callback is not None:
+                self._callbacks[name].append(callback)
+        return self
+
+    def cancel(self):
+        self.scheduler.cancel(self)
+
+    def callbacks(self, name: str) -> List[Callable]:
+        return list(self._callbacks[name])
+
+
+class _TaskRunnable(QRunnable):
+
+    def __init__(self, task: Task) -> None:
+        super().__init__()
+        self.task = task
+        self.setAutoDelete(False)
+
+    def run(self):
+        self.task.scheduler._execute(self.task)  # pylint: disable=protected-access
+
+
+class Scheduler(QObject):
+    # (task, 类型, 值), 从工作线程发出, 在 GUI 线程中处理
+    delivered = Signal(object, str, object)
+
+    def __init__(self, max_threads: Optional[int] = None, parent=None) -> None:
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        default_threads = max(QThreadPool.globalInstance().maxThreadCount(), MIN_THREADS)
+        self.pool.setMaxThreadCount(max_threads or default_threads)
+        self._active: Dict[str, Task] = {}
+        self._tasks: Set[Task] = set()
+        self._busy: Set[str] = set()
+        self._waiting: Dict[str, List[Tuple[int, int, Task]]] = {}
+        self._counter = itertools.count()
+        self.delivered.connect(self._on_delivered)
+        self._batch_timer = QTimer(self)
+        self._batch_timer.setInterval(BATCH_INTERVAL)
+        self._batch_timer.timeout.connect(self._flush_progress)
+
+    def submit(self, func: Callable, *args, key: Optional[str] = None,
+               priority: int = PRIORITY_NORMAL, resource: Optional[str] = None,
+               batch_progress: bool = False, on_result: Optional[Callable] = None,
+               on_error: Optional[Callable] = None, on_progress: Optional[Callable] = None,
+               on_finished: Optional[Callable] = None, **kwargs) -> Task:
+        """提交任务 func(task, *args, **kwargs), 只能在 GUI 线程中调用"""
+        if key is not None and (task := self._active.get(key)) and not task.cancelled:
+            logger.debug("task {} is in flight, reuse it", task)
+            return task.connect(on_result, on_error, on_progress, on_finished)
+        task = Task(self, func, args, kwargs, key, priority, resource, batch_progress)
+        task.connect(on_result, on_error, on_progress, on_finished)
+        if key is not None:
+            self._active[key] = task
+        self._tasks.add(task)
+        if batch_progress and not self._batch_timer.isActive():
+            self._batch_timer.start()
+        if resource is not None and resource in self._busy:
+            heapq.heappush(self._waiting.setdefault(resource, []),
+                           (-priority, next(self._counter), task))
+        else:
+            self._start(task)
+        return task
+
+    def find(self, key: str) -> Optional[Task]:
+        return self._active.get(key)
+
+    def cancel(self, task: Task):
+        task.cancel_event.set()
+        if task.state != STATE_PENDING:
+            return
+        waiting = self._waiting.get(task.resource or "", [])
+        for i, (_, _, waiting_task) in enumerate(waiting):
+            if waiting_task is task:
+                waiting.pop(i)
+                heapq.heapify(waiting)
+                self._finish(task, _CANCELLED, None)
+                return
+        if task.runnable is not None and self.pool.tryTake(task.runnable):
+            self._finish(task, _CANCELLED, None)
+
+    def cancel_all(self):
+        for task in list(self._tasks):
+            self.cancel(task)
+
+    def shutdown(self, msecs: int = 5000):
+        self.cancel_all()
+        self.pool.waitForDone(msecs)
+
+    def _start(self, task: Task):
+        if task.resource is not None:
+            self._busy.add(task.resource)
+        task.runnable = _TaskRunnable(task)
+        self.pool.start(task.runnable, task.priority)
+
+    def _execute(self, task: Task):
+        """在线程池中执行"""
+        if task.cancelled:
+            self.delivered.emit(task, _CANCELLED, None)
+            return
+        task.state = STATE_RUNNING
+        try:
+            with METRICS.timer("worker.job", job=task.name):
+                result = task.func(task, *task.args, **task.kwargs)
+        except (TaskCancelled, ExecutionCancelled):
+            self.delivered.emit(task, _CANCELLED, None)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.opt(exception=e).error("task {} failed: {}", task.name, e)
+            self.delivered.emit(task, _ERROR, e)
+        else:
+            self.delivered.emit(task, _CANCELLED if task.cancelled else _RESULT, result)
+
+    def _on_delivered(self, task: Task, kind: str, value):
+        if kind == _PROGRESS:
+            for callback in task.callbacks("progress"):
+                callback(value)
+            return
+        self._finish(task, kind, value)
+
+    def _finish(self, task: Task, kind: str, value):
+        if task.finished:
+            return
+        if task.batch_progress and (items := task.take_progress()):
+            for callback in task.callbacks("progress"):
+                callback(items)
+        task.state = {_RESULT: STATE_DONE, _ERROR: STATE_FAILED}.get(kind, STATE_CANCELLED)
+        self._tasks.discard(task)
+        if task.key is not None and self._active.get(task.key) is task:
+            del self._active[task.key]
+        if task.resource is not None and task.runnable is not None:
+            self._release(task.resource)
+        if not any(t.batch_progress for t in self._tasks):
+            self._batch_timer.stop()
+
+        if kind == _RESULT:
+            for callback in task.callbacks("result"):
+                callback(value)
+        elif kind == _ERROR:
+            for callback in task.callbacks("error"):
+                callback(value)
+        for callback in task.callbacks("finished"):
+            callback(task)
+
+    def _release(self, resource: str):
+        waiting = self._waiting.get(resource)
+        while waiting:
+            _, _, task = heapq.heappop(waiting)
+            if task.cancelled:
+                self._finish(task, _CANCELLED, None)
+                continue
+            self._start(task)
+            return
+        self._busy.discard(resource)
+
+    def _flush_progress(self):
+        for task in list(self._tasks):
+            if task.batch_progress and (items := task.take_progress()):
+                for callback in task.callbacks("progress"):
+                    callback(items)
+
+
+def __getattr__(name):
+    # 第一次访问 scheduler.SCHEDULER 时才创建, 需要已经创建 QApplication
+    if name == "SCHEDULER":
+        globals()["SCHEDULER"] = Scheduler()
+        return globals()["SCHEDULER"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
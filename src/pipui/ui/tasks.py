@@ -0,0 +1,247 @@
+"""提交给调度器的后台任务, 第一个参数是 scheduler.Task"""
+import time
+from typing import Dict, List, Optional
+from urllib import parse
+
+from loguru import logger
+
+from pipui.core import (environments, jobs, mirrors, services, snapshots,
+                        versions)
+from pipui.core.modules import PyPackage
+from pipui.ui.scheduler import BATCH_INTERVAL, Task
+
+
+def set_pip_repo(_task: Task, repo: str) -> str:
+    result = parse.urlparse(repo)
+    services.PIP.config_set("global.index-url", repo)
+    services.PIP.config_set("global.trusted-host", result.hostname)
+    logger.debug("set pip repo finished")
+    return services.PIP.config_list()
+
+
+def probe_mirrors(_task: Task, repos: Dict[str, str]) -> List[mirrors.ProbeResult]:
+    logger.debug("probe pip repos ...")
+    return mirrors.probe_mirrors(repos)
+
+
+def get_pip_config(_task: Task) -> str:
+    return services.PIP.config_list()
+
+
+def list_packages(_task: Task) -> List[PyPackage]:
+    return services.PIP.list_packages()
+
+
+def refresh_packages(_task: Task):
+    changes = services.PIP.refresh_packages()
+    if changes:
+        logger.info("packages changed: +{} -{} ~{}",
+                    len(changes.added), len(changes.removed), len(changes.changed))
+    return changes
+
+
+def get_pip_version(_task: Task) -> str:
+    return services.PIP.version()
+
+
+def get_pip_last_version(_task: Task) -> str:
+    logger.debug("检查pip新版本 ...")
+    return services.PIP.last_version("pip")
+
+
+def install(task: Task, *names: str, upgrade=True):
+    """执行安装并报告 InstallProgress; 同一阶段内的进度最多每个 BATCH_INTERVAL 报告一次"""
+    last_phase, last_emit = None, 0.0
+    for event in services.PIP.install_stream(*names, upgrade=upgrade, cancel=task.cancel_event):
+        now = time.monotonic()
+        if event.phase != last_phase or now - last_emit >= BATCH_INTERVAL / 1000:
+            task.report(event)
+            last_phase, last_emit = event.phase, now
+
+
+def update_pip(task: Task) -> str:
+    logger.debug("更新pip ...")
+    install(task, "pip")
+    logger.debug("更新成功")
+    return services.PIP.version()
+
+
+def run_pip_jobs(task: Task, queue: jobs.JobQueue):
+    """依次执行 JobQueue 中的任务, 每批合并为一次 pip 调用
+
+    报告 InstallProgress 和每个包的结果 JobResult; 取消时清空队列
+    """
+    while not task.cancelled and (batch := queue.take_batch()):
+        logger.info("start {} packages: {}", batch.action, " ".join(batch.names))
+        if batch.action == jobs.ACTION_UNINSTALL:
+            _uninstall(task, batch.names)
+        else:
+            _upgrade(task, batch.names)
+    if task.cancelled:
+        queue.clear()
+
+
+def _upgrade(task: Task, names: List[str]):
+    if not names:
+        return
+    before = {name: services.PIP.installed_version(name) for name in names}
+    try:
+        install(task, *names)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        if task.cancelled:
+            logger.warning("upgrade {} cancelled", " ".join(names))
+            for name in names:
+                task.report(jobs.JobResult(jobs.ACTION_UPGRADE, name, False, cancelled=True))
+            return
+        if len(names) == 1:
+            logger.error("upgrade package {} failed: {}", names[0], e)
+            task.report(jobs.JobResult(jobs.ACTION_UPGRADE, names[0], False))
+            return
+        # 能从输出中确定失败的包时, 其余的包仍作为一批重试; 否则逐个重试
+        output = getattr(e, "cmd", "") or ""
+        failed = [name for name in names
+                  if f"No matching distribution found for {name}" in output]
+        if failed:
+            logger.warning("batch upgrade failed because of {}, retry the others", failed)
+            for name in failed:
+                task.report(jobs.JobResult(jobs.ACTION_UPGRADE, name, False))
+            _upgrade(task, [name for name in names if name not in failed])
+            return
+        logger.warning("batch upgrade failed, retry one by one: {}", e)
+        for name in names:
+            if task.cancelled:
+                break
+            _upgrade(task, [name])
+        return
+    for name in names:
+        version = services.PIP.installed_version(name)
+        logger.success("upgrade package {} {} -> {}", name, before[name], version)
+        task.report(jobs.JobResult(jobs.ACTION_UPGRADE, name, True, version=version,
+                                   changed=version != before[name]))
+
+
+def _uninstall(task: Task, names: List[str]):
+    try:
+        services.PIP.uninstall(*names)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.error("uninstall packages {} failed: {}", " ".join(names), e)
+    for name in names:
+        removed = not services.PIP.installed_version(name)
+        if removed:
+            logger.success("uinstall package {} success", name)
+        task.report(jobs.JobResult(jobs.ACTION_UNINSTALL, name, removed))
+
+
+def _is_network_error(error: Optional[Exception]) -> bool:
+    # requests 导入较慢, 不在启动时导入; 检测更新时 pypi 模块已经导入了 requests
+    import requests  # pylint: disable=import-outside-toplevel
+
+    return isinstance(error, (requests.ConnectionError, requests.ConnectTimeout))
+
+
+def check_versions(task: Task, packages: List[PyPackage], workers: Optional[int] = None):
+    """检测更新, 报告 (包名, 新版本), 失败时新版本为 None; 需要以 batch_progress 提交"""
+    logger.debug("check update start")
+    names = [pkg.name for pkg in packages]
+    results = services.PIP.iter_last_versions(names, workers=workers)
+    try:
+        for name, version, error in results:
+            if task.cancelled:
+                break
+            if _is_network_error(error):
+                logger.error("check update failed, check your network and retry. {}", error)
+                break
+            if error:
+                logger.error("check update {} failed: {}", name, error)
+            else:
+                logger.debug("package {} new version: {}", name, version)
+            task.report((name, version))
+    finally:
+        results.close()
+    logger.debug("check update finished")
+
+
+def prefetch_wheels(task: Task, packages: List[PyPackage]):
+    """下载可更新的包的新版本 wheel, 之后的更新从本地安装"""
+    items = [(p.name, p.new_version) for p in packages
+             if p.status == versions.STATUS_UPGRADABLE]
+    if not items:
+        return
+    logger.debug("prefetch {} wheels", len(items))
+    results = services.PIP.prefetch_wheels(items, cancel=task.cancel_event)
+    logger.info("prefetched {} of {} wheels", sum(1 for r in results if r.path), len(items))
+
+
+def package_sizes(task: Task, packages: List[PyPackage]):
+    """统计包占用的磁盘空间, 报告 (包名, 字节数); 需要以 batch_progress 提交"""
+    for name, size in services.PIP.iter_package_sizes(packages, cancel=task.cancel_event):
+        if task.cancelled:
+            break
+        task.report((name, size))
+
+
+def import_advisories(_task: Task, source: str) -> int:
+    logger.info("import advisories from {}", source)
+    return services.PIP.import_advisories(source)
+
+
+def audit_packages(_task: Task, packages: List[PyPackage]) -> Dict[str, list]:
+    """按本地漏洞库检查所有的包, 返回 {包名: [Advisory]}"""
+    results = services.PIP.audit_packages(packages)
+    if results:
+        logger.warning("{} packages have known vulnerabilities: {}",
+                       len(results), " ".join(sorted(results)))
+    return results
+
+
+def take_snapshot(_task: Task, path: Optional[str] = None) -> snapshots.Snapshot:
+    snapshot = services.PIP.snapshot()
+    snapshot.save(path or snapshots.new_snapshot_path())
+    return snapshot
+
+
+def diff_snapshots(_task: Task, old_path: str, new_path: Optional[str] = None) -> dict:
+    """比较两个快照; new_path 为空时与当前环境比较"""
+    old = snapshots.Snapshot.load(old_path)
+    new = snapshots.Snapshot.load(new_path) if new_path else services.PIP.snapshot()
+    return {"old": old, "new": new, "changes": snapshots.diff(old, new)}
+
+
+def restore_snapshot(task: Task, path: str, remove_extra=False) -> List[snapshots.SnapshotChange]:
+    """把当前环境恢复到快照: 新增和版本不同的包合并为一次 pip install, 报告 InstallProgress
+
+    remove_extra 为 True 时再卸载快照中没有的包
+    """
+    target = snapshots.Snapshot.load(path)
+    changes = snapshots.diff(services.PIP.snapshot(), target)
+    requirements, extra = snapshots.restore_plan(changes)
+    if requirements:
+        logger.info("restore {} packages from {}", len(requirements), path)
+        install(task, *requirements, upgrade=False)
+    if remove_extra and extra and not task.cancelled:
+        logger.info("uninstall packages not in the snapshot: {}", " ".join(extra))
+        services.PIP.uninstall(*extra)
+    return changes
+
+
+def scan_environments(_task: Task) -> dict:
+    envs = environments.discover_environments()
+    return {'environments': envs, 'packages': environments.scan_environments(envs)}
+
+
+def check_environments(task: Task, env_packages: Dict[str, List[PyPackage]]):
+    """检测所有环境的更新, 同名的包只查询一次; 需要以 batch_progress 提交"""
+    results = environments.iter_shared_last_versions(env_packages,
+                                                     services.PIP.iter_last_versions)
+    try:
+        for name, version, error in results:
+            if task.cancelled:
+                break
+            if _is_network_error(error):
+                logger.error("check update failed, check your network and retry. {}", error)
+                break
+            if error:
+                logger.error("check update {} failed: {}", name, error)
+            task.report((name, version))
+    finally:
+        results.close()
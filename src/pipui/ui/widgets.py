@@ -1,33 +1,29 @@
-import dataclasses
-import json
-from typing import Callable, List, Optional
+import bisect
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 from loguru import logger
+from packaging.utils import canonicalize_name
 from PySide6 import QtWidgets
+from PySide6.QtCore import (QAbstractProxyModel, QAbstractTableModel, QEvent,
+                            QItemSelection, QItemSelectionModel, QModelIndex,
+                            QRect, QSize, Qt, Signal)
+from PySide6.QtGui import QColor, QFontDatabase, QPainter, QPalette
 from PySide6.QtWidgets import (QAbstractButton, QAbstractItemView,  # fmt: skip
-                               QComboBox, QHBoxLayout, QHeaderView, QLabel,
-                               QPushButton, QTableWidget, QTableWidgetItem,
-                               QVBoxLayout, QWidget)
-
+                               QComboBox, QDialog, QFileDialog, QHBoxLayout,
+                               QHeaderView, QLabel, QMessageBox,
+                               QPlainTextEdit, QPushButton,
+                               QStyledItemDelegate, QStyleOptionViewItem,
+                               QTableView, QVBoxLayout, QWidget)
+
+from pipui.common.metrics import METRICS
+from pipui.core import jobs, search, versions
+from pipui.core.advisories import Advisory
+from pipui.core.depgraph import DependencyGraph
+from pipui.core.disksize import format_size
+from pipui.core.manager import progress
 from pipui.core.manager.pip import PyPackage
-from pipui.ui import threads
-
-
-@dataclasses.dataclass
-class SignalMessage:
-    success: bool
-    data: dict = dataclasses.field(default_factory=dict)
-
-    def to_dict(self) -> dict:
-        return dataclasses.asdict(self)
-
-    def to_json(self) -> str:
-        return json.dumps(self.to_dict())
-
-    @classmethod
-    def from_json(cls, data) -> 'SignalMessage':
-        msg = json.loads(data)
-        return cls(success=msg.get('success', False), data=msg.get("data", {}))
+from pipui.core.pkgindex import IndexChanges
+from pipui.ui import scheduler, tasks
 
 
 def v_h3(text):
@@ -102,6 +98,55 @@ def v_progress_bar(minimum: int = 0, maximum: int = 100, hide=False) -> QtWidget
     widget.setHidden(hide)
     return widget
 
+class InstallProgressBar(QWidget):
+    """安装进度: 当前阶段 + 进度条 + 取消按钮, 默认隐藏"""
+
+    PHASES = {
+        progress.PHASE_COLLECTING: "收集",
+        progress.PHASE_DOWNLOADING: "下载",
+        progress.PHASE_INSTALLING: "安装",
+        progress.PHASE_DONE: "完成",
+    }
+
+    def __init__(self, *args, on_cancel: Optional[Callable] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.label = QLabel("")
+        self.bar = v_progress_bar()
+        self.btn_cancel = v_button("取消", color="danger", variant="text", onclick=on_cancel)
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+        layout.addWidget(self.label)
+        layout.addWidget(self.bar)
+        layout.addWidget(self.btn_cancel)
+        self.setHidden(True)
+
+    def start(self, text: str):
+        self.label.setText(text)
+        # 未知进度时显示为忙碌状态
+        self.bar.setRange(0, 0)
+        self.bar.setHidden(False)
+        self.btn_cancel.setDisabled(False)
+        self.setHidden(False)
+
+    def set_progress(self, event: progress.InstallProgress):
+        self.label.setText(f"{self.PHASES.get(event.phase, event.phase)} {event.package}")
+        if event.phase == progress.PHASE_DOWNLOADING and event.total:
+            # 下载的字节数可能超出 int32, 使用百分比
+            self.bar.setRange(0, 100)
+            self.bar.setValue(event.percent)
+        elif event.phase == progress.PHASE_DONE:
+            self.bar.setRange(0, 100)
+            self.bar.setValue(100)
+        else:
+            self.bar.setRange(0, 0)
+
+    def finish(self, text: str):
+        self.label.setText(text)
+        self.bar.setHidden(True)
+        self.btn_cancel.setDisabled(True)
+
+
 class VLabel(QWidget):
 
     def __init__(self, title: str, *args, subtitle: str = "", **kwargs):
@@ -116,81 +161,735 @@ class VLabel(QWidget):
         # self._layout.addWidget(self.icon)
 
 
-class PackageTable(QWidget):
+def is_upgradable(package: PyPackage) -> bool:
+    return package.status == versions.STATUS_UPGRADABLE
+
+
+class PackageTableModel(QAbstractTableModel):
+    """包列表数据模型, 只保存 PyPackage 列表, 单元格内容在绘制时按需生成"""
+
+    (COLUMN_NAME, COLUMN_VERSION, COLUMN_NEW_VERSION, COLUMN_ADVISORIES, COLUMN_SIZE,
+     COLUMN_ACTIONS) = range(6)
+    SUCCESS_COLOR = "#43a047"
+    FAILED_COLOR = "#e53935"
+    ADVISORY_COLOR = "#e53935"
+    STATUS_TIPS = {
+        versions.STATUS_UPGRADABLE: "可更新",
+        versions.STATUS_UP_TO_DATE: "已是最新版本",
+        versions.STATUS_LOCAL_NEWER: "已安装的版本比索引中的最新版本更新",
+    }
 
     def __init__(self, header: List[str], *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._packages = []
+        self._header = header + ["操作"]
+        self._packages: List[PyPackage] = []
+        self._rows: Optional[Dict[str, int]] = None
+        self._results: Dict[str, Tuple[str, bool]] = {}
+        # 包名 -> 当前版本受影响的漏洞
+        self._advisories: Dict[str, List[Advisory]] = {}
+        # 设置后在包名的提示中显示被哪些包依赖
+        self.dependency_graph: Optional[DependencyGraph] = None
+
+    def rowCount(self, parent=QModelIndex()) -> int:  # pylint: disable=invalid-name
+        return 0 if parent.isValid() else len(self._packages)
+
+    def columnCount(self, parent=QModelIndex()) -> int:  # pylint: disable=invalid-name
+        return 0 if parent.isValid() else len(self._header)
+
+    # pylint: disable-next=invalid-name
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self._header[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        package = self._packages[index.row()]
+        column = index.column()
+        if column == self.COLUMN_NEW_VERSION and package.name in self._results \
+                and role in (Qt.ItemDataRole.ToolTipRole, Qt.ItemDataRole.ForegroundRole):
+            text, failed = self._results[package.name]
+            if role == Qt.ItemDataRole.ToolTipRole:
+                return text
+            return QColor(self.FAILED_COLOR if failed else self.SUCCESS_COLOR)
+        if column == self.COLUMN_NEW_VERSION and role == Qt.ItemDataRole.ToolTipRole:
+            return self.STATUS_TIPS.get(package.status)
+        if column == self.COLUMN_NAME and role == Qt.ItemDataRole.ToolTipRole \
+                and self.dependency_graph is not None:
+            return self.required_by_text(package.name)
+        if column == self.COLUMN_SIZE and role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        if column == self.COLUMN_ADVISORIES and package.name in self._advisories:
+            if role == Qt.ItemDataRole.ToolTipRole:
+                return self.advisories_text(package.name)
+            if role == Qt.ItemDataRole.ForegroundRole:
+                return QColor(self.ADVISORY_COLOR)
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if column == self.COLUMN_NAME:
+            return package.name
+        if column == self.COLUMN_VERSION:
+            return package.version
+        if column == self.COLUMN_NEW_VERSION:
+            return package.new_version or "-"
+        if column == self.COLUMN_ADVISORIES:
+            advisories = self._advisories.get(package.name)
+            return f"{len(advisories)} 个" if advisories else ""
+        if column == self.COLUMN_SIZE:
+            return "-" if package.size is None else format_size(package.size)
+        return None
+
+    def sort_key(self, column: int) -> Callable[[PyPackage], object]:
+        """按列排序时比较的值; 操作列按是否可更新排序"""
+        if column == self.COLUMN_VERSION:
+            return lambda package: versions.sort_key(package.version)
+        if column == self.COLUMN_NEW_VERSION:
+            return lambda package: versions.sort_key(package.new_version)
+        if column == self.COLUMN_ADVISORIES:
+            return lambda package: len(self._advisories.get(package.name, ()))
+        if column == self.COLUMN_SIZE:
+            return lambda package: -1 if package.size is None else package.size
+        if column == self.COLUMN_ACTIONS:
+            return is_upgradable
+        return lambda package: package.name.lower()
+
+    def required_by_text(self, name: str) -> str:
+        dependents = sorted(self.dependency_graph.name(key)
+                            for key in self.dependency_graph.dependents(name))
+        return f"被依赖: {', '.join(dependents)}" if dependents else "未被其他包依赖"
+
+    def advisories_text(self, name: str) -> str:
+        lines = []
+        for advisory in self._advisories.get(name, []):
+            title = " / ".join([advisory.id] + advisory.aliases[:2])
+            lines.append(f"{title}: {advisory.summary}" if advisory.summary else title)
+            if advisory.fixed:
+                lines.append(f"    修复版本: {', '.join(advisory.fixed)}")
+        return "\n".join(lines)
+
+    def set_advisories(self, advisories: Dict[str, List[Advisory]]):
+        """设置漏洞检查的结果, 替换上一次的结果"""
+        self._advisories = advisories
+        if self._packages:
+            self.dataChanged.emit(self.index(0, self.COLUMN_ADVISORIES),
+                                  self.index(len(self._packages) - 1, self.COLUMN_ADVISORIES))
+
+    def packages(self) -> List[PyPackage]:
+        return self._packages
+
+    def set_result(self, row: int, text: str, failed=False):
+        """记录最近一次操作的结果, 以颜色和提示显示在新版本列"""
+        self._results[self._packages[row].name] = (text, failed)
+        self.row_changed(row, self.COLUMN_NEW_VERSION, self.COLUMN_NEW_VERSION)
+
+    def package(self, row: int) -> PyPackage:
+        return self._packages[row]
+
+    def row_of(self, name: str) -> int:
+        """包名所在的行, 不存在时返回 -1"""
+        if self._rows is None:
+            self._rows = {package.name: row for row, package in enumerate(self._packages)}
+        return self._rows.get(name, -1)
+
+    def set_packages(self, packages: List[PyPackage]):
+        self.beginResetModel()
+        self._packages = packages
+        self._rows = None
+        self.endResetModel()
+
+    def row_changed(self, row: int, first_column=0, last_column=None):
+        last_column = self.COLUMN_ACTIONS if last_column is None else last_column
+        self.dataChanged.emit(self.index(row, first_column), self.index(row, last_column))
+
+    def insert_packages(self, packages: List[PyPackage]):
+        if not packages:
+            return
+        first = len(self._packages)
+        self.beginInsertRows(QModelIndex(), first, first + len(packages) - 1)
+        self._packages.extend(packages)
+        self._rows = None
+        self.endInsertRows()
+
+    def remove_row(self, row: int):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._packages[row]
+        self._rows = None
+        self.endRemoveRows()
+
+
+class PackageFilterProxyModel(QAbstractProxyModel):
+    """按搜索和快速筛选条件过滤 PackageTableModel
+
+    每次输入只在搜索索引中查找一次匹配的包名, 然后生成可见行的列表并重置模型;
+    不为每一行调用 filterAcceptsRow, 一万个包时每次输入只需要几毫秒.
+    源模型的行增删或重置前开始重置 (此时 _rows 仍与源模型一致, 视图可以正确保存选中的行),
+    变化后重建索引和可见行. 排序也在生成可见行时完成, 不改变源模型的顺序.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.search_index = search.PackageSearchIndex()
+        self._index_dirty = True
+        self._query = ""
+        self._mode = search.MODE_SUBSTRING
+        self._matches: Optional[Set[str]] = None
+        self._outdated_only = False
+        self._top_level: Optional[Set[str]] = None
+        self._sort_column = -1
+        self._sort_order = Qt.SortOrder.AscendingOrder
+        # 可见的行对应的源模型的行
+        self._rows: List[int] = []
+        self._proxy_rows: Optional[Dict[int, int]] = None
+        # 排序时每个可见的行放置时的排序值, 数据变化时据此判断哪些行需要重新放置
+        self._sort_keys: Dict[int, object] = {}
+        # 源模型变化中, 已经调用了 beginResetModel
+        self._source_changing = False
+
+    def setSourceModel(self, model: PackageTableModel):  # pylint: disable=invalid-name
+        self.beginResetModel()
+        super().setSourceModel(model)
+        for signal in (model.modelAboutToBeReset, model.rowsAboutToBeInserted,
+                       model.rowsAboutToBeRemoved, model.layoutAboutToBeChanged):
+            signal.connect(self._on_source_about_to_change)
+        for signal in (model.modelReset, model.rowsInserted, model.rowsRemoved,
+                       model.layoutChanged):
+            signal.connect(self._on_source_changed)
+        model.dataChanged.connect(self._on_source_data_changed)
+        self._update_rows()
+        self.endResetModel()
+
+    @property
+    def filtering(self) -> bool:
+        return self._matches is not None or self._outdated_only or self._top_level is not None
+
+    def _filter_rows(self) -> Tuple[List[int], Dict[int, object]]:
+        """返回 (可见的行, 每行的排序值)"""
+        packages = self.sourceModel().packages()
+        if not self.filtering:
+            rows = list(range(len(packages)))
+        else:
+            matches, top_level = self._matches, self._top_level
+            rows = [row for row, package in enumerate(packages)
+                    if (matches is None or package.name in matches)
+                    and (not self._outdated_only or is_upgradable(package))
+                    and (top_level is None or package.name in top_level)]
+        sort_keys = {}
+        if self._sort_column >= 0:
+            key = self.sourceModel().sort_key(self._sort_column)
+            sort_keys = {row: key(packages[row]) for row in rows}
+            rows.sort(key=sort_keys.__getitem__,
+                      reverse=self._sort_order == Qt.SortOrder.DescendingOrder)
+        return rows, sort_keys
+
+    def _update_rows(self):
+        self._rows, self._sort_keys = self._filter_rows()
+        self._proxy_rows = None
+
+    def refilter(self):
+        self.beginResetModel()
+        self._update_rows()
+        self.endResetModel()
+
+    def _on_source_about_to_change(self, *args):
+        if not self._source_changing:
+            self._source_changing = True
+            self.beginResetModel()
+
+    def _on_source_changed(self, *args):
+        self._index_dirty = True
+        if self._query:
+            self._update_matches()
+        if not self._source_changing:
+            self.refilter()
+            return
+        self._source_changing = False
+        self._update_rows()
+        self.endResetModel()
+
+    def _accepts(self, package: PyPackage) -> bool:
+        return (self._matches is None or package.name in self._matches) \
+            and (not self._outdated_only or is_upgradable(package)) \
+            and (self._top_level is None or package.name in self._top_level)
+
+    def _sorted_position(self, rows: List[int], row: int) -> int:
+        """row 在有序的可见行 rows 中的位置, 与 _filter_rows 的稳定排序一致 (值相同时按源模型的行)"""
+        if self._sort_column < 0:
+            return bisect.bisect_left(rows, row)
+        sort_keys = self._sort_keys
+        target = sort_keys[row]
+        descending = self._sort_order == Qt.SortOrder.DescendingOrder
+        low, high = 0, len(rows)
+        while low < high:
+            middle = (low + high) // 2
+            value = sort_keys[rows[middle]]
+            if value == target:
+                before = rows[middle] < row
+            else:
+                before = value > target if descending else value < target
+            if before:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _replace_rows(self, changed: range):
+        """只重新放置排序值或可见性变化的行; 顺序或可见的行变化时发出 layoutChanged, 保留选中的行
+
+        dataChanged 的范围可能远大于实际变化的行 (例如批量更新时从最小的行到最大的行),
+        先按放置时的排序值找出实际需要移动的行.
+        """
+        packages = self.sourceModel().packages()
+        key = self.sourceModel().sort_key(self._sort_column) if self._sort_column >= 0 else None
+        proxy_rows, outdated_only = self._proxy_map(), self._outdated_only
+        moved = {}
+        for row in changed:
+            package = packages[row]
+            # 搜索和顶层包的条件只与包名有关, 数据变化只影响可更新的筛选
+            if row in proxy_rows:
+                accepted = not outdated_only or is_upgradable(package)
+            elif outdated_only:
+                accepted = self._accepts(package)
+            else:
+                continue
+            value = key(package) if key is not None and accepted else None
+            if accepted and row in proxy_rows and (key is None or value == self._sort_keys[row]):
+                continue
+            moved[row] = (accepted, value)
+        if not moved:
+            return
+        rows = [row for row in self._rows if row not in moved]
+        for row, (accepted, value) in moved.items():
+            if not accepted:
+                self._sort_keys.pop(row, None)
+                continue
+            if key is not None:
+                self._sort_keys[row] = value
+            rows.insert(self._sorted_position(rows, row), row)
+        if rows == self._rows:
+            return
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        sources = [self._rows[index.row()] for index in persistent]
+        self._rows = rows
+        self._proxy_rows = None
+        self.changePersistentIndexList(persistent, [
+            self.createIndex(row, index.column()) if (row := self._proxy_row(source)) >= 0
+            else QModelIndex()
+            for index, source in zip(persistent, sources)
+        ])
+        self.layoutChanged.emit()
+
+    def _on_source_data_changed(self, top_left: QModelIndex, bottom_right: QModelIndex, roles=()):
+        changed = range(top_left.row(), bottom_right.row() + 1)
+        # 可更新的状态或排序的列可能变化, 只重新放置变化的行
+        resort = top_left.column() <= self._sort_column <= bottom_right.column() \
+            or self._sort_column == PackageTableModel.COLUMN_ACTIONS
+        if self._outdated_only or resort:
+            self._replace_rows(changed)
+        # 排序后可见的顺序与源模型不同, 按连续的可见行分段发出 dataChanged
+        proxy_map = self._proxy_map()
+        proxy_rows = sorted(proxy_map[row] for row in changed if row in proxy_map)
+        start = 0
+        for i, row in enumerate(proxy_rows):
+            if i + 1 == len(proxy_rows) or proxy_rows[i + 1] != row + 1:
+                self.dataChanged.emit(self.index(proxy_rows[start], top_left.column()),
+                                      self.index(row, bottom_right.column()), roles)
+                start = i + 1
+
+    def _update_matches(self):
+        if not self._query:
+            self._matches = None
+            return
+        if self._index_dirty:
+            self.search_index.update(self.sourceModel().packages())
+            self._index_dirty = False
+        with METRICS.timer("ui.search", mode=self._mode):
+            self._matches = self.search_index.search(self._query, self._mode)
+
+    def set_query(self, query: str, mode: str = search.MODE_SUBSTRING):
+        self._query, self._mode = query.strip(), mode
+        self._update_matches()
+        self.refilter()
+
+    def set_outdated_only(self, enabled: bool):
+        self._outdated_only = enabled
+        self.refilter()
+
+    def set_top_level(self, names: Optional[Iterable[str]]):
+        """只显示 names 中的包 (没有被其他包依赖的包); None 表示不筛选"""
+        self._top_level = None if names is None else set(names)
+        self.refilter()
+
+    def sort(self, column: int, order=Qt.SortOrder.AscendingOrder):
+        """column 为 -1 时保持源模型的顺序"""
+        self._sort_column, self._sort_order = column, order
+        self.refilter()
+
+    def _proxy_map(self) -> Dict[int, int]:
+        """源模型的行 -> 可见的行"""
+        if self._proxy_rows is None:
+            self._proxy_rows = {row: i for i, row in enumerate(self._rows)}
+        return self._proxy_rows
+
+    def _proxy_row(self, source_row: int) -> int:
+        return self._proxy_map().get(source_row, -1)
+
+    def rowCount(self, parent=QModelIndex()) -> int:  # pylint: disable=invalid-name
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:  # pylint: disable=invalid-name
+        return 0 if parent.isValid() else self.sourceModel().columnCount()
+
+    def index(self, row: int, column: int, parent=QModelIndex()) -> QModelIndex:
+        if parent.isValid() or not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=None):  # pylint: disable=unused-argument
+        if index is None:
+            return super().parent()
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index: QModelIndex) -> QModelIndex:  # pylint: disable=invalid-name
+        if not proxy_index.isValid() or proxy_index.row() >= len(self._rows):
+            return QModelIndex()
+        return self.sourceModel().index(self._rows[proxy_index.row()], proxy_index.column())
+
+    # pylint: disable-next=invalid-name
+    def mapFromSource(self, source_index: QModelIndex) -> QModelIndex:
+        if not source_index.isValid() or (row := self._proxy_row(source_index.row())) < 0:
+            return QModelIndex()
+        return self.createIndex(row, source_index.column())
+
+    def package(self, row: int) -> PyPackage:
+        return self.sourceModel().package(self._rows[row])
+
+
+class PackageActionDelegate(QStyledItemDelegate):
+    """绘制操作列的按钮, 不为每一行创建控件"""
+
+    uninstall_clicked = Signal(object)
+    update_clicked = Signal(object)
+
+    BUTTON_WIDTH = 56
+    SPACING = 6
+    UNINSTALL_COLOR = QColor("#e53935")
+    UPDATE_COLOR = QColor("#fb8c00")
+
+    def _button_rects(self, rect: QRect) -> Tuple[QRect, QRect]:
+        height = rect.height() - 6
+        top = rect.top() + 3
+        uninstall = QRect(rect.left() + self.SPACING, top, self.BUTTON_WIDTH, height)
+        update = QRect(uninstall.right() + self.SPACING, top, self.BUTTON_WIDTH, height)
+        return uninstall, update
+
+    def update_enabled(self, package: PyPackage) -> bool:
+        return is_upgradable(package)
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex):
+        super().paint(painter, option, index)
+        package = index.model().package(index.row())
+        uninstall, update = self._button_rects(option.rect)
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        for rect, text, color, enabled in [
+            (uninstall, "卸载", self.UNINSTALL_COLOR, True),
+            (update, "更新", self.UPDATE_COLOR, self.update_enabled(package)),
+        ]:
+            color = color if enabled else option.palette.color(QPalette.ColorGroup.Disabled,
+                                                               QPalette.ColorRole.Text)
+            painter.setPen(color)
+            painter.drawRoundedRect(rect, 3, 3)
+            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, text)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index) -> bool:  # pylint: disable=invalid-name
+        if event.type() != QEvent.Type.MouseButtonRelease \
+                or event.button() != Qt.MouseButton.LeftButton:
+            return super().editorEvent(event, model, option, index)
+        uninstall, update = self._button_rects(option.rect)
+        pos = event.position().toPoint()
+        package = model.package(index.row())
+        if uninstall.contains(pos):
+            self.uninstall_clicked.emit(package)
+            return True
+        if update.contains(pos) and self.update_enabled(package):
+            self.update_clicked.emit(package)
+            return True
+        return super().editorEvent(event, model, option, index)
+
+    def sizeHint(self, option, index) -> QSize:  # pylint: disable=invalid-name
+        size = super().sizeHint(option, index)
+        return QSize(self.BUTTON_WIDTH * 2 + self.SPACING * 3, size.height())
+
 
-        self.table = QTableWidget()
+class PackageTable(QWidget):
+
+    def __init__(self, header: List[str], *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.model = PackageTableModel(header)
+        self.proxy = PackageFilterProxyModel()
+        self.proxy.setSourceModel(self.model)
+        self.delegate = PackageActionDelegate()
+        self.delegate.uninstall_clicked.connect(self._uninstall_package)
+        self.delegate.update_clicked.connect(self.update_package)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        # 筛选条件变化时代理模型会重置, 按包名恢复选中的行
+        self._selected_names: List[str] = []
+        self.proxy.modelAboutToBeReset.connect(self._save_selection)
+        self.proxy.modelReset.connect(self._restore_selection)
+        self.table.setItemDelegateForColumn(PackageTableModel.COLUMN_ACTIONS, self.delegate)
         self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        self.table.setColumnCount(len(header) + 1)
-        self.table.setHorizontalHeaderLabels(header + ["操作"])
+        # 点击表头时由代理模型排序
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(PackageTableModel.COLUMN_NAME, Qt.SortOrder.AscendingOrder)
 
         table_header = self.table.horizontalHeader()
         assert table_header is not None
         table_header.setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-
-        self._layout = QHBoxLayout()
+        # 固定行高, 避免按内容计算每一行的高度
+        vertical_header = self.table.verticalHeader()
+        vertical_header.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        vertical_header.setDefaultSectionSize(32)
+
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+
+        # 升级和卸载都进入同一个队列, 串行执行, 相同类型的任务合并为一次 pip 调用
+        self._jobs = jobs.JobQueue()
+        self._job_results: Dict[str, int] = {"success": 0, "failed": 0}
+        self._job_task: Optional[scheduler.Task] = None
+        self.upgrade_progress = InstallProgressBar(on_cancel=self._cancel_jobs)
+
+        self._layout = QVBoxLayout()
+        self._layout.addWidget(self.upgrade_progress)
         self._layout.addWidget(self.table)
         self.setLayout(self._layout)
 
-        self._thread_uninstall_thread = threads.UninstallPkgThread()
-        self._thread_uninstall_thread.signal.connect(self._remove_package)
+    @property
+    def _packages(self) -> List[PyPackage]:
+        return self.model.packages()
 
     def set_packages(self, packaes: List[PyPackage]):
-        self._packages = packaes
-        self.table.clearContents()
-        self.table.setRowCount(len(packaes))
-        for index, package in enumerate(packaes):
-            self.table.setItem(index, 0, QTableWidgetItem(package.name))
-            self.table.setItem(index, 1, QTableWidgetItem(package.version))
-            self.table.setItem(index, 2, QTableWidgetItem(package.new_version or "-"))
-
-            widget = QWidget()
-            layout = QHBoxLayout(widget)
-            layout.setContentsMargins(0, 0, 0, 0)
-
-            btn_uninsatll = v_button(
-                "卸载", color="danger", variant="text",
-                onclick=lambda _, p=package: self._uninstall_package(p)
-            )
-            btn_update = v_button(
-                "更新", color="warning", variant="checked", disabled=True,
-                onclick=lambda _, p=package: self.update_package(p)
-            )
-
-            layout.addWidget(btn_uninsatll)
-            layout.addWidget(btn_update)
-            layout.addStretch()
-
-            self.table.setCellWidget(index, 3, widget)
-
-    def update_item(self, msg: str):
-        data = SignalMessage.from_json(msg).data
-        item = self.table.item(data.get('index', 0), 2)
-        if item:
-            logger.debug("update package {}({}) new_version {}",
-                         msg.index, data.get('name', ''), data['new_version'])
-            item.setText(data['new_version'])
+        self.model.set_packages(packaes)
+
+    def update_items(self, results: List[Tuple[str, Optional[str]]]):
+        """批量更新新版本列 [(包名, 新版本)], 整批只发出一次 dataChanged"""
+        rows = []
+        for name, new_version in results:
+            row = self.model.row_of(name)
+            if not new_version or row < 0:
+                continue
+            self.model.package(row).new_version = new_version
+            rows.append(row)
+        if not rows:
+            return
+        logger.debug("update new version of {} packages", len(rows))
+        column = PackageTableModel.COLUMN_NEW_VERSION
+        self.model.dataChanged.emit(self.model.index(min(rows), column),
+                                    self.model.index(max(rows), column))
+
+    def update_sizes(self, sizes: List[Tuple[str, int]]):
+        """批量更新大小列 [(包名, 字节数)], 整批只发出一次 dataChanged"""
+        rows = []
+        for name, size in sizes:
+            if (row := self.model.row_of(name)) >= 0:
+                self.model.package(row).size = size
+                rows.append(row)
+        if not rows:
+            return
+        column = PackageTableModel.COLUMN_SIZE
+        self.model.dataChanged.emit(self.model.index(min(rows), column),
+                                    self.model.index(max(rows), column))
+
+    def total_size(self) -> Tuple[int, int]:
+        """(已统计的包的总字节数, 未统计的包的数量)"""
+        sizes = [package.size for package in self._packages]
+        return sum(size for size in sizes if size is not None), sizes.count(None)
+
+    def apply_changes(self, changes: IndexChanges):
+        """按增量更新表格: 只删除/插入/刷新发生变化的行"""
+        for package in changes.removed:
+            row = self.model.row_of(package.name)
+            if row >= 0:
+                self.model.remove_row(row)
+        added = []
+        for package in changes.changed + changes.added:
+            row = self.model.row_of(package.name)
+            if row < 0:
+                added.append(package)
+                continue
+            current = self.model.package(row)
+            current.version, current.path = package.version, package.path
+            current.summary = package.summary
+            # 重新安装后需要重新统计
+            current.size = None
+            self.model.row_changed(row)
+        self.model.insert_packages(added)
+
+    def selected_packages(self) -> List[PyPackage]:
+        rows = sorted({self.proxy.mapToSource(index).row()
+                       for index in self.table.selectionModel().selectedRows()})
+        return [self.model.package(row) for row in rows]
+
+    def select_packages(self, names: Iterable[str]):
+        """选中指定的包 (规范化的包名), 被筛选隐藏的包不会被选中"""
+        keys = set(names)
+        selection = QItemSelection()
+        for row, package in enumerate(self.model.packages()):
+            if canonicalize_name(package.name) in keys:
+                selection.select(self.model.index(row, 0),
+                                 self.model.index(row, PackageTableModel.COLUMN_ACTIONS))
+        self.table.selectionModel().select(
+            self.proxy.mapSelectionFromSource(selection),
+            QItemSelectionModel.SelectionFlag.ClearAndSelect)
+
+    def _save_selection(self):
+        self._selected_names = [p.name for p in self.selected_packages()]
+
+    def _restore_selection(self):
+        if self._selected_names:
+            self.select_packages(canonicalize_name(name) for name in self._selected_names)
 
     def update_package(self, package: PyPackage):
         logger.debug("update package {}", package)
+        self._submit_job(jobs.ACTION_UPGRADE, [package])
 
-    def _uninstall_package(self, package: PyPackage):
-        logger.info("uninsatll package {}", package)
-        self._thread_uninstall_thread.set_package(package.name)
-        self._thread_uninstall_thread.start()
+    def update_packages(self, packages: List[PyPackage]):
+        """批量更新, 排队中的更新会合并为一次 pip install --upgrade"""
+        upgradable = [p for p in packages if self.delegate.update_enabled(p)]
+        logger.debug("update packages {}", upgradable)
+        self._submit_job(jobs.ACTION_UPGRADE, upgradable)
 
-    def _remove_package(self, msg: str):
-        removed_package = SignalMessage.from_json(msg).data.get('name')
-        if not removed_package:
+    def _submit_job(self, action: str, packages: List[PyPackage]):
+        if not packages:
             return
-        for i, package in enumerate(self._packages):
-            if package.name != removed_package:
-                continue
-            self.table.removeRow(i)
-            del self._packages[i]
-            logger.debug("remove package {} from table", package.name)
-            break
-        # self.set_packages(self._packages)
+        self._jobs.submit(action, *[p.name for p in packages])
+        if self._job_task is None:
+            self._job_results = {"success": 0, "failed": 0}
+            self.upgrade_progress.start(
+                f"{'更新' if action == jobs.ACTION_UPGRADE else '卸载'} "
+                f"{', '.join(p.name for p in packages)}")
+            self._start_jobs()
+
+    def _start_jobs(self):
+        self._job_task = scheduler.SCHEDULER.submit(
+            tasks.run_pip_jobs, self._jobs, resource=scheduler.RESOURCE_PIP,
+            priority=scheduler.PRIORITY_HIGH, on_progress=self._on_job_progress,
+            on_finished=self._on_jobs_finished)
+
+    def _cancel_jobs(self):
+        self._jobs.clear()
+        if self._job_task is not None:
+            self._job_task.cancel()
+
+    def _on_job_progress(self, item):
+        if isinstance(item, progress.InstallProgress):
+            self.upgrade_progress.set_progress(item)
+        else:
+            self._on_job_result(item)
+
+    def _on_job_result(self, result: jobs.JobResult):
+        self._job_results["success" if result.success else "failed"] += 1
+        row = self.model.row_of(result.name)
+        if row < 0:
+            return
+        if result.action == jobs.ACTION_UNINSTALL:
+            if result.success:
+                self.model.remove_row(row)
+                logger.debug("remove package {} from table", result.name)
+            else:
+                self.model.set_result(row, "❗卸载失败", failed=True)
+            return
+        if result.success:
+            package = self.model.package(row)
+            package.version = result.version or package.version
+            self.model.set_result(row, "已更新" if result.changed else "无变化")
+        elif result.cancelled:
+            self.model.set_result(row, "已取消", failed=True)
+        else:
+            self.model.set_result(row, "❗更新失败", failed=True)
+
+    def _on_jobs_finished(self, task: scheduler.Task):
+        self._job_task = None
+        if task.state == scheduler.STATE_CANCELLED:
+            self.upgrade_progress.finish("已取消")
+            return
+        self.upgrade_progress.finish(f"完成: 成功 {self._job_results.get('success', 0)}, "
+                                     f"失败 {self._job_results.get('failed', 0)}")
+        # 完成前提交的任务可能没有被取走
+        if len(self._jobs):
+            self.upgrade_progress.start("继续执行排队中的任务")
+            self._start_jobs()
+
+    def _uninstall_package(self, package: PyPackage):
+        packages = [package]
+        if (graph := self.model.dependency_graph) is not None:
+            dependents = sorted(graph.name(key) for key in graph.dependents(package.name))
+            orphans = sorted(graph.orphans_after([package.name]))
+            if dependents or orphans:
+                answer = self._confirm_uninstall(package, dependents,
+                                                 [graph.name(key) for key in orphans])
+                if answer == QMessageBox.StandardButton.Cancel:
+                    return
+                if answer == QMessageBox.StandardButton.YesToAll:
+                    packages += [self.model.package(row) for key in orphans
+                                 if (row := self.model.row_of(graph.name(key))) >= 0]
+        logger.info("uninsatll package {}", packages)
+        self._submit_job(jobs.ACTION_UNINSTALL, packages)
+
+    def _confirm_uninstall(self, package: PyPackage, dependents: List[str],
+                           orphans: List[str]) -> QMessageBox.StandardButton:
+        lines = []
+        if dependents:
+            lines.append(f"以下包依赖 {package.name}, 卸载后可能无法使用:\n{', '.join(dependents)}")
+        if orphans:
+            lines.append(f"卸载后以下包不再被任何包依赖:\n{', '.join(orphans)}")
+        buttons = QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.Cancel
+        if orphans:
+            buttons |= QMessageBox.StandardButton.YesToAll
+        box = QMessageBox(QMessageBox.Icon.Question, f"卸载 {package.name}",
+                          "\n\n".join(lines), buttons, self)
+        box.button(QMessageBox.StandardButton.Yes).setText("卸载")
+        if orphans:
+            box.button(QMessageBox.StandardButton.YesToAll).setText("同时卸载不再需要的包")
+        return QMessageBox.StandardButton(box.exec())
+
+
+class MetricsDialog(QDialog):
+    """指标面板: 按总耗时排序的摘要, 可以导出 JSON"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setWindowTitle("性能指标")
+        self.resize(900, 600)
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.text.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        layout = QVBoxLayout()
+        layout.addWidget(self.text)
+        layout.addWidget(v_row([
+            v_button("刷新", onclick=self.refresh),
+            v_button("重置", onclick=self._reset),
+            v_button("导出 JSON...", onclick=self._export),
+        ]))
+        self.setLayout(layout)
+        self.refresh()
+
+    def refresh(self):
+        self.text.setPlainText(METRICS.summary())
+
+    def _reset(self):
+        METRICS.reset()
+        self.refresh()
+
+    def _export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出指标", "pipui-metrics.json",
+                                              "JSON (*.json)")
+        if path:
+            METRICS.export(path)
+            logger.info("metrics exported to {}", path)